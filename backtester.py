@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# 경로 문제 해결 및 config 임포트
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+from index_screener import get_index_tickers
+from price_store import get_prices_many
+from indicator_engine import build_panel, compute_indicators
+from trading_strategy_analyzer import evaluate_buy_rules
+
+DEFAULT_HORIZONS = (5, 10, 20)
+
+
+def load_backtest_data(tickers, period="10y", progress=None):
+    """
+    백테스트용 (패널, 지표) 쌍을 준비합니다. 지표는 규칙 설정과 무관하므로 한 번 계산해 두고
+    여러 설정을 평가할 때 재사용할 수 있습니다.
+    """
+    frames, errors = get_prices_many(tickers, period=period, progress=progress)
+    panel = build_panel(frames, fields=('Close', 'Low', 'Volume'))
+    return panel, compute_indicators(panel), errors
+
+
+def _shift_down(values, periods=1):
+    """배열을 periods 행 아래로 민 복사본(이전 봉 값)을 반환합니다. 위쪽 빈 칸은 NaN입니다."""
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    out[periods:] = values[:-periods]
+    return out
+
+
+def rule_inputs(panel, indicators):
+    """
+    패널 전체를 evaluate_buy_rules에 넘길 2차원 입력으로 만듭니다.
+    각 행(봉)을 그 시점의 '마지막 봉'으로 보고, 'bars'는 그 시점까지 쌓인 티커별 봉 수입니다.
+    """
+    n_bars = panel.n_bars
+    first_row = n_bars - panel.lengths
+    bars = np.arange(n_bars, dtype=float)[:, None] - first_row[None, :] + 1
+    values = {
+        'bars': np.where(bars > 0, bars, 0.0),
+        'Close': panel['Close'],
+        'Volume': panel['Volume'],
+        'prev_Close': _shift_down(panel['Close']),
+        'prev_BBL_20_2.0': _shift_down(indicators['BBL_20_2.0']),
+    }
+    values.update((column, indicators[column]) for column in ('SMA_20', 'SMA_50', 'SMA_200', 'RSI_14', 'VOLUME_SMA_20'))
+    return values
+
+
+def forward_returns(close, horizon):
+    """각 봉의 종가에 매수해 horizon 봉 뒤 종가에 판 수익률. 기간이 끝나지 않은 봉은 NaN입니다."""
+    out = np.full(close.shape, np.nan, dtype=close.dtype)
+    if horizon < close.shape[0]:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:-horizon] = close[horizon:] / close[:-horizon] - 1.0
+    return out
+
+
+def forward_max_drawdown(close, low, horizon):
+    """각 봉의 종가 대비 이후 horizon 봉 동안의 최저가까지 하락률(0 이하). 기간이 끝나지 않은 봉은 NaN입니다."""
+    out = np.full(close.shape, np.nan, dtype=close.dtype)
+    if horizon < close.shape[0]:
+        # 다음 봉부터 horizon 개 봉의 최저가를 슬라이딩 윈도우 뷰로 한 번에 구합니다. (복사 없음)
+        future_low = np.lib.stride_tricks.sliding_window_view(low[1:], horizon, axis=0).min(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[:-horizon] = np.minimum(future_low / close[:-horizon] - 1.0, 0.0)
+    return out
+
+
+def forward_outcomes(panel, horizons=DEFAULT_HORIZONS):
+    """보유 기간별 (미래 수익률, 최대 하락률) 2차원 배열을 계산합니다. 규칙 설정과 무관하므로 여러 설정에서 재사용할 수 있습니다."""
+    close = panel['Close']
+    low = panel['Low'] if 'Low' in panel.fields else close
+    return {horizon: (forward_returns(close, horizon), forward_max_drawdown(close, low, horizon)) for horizon in horizons}
+
+
+def signal_mask(panel, indicators, universe=None, **rule_kwargs):
+    """
+    모든 봉, 모든 종목의 매수 신호를 (봉 × 티커) 불리언 배열로 반환합니다.
+    universe(티커별 불리언 배열)를 주면 해당 종목만 남깁니다. (예: PEG 같은 정적 필터)
+    """
+    signal = evaluate_buy_rules(rule_inputs(panel, indicators), **rule_kwargs)['signal']
+    return signal & universe[None, :] if universe is not None else signal
+
+
+def summarize_backtest(signal, outcomes):
+    """signal_mask 결과와 forward_outcomes 결과로 보유 기간별 요약 DataFrame을 만듭니다."""
+    rows, cols = np.nonzero(signal)
+    summary = [summarize_returns(horizon, returns[rows, cols], drawdowns[rows, cols], baseline=returns)
+               for horizon, (returns, drawdowns) in outcomes.items()]
+    return pd.DataFrame(summary).set_index('horizon')
+
+
+def run_backtest(panel, indicators, horizons=DEFAULT_HORIZONS, universe=None, **rule_kwargs):
+    """
+    find_buy_signals 규칙을 모든 과거 봉, 모든 종목에 2차원 마스크로 한 번에 적용합니다.
+
+    Args:
+        panel, indicators: load_backtest_data 결과.
+        horizons (tuple): 수익률을 측정할 보유 기간(봉 수).
+        universe (np.ndarray): 티커별 포함 여부. 없으면 모든 종목을 사용합니다.
+        **rule_kwargs: evaluate_buy_rules 인자 (rsi_threshold, use_strict_filter 등).
+
+    Returns:
+        tuple: (신호 DataFrame, 보유 기간별 요약 DataFrame).
+               신호 표는 신호 한 건당 한 행으로 date, ticker, close, rsi와
+               보유 기간별 return_<h>d, max_drawdown_<h>d 컬럼을 가집니다.
+    """
+    signal = signal_mask(panel, indicators, universe=universe, **rule_kwargs)
+    outcomes = forward_outcomes(panel, horizons)
+    rows, cols = np.nonzero(signal)
+
+    # 신호가 난 봉의 날짜는 티커별 인덱스에서 배열 인덱싱으로 찾습니다.
+    first_row = panel.n_bars - panel.lengths
+    dates = np.empty(len(rows), dtype='datetime64[ns]')
+    for j in np.unique(cols):
+        selected = cols == j
+        dates[selected] = panel.dates[j].to_numpy(dtype='datetime64[ns]')[rows[selected] - first_row[j]]
+
+    signals = {
+        'date': dates,
+        'ticker': np.asarray(panel.tickers, dtype=object)[cols],
+        'close': panel['Close'][rows, cols],
+        'rsi': indicators['RSI_14'][rows, cols],
+    }
+    for horizon, (returns, drawdowns) in outcomes.items():
+        signals[f'return_{horizon}d'] = returns[rows, cols]
+        signals[f'max_drawdown_{horizon}d'] = drawdowns[rows, cols]
+
+    signals = pd.DataFrame(signals).sort_values(['date', 'ticker'], kind='stable').reset_index(drop=True)
+    return signals, summarize_backtest(signal, outcomes)
+
+
+def summarize_returns(horizon, returns, drawdowns, baseline=None):
+    """보유 기간 하나에 대한 신호 수, 적중률(수익률 > 0), 평균/중앙 수익률, 평균/최대 하락률을 계산합니다."""
+    completed = ~np.isnan(returns)
+    done = returns[completed]
+    row = {
+        'horizon': horizon,
+        'signals': int(len(returns)),
+        'completed': int(completed.sum()),
+        'hit_rate': float((done > 0).mean()) if len(done) else np.nan,
+        'avg_return': float(done.mean()) if len(done) else np.nan,
+        'median_return': float(np.median(done)) if len(done) else np.nan,
+        'avg_max_drawdown': float(drawdowns[completed].mean()) if len(done) else np.nan,
+        'worst_max_drawdown': float(drawdowns[completed].min()) if len(done) else np.nan,
+    }
+    if baseline is not None:
+        # 같은 기간 아무 봉에서나 매수했을 때의 평균 수익률 (신호의 초과 성과 비교용)
+        valid = baseline[~np.isnan(baseline)]
+        row['baseline_avg_return'] = float(valid.mean()) if len(valid) else np.nan
+    return row
+
+
+def load_rule_settings(config=None):
+    """config.ini의 [Analyzer]/[Screener] 설정을 evaluate_buy_rules 인자로 변환합니다."""
+    if config is None:
+        config = get_config_service()
+    # 워크플로우 3단계는 RSI 임계값을 [Screener] rsi_threshold까지 완화하므로, 과거 봉 평가에는 그 상한을 사용합니다.
+    return {
+        'rsi_threshold': config.getint('Screener', 'rsi_threshold'),
+        'use_strict_filter': config.getboolean('Analyzer', 'use_strict_filter'),
+        'use_bollinger_band': config.getboolean('Analyzer', 'use_bollinger_band'),
+        'bollinger_band_mode': config.get('Analyzer', 'bollinger_band_mode'),
+        'bollinger_band_relaxed_pct': config.getfloat('Analyzer', 'bollinger_band_relaxed_pct'),
+        'use_volume_filter': config.getboolean('Analyzer', 'use_volume_filter'),
+    }
+
+
+def print_summary(summary):
+    for horizon, row in summary.iterrows():
+        print(f"  - {horizon}일 보유: 신호 {int(row['signals'])}건 (완료 {int(row['completed'])}건), "
+              f"적중률 {row['hit_rate']:.1%}, 평균 수익률 {row['avg_return']:+.2%} "
+              f"(전체 평균 {row['baseline_avg_return']:+.2%}), 중앙값 {row['median_return']:+.2%}, "
+              f"평균 최대 하락 {row['avg_max_drawdown']:.2%}, 최악 {row['worst_max_drawdown']:.2%}")
+
+
+if __name__ == '__main__':
+    config = get_config_service()
+
+    parser = argparse.ArgumentParser(description="config.ini 매수 신호 규칙의 과거 성과를 백테스트합니다.")
+    parser.add_argument('index_name', nargs='?', default=config.get('Screener', 'index_name'), choices=['SP500', 'NASDAQ100'])
+    parser.add_argument('--period', default=config.get('Backtest', 'period', fallback='10y'), help="백테스트 기간 (예: 5y, 10y)")
+    parser.add_argument('--horizons', default=config.get('Backtest', 'horizons', fallback='5, 10, 20'), help="보유 기간 목록 (예: 5,10,20)")
+    parser.add_argument('--rsi-threshold', type=int, default=None, help="RSI 임계값 (기본값: [Screener] rsi_threshold)")
+    parser.add_argument('--output', default=None, help="신호별 결과를 저장할 CSV 경로")
+    args = parser.parse_args()
+
+    rule_settings = load_rule_settings(config)
+    if args.rsi_threshold is not None:
+        rule_settings['rsi_threshold'] = args.rsi_threshold
+    horizons = tuple(int(h) for h in args.horizons.split(',') if h.strip())
+
+    print(f"--- {args.index_name} 백테스트 ({args.period}) ---")
+    print(f"  - 규칙: {rule_settings}")
+    started = time.perf_counter()
+    backtest_panel, backtest_indicators, load_errors = load_backtest_data(
+        get_index_tickers(args.index_name), period=args.period,
+        progress=lambda done, total, ticker: print(f"  - 진행: [{done}/{total}] {ticker} 데이터 로딩 중...", end='\r'))
+    for ticker, e in load_errors.items():
+        print(f"\n  - 오류 발생 [{ticker}]: {e}")
+    loaded = time.perf_counter()
+    print(f"\n  - 데이터: {len(backtest_panel.tickers)}개 종목 × {backtest_panel.n_bars}봉 ({loaded - started:.1f}초)")
+
+    signal_results, summary_results = run_backtest(backtest_panel, backtest_indicators, horizons=horizons, **rule_settings)
+    print(f"  - 신호 평가: {time.perf_counter() - loaded:.2f}초")
+    print_summary(summary_results)
+
+    if args.output:
+        signal_results.to_csv(args.output, index=False)
+        print(f"  - 신호별 결과 저장: {args.output}")
@@ -0,0 +1,241 @@
+import io
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import argparse
+import tracemalloc
+import contextlib
+import subprocess
+from datetime import datetime
+
+# 경로 문제 해결 및 config 임포트
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from market_data import SyntheticProvider, set_provider
+from indicator_engine import attach_indicators, compute_snapshot
+from trading_strategy_analyzer import find_buy_signals, find_buy_signals_vectorized, resolve_rsi_ladder
+from workflow_metrics import get_metrics
+import investment_workflow
+
+DEFAULT_SIZES = (100, 500, 3000)
+DEFAULT_HISTORY = os.path.join(PROJECT_ROOT, 'data', 'benchmarks', 'history.jsonl')
+# 날짜가 바뀌어도 같은 데이터로 비교할 수 있도록 합성 데이터의 마지막 날짜를 고정합니다.
+SYNTHETIC_END_DATE = '2025-06-30'
+# 워크플로우 실행이 덮어쓰는 파일 (벤치마크 후 원래대로 복원합니다)
+WORKFLOW_OUTPUTS = ['fundamental_analysis_results.txt', 'fundamental_analysis_results.json', 'workflow_summary.txt',
+                    os.path.join('discord', 'logs', 'console.log')]
+
+SIGNAL_RULES = dict(rsi_threshold=60, use_strict_filter=False, use_bollinger_band=True,
+                    bollinger_band_mode='relaxed', bollinger_band_relaxed_pct=5.0, use_volume_filter=False)
+
+
+def benchmark_provider(size, seed=42):
+    """벤치마크 전용 합성 공급자. 이름을 따로 두어 캐시 디렉토리가 실제 데이터와 섞이지 않게 합니다."""
+    provider = SyntheticProvider(seed=seed, universe_size=size, end_date=SYNTHETIC_END_DATE)
+    provider.name = f'benchmark-{size}'
+    return provider
+
+
+def _clear_caches(provider_name):
+    for path in (os.path.join(PROJECT_ROOT, 'data', 'prices', provider_name),
+                 os.path.join(PROJECT_ROOT, 'data', 'info_cache', f'{provider_name}.json'),
+                 os.path.join(PROJECT_ROOT, 'data', 'info_cache', f'{provider_name}_analysis_page.json'),
+                 os.path.join(PROJECT_ROOT, 'data', 'sector_stats', provider_name)):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    from info_cache import _caches
+    for key in [key for key in _caches if key[0] == provider_name]:
+        _caches.pop(key).path = None  # 종료 시 자동 저장으로 파일이 다시 생기지 않게 합니다.
+    # 섹터 통계 저장소도 비워야 콜드 실행이 1.5단계의 .info 조회를 다시 수행합니다. (리스너는 위에서 버린 info 캐시와 함께 사라집니다)
+    from sector_stats import _stores
+    for key in [key for key in _stores if key[0] == provider_name]:
+        _stores.pop(key).path = None
+
+
+@contextlib.contextmanager
+def _preserve_workflow_outputs():
+    """워크플로우가 덮어쓰는 결과/로그 파일과 지표 파일 기록을 벤치마크 동안만 보존합니다."""
+    saved = {}
+    for name in WORKFLOW_OUTPUTS:
+        path = os.path.join(PROJECT_ROOT, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved[path] = f.read()
+    metrics = get_metrics()
+    metrics_paths = (metrics.jsonl_path, metrics.prometheus_path)
+    metrics.jsonl_path = metrics.prometheus_path = None
+    try:
+        yield
+    finally:
+        metrics.jsonl_path, metrics.prometheus_path = metrics_paths
+        for name in WORKFLOW_OUTPUTS:
+            path = os.path.join(PROJECT_ROOT, name)
+            if path in saved:
+                with open(path, 'wb') as f:
+                    f.write(saved[path])
+            elif os.path.exists(path):
+                os.remove(path)
+
+
+def measure(func, repeat=3, setup=None):
+    """
+    func를 repeat번 실행한 최소 시간(초)과, tracemalloc으로 따로 한 번 실행한 최대 메모리(MB)를 반환합니다.
+    tracemalloc은 실행을 느리게 하므로 시간 측정과 분리합니다. setup은 매 실행 전에 호출됩니다. (시간에 포함되지 않음)
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak / (1024 * 1024)
+
+
+def run_cases(size, cases, repeat=3):
+    """티커 size개 합성 데이터로 각 벤치마크 항목을 실행하여 결과 리스트를 반환합니다."""
+    provider = benchmark_provider(size)
+    tickers = provider.get_index_tickers('SP500')
+    frames = {ticker: provider.download(ticker, period="250d") for ticker in tickers}
+    results = []
+
+    def record(case, func, setup=None, repeat_count=repeat):
+        seconds, peak_mb = measure(func, repeat=repeat_count, setup=setup)
+        results.append({'case': case, 'size': size, 'seconds': round(seconds, 6),
+                        'tickers_per_sec': round(size / seconds, 1) if seconds > 0 else None,
+                        'peak_mb': round(peak_mb, 2)})
+        print(f"  - {case:<28} {size:>5}개: {seconds:8.3f}초  ({results[-1]['tickers_per_sec']}개/초, 최대 메모리 {peak_mb:.1f}MB)")
+
+    if 'indicators' in cases:
+        record('indicators', lambda: compute_snapshot(frames))
+
+    if 'find_buy_signals' in cases or 'find_buy_signals_vectorized' in cases or 'rsi_ladder' in cases:
+        signal_table = compute_snapshot(frames)
+        if 'find_buy_signals' in cases:
+            attached = attach_indicators(frames)
+            def loop_signals():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    find_buy_signals(attached, **SIGNAL_RULES)
+            record('find_buy_signals', loop_signals)
+        if 'find_buy_signals_vectorized' in cases:
+            record('find_buy_signals_vectorized', lambda: find_buy_signals_vectorized(signal_table, **SIGNAL_RULES))
+        if 'rsi_ladder' in cases:
+            ladder_rules = {key: value for key, value in SIGNAL_RULES.items() if key != 'rsi_threshold'}
+            record('rsi_ladder', lambda: resolve_rsi_ladder(signal_table, 10, 60, rsi_step=5, min_signals_to_find=5, **ladder_rules))
+
+    if 'workflow_cold' in cases or 'workflow_warm' in cases:
+        previous = set_provider(provider)
+        argv = sys.argv
+        sys.argv = [os.path.join(PROJECT_ROOT, 'investment_workflow.py'), 'SP500']
+        def run_workflow():
+            with contextlib.redirect_stdout(io.StringIO()):
+                investment_workflow.run_investment_workflow()
+        try:
+            with _preserve_workflow_outputs():
+                if 'workflow_cold' in cases:
+                    # 매 실행 전에 가격 저장소와 info 캐시를 비워 첫 실행(전체 다운로드) 비용을 잽니다.
+                    record('workflow_cold', run_workflow, setup=lambda: _clear_caches(provider.name), repeat_count=1)
+                if 'workflow_warm' in cases:
+                    run_workflow()
+                    record('workflow_warm', run_workflow)
+        finally:
+            sys.argv = argv
+            set_provider(previous)
+            _clear_caches(provider.name)
+    return results
+
+
+# --- 기록 및 회귀 확인 ---
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_regressions(results, history, threshold=0.2):
+    """
+    각 (항목, 크기)의 결과를 기록에 남은 직전 기준값과 비교하여 threshold 비율 이상 느려진 항목을 반환합니다.
+    반환값: [(결과, 기준값 기록, 변화율)]
+    """
+    baselines = {}
+    for entry in history:
+        baselines[(entry['case'], entry['size'])] = entry
+    regressions = []
+    for result in results:
+        baseline = baselines.get((result['case'], result['size']))
+        if not baseline or not baseline['seconds']:
+            continue
+        change = result['seconds'] / baseline['seconds'] - 1
+        if change > threshold:
+            regressions.append((result, baseline, change))
+    return regressions
+
+
+def append_history(path, results):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    run_info = {'time': datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+                'python': platform.python_version(), 'machine': platform.node()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps({**run_info, **result}, ensure_ascii=False) + '\n')
+
+
+ALL_CASES = ['indicators', 'find_buy_signals', 'find_buy_signals_vectorized', 'rsi_ladder', 'workflow_cold', 'workflow_warm']
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="합성 데이터로 지표 계산, 매수 신호, RSI 사다리, 전체 워크플로우 성능을 측정합니다.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES), help="티커 수 목록 (예: 100,500,3000)")
+    parser.add_argument('--cases', default=','.join(ALL_CASES), help=f"측정 항목 ({', '.join(ALL_CASES)})")
+    parser.add_argument('--repeat', type=int, default=3, help="항목별 반복 횟수 (최소 시간을 사용)")
+    parser.add_argument('--threshold', type=float, default=0.2, help="직전 기준 대비 회귀로 판단할 느려짐 비율 (0.2 = 20%%)")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="결과 기록 파일 (JSON Lines)")
+    parser.add_argument('--no-save', action='store_true', help="결과를 기록 파일에 추가하지 않습니다.")
+    args = parser.parse_args()
+
+    selected_cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = sorted(set(selected_cases) - set(ALL_CASES))
+    if unknown:
+        parser.error(f"알 수 없는 항목: {', '.join(unknown)}")
+
+    all_results = []
+    for benchmark_size in (int(size) for size in args.sizes.split(',') if size.strip()):
+        print(f"--- 티커 {benchmark_size}개 ---")
+        all_results += run_cases(benchmark_size, selected_cases, repeat=args.repeat)
+
+    regressions = find_regressions(all_results, load_history(args.history), args.threshold)
+    if not args.no_save:
+        append_history(args.history, all_results)
+        print(f"\n결과 기록: {args.history}")
+
+    if regressions:
+        print(f"\n--- 성능 회귀 감지 (기준 대비 {args.threshold:.0%} 이상 느려짐) ---")
+        for result, baseline, change in regressions:
+            print(f"  - {result['case']} ({result['size']}개): {baseline['seconds']:.3f}초 -> {result['seconds']:.3f}초 "
+                  f"(+{change:.0%}, 기준 {baseline.get('commit') or '?'} {baseline['time']})")
+        sys.exit(1)
+    print("\n성능 회귀 없음.")
@@ -1,19 +1,47 @@
-import yfinance as yf
-import pandas_ta as ta
-import pandas as pd
+import io
 import sys
 import os
-import configparser
-from fundamental_analyzer import get_fundamental_analysis
+import time
+import argparse
+import importlib
+
+from config_service import get_config_service
+
+STARTED = time.perf_counter()
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DISCORD_DIR = os.path.join(PROJECT_ROOT, 'discord')
+
+# 분석에 필요한 무거운 모듈. 모듈을 임포트할 때가 아니라 처음 분석할 때 이 순서로 임포트합니다.
+# (캐시된 결과를 보여주거나 인자 오류를 알릴 때는 pandas 등을 임포트하지 않습니다.)
+ANALYSIS_MODULES = ('pandas', 'pandas_ta', 'market_data', 'info_cache', 'fundamental_analyzer', 'price_store')
+# 모듈 이름 -> 임포트에 걸린 시간(초). 앞서 임포트된 모듈이 포함한 하위 모듈의 시간은 앞 모듈에 포함됩니다.
+IMPORT_TIMES = {}
+# 데이터 조회 실패나 오류로 분석 일부를 완료하지 못했을 때의 종료 코드 (봇이 결과를 캐시하지 않도록 알립니다)
+INCOMPLETE_EXIT_CODE = 3
+
+
+def load_analysis_modules():
+    """분석에 필요한 모듈을 임포트하고 모듈별 임포트 시간을 IMPORT_TIMES에 기록합니다. 이미 임포트된 모듈은 건너뜁니다."""
+    for name in ANALYSIS_MODULES:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        IMPORT_TIMES[name] = time.perf_counter() - started
+
 
 def get_combined_analysis(ticker, short_ma=20, mid_ma=50, long_ma=200, rsi_period=14):
     """
     특정 티커에 대한 기술적 분석과 펀더멘탈 분석을 모두 수행하고 출력합니다.
+    두 분석을 모두 완료했으면 True, 데이터를 가져오지 못했거나 오류가 나서 일부만 출력했으면 False를 반환합니다.
     """
+    load_analysis_modules()
+    import pandas as pd
+    from fundamental_analyzer import get_fundamental_analysis
+    from price_store import get_prices
+
     # --- 설정 로드 ---
-    config = configparser.ConfigParser()
-    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.ini')
-    config.read(config_path)
+    config = get_config_service()
     use_strict_filter = config.getboolean('Analyzer', 'use_strict_filter', fallback=False)
 
     print(f"\n--- {ticker} 종합 분석 시작 ---")
@@ -21,13 +49,13 @@ def get_combined_analysis(ticker, short_ma=20, mid_ma=50, long_ma=200, rsi_perio
     
     # --- 1. 기술적 분석 ---
     print(f"\n--- 1. 기술적 분석 (Technical Analysis) ---")
+    complete = True
     try:
-        df = yf.download(ticker, period="250d", auto_adjust=True, progress=False, timeout=10)
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.droplevel(1)
+        df = get_prices(ticker, period="250d")
 
         if df.empty:
             print(f"'{ticker}'에 대한 주가 데이터를 가져올 수 없습니다.")
+            complete = False
         else:
             # 지표 계산
             df[f'SMA_{short_ma}'] = df.ta.sma(length=short_ma)
@@ -150,21 +178,88 @@ def get_combined_analysis(ticker, short_ma=20, mid_ma=50, long_ma=200, rsi_perio
 
     except Exception as e:
         print(f"기술적 분석 중 오류 발생: {e}")
+        complete = False
 
     # --- 2. 펀더멘탈 분석 ---
     print(f"\n--- 2. 펀더멘탈 분석 (Fundamental Analysis) ---")
     try:
-        get_fundamental_analysis(ticker)
+        if get_fundamental_analysis(ticker).error:
+            complete = False
     except Exception as e:
         print(f"펀더멘탈 분석 중 오류 발생: {e}")
+        complete = False
+    return complete
         
+def analyze_with_cache(ticker):
+    """
+    `/stock`과 같은 결과 캐시(discord/result_cache.py)를 거쳐 분석하고 (출력, 계산 시각 epoch, 캐시 사용 여부, 분석 완료 여부)를 반환합니다.
+    캐시된 결과가 있으면 분석 모듈을 임포트하지 않습니다. 새로 분석할 때는 출력을 화면에 바로 보여주면서 저장하며,
+    분석을 완료하지 못한 출력은 저장하지 않습니다.
+    """
+    if DISCORD_DIR not in sys.path:
+        sys.path.append(DISCORD_DIR)
+    from result_cache import Uncached, get_stock_cache, stock_cache_key
+
+    complete = True  # 캐시된 결과는 완료된 분석만 저장됩니다.
+
+    def analyze():
+        nonlocal complete
+        output = _Tee(sys.stdout)
+        sys.stdout, stdout = output, sys.stdout
+        try:
+            complete = get_combined_analysis(ticker)
+        finally:
+            sys.stdout = stdout
+        return output.getvalue() if complete else Uncached(output.getvalue())
+
+    return get_stock_cache().get_or_compute(stock_cache_key(ticker), analyze) + (complete,)
+
+
+class _Tee(io.StringIO):
+    """쓰는 내용을 원래 출력에도 그대로 보내면서 모아 두는 스트림입니다."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+        return super().write(text)
+
+
+def format_import_times(total):
+    lines = ["\n--- 임포트 시간 ---"]
+    lines += [f"  - {name:<22} {seconds:7.3f}초" for name, seconds in IMPORT_TIMES.items()]
+    if not IMPORT_TIMES:
+        lines.append("  - 분석 모듈을 임포트하지 않았습니다. (캐시된 결과 사용)")
+    lines.append(f"  - 합계: {sum(IMPORT_TIMES.values()):.3f}초 (스크립트 전체 {total:.3f}초)")
+    return "\n".join(lines)
+
+
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        ticker_to_analyze = sys.argv[1].upper()
+    parser = argparse.ArgumentParser(description="특정 티커의 기술적 분석과 펀더멘탈 분석을 함께 수행합니다.")
+    parser.add_argument('ticker', nargs='?', help="분석할 티커 (예: AAPL). 없으면 입력을 받습니다.")
+    parser.add_argument('--no-cache', action='store_true', help="결과 캐시를 사용하지 않고 새로 분석합니다.")
+    parser.add_argument('--import-times', action='store_true', help="모듈별 임포트 시간을 표준 오류로 출력합니다.")
+    args = parser.parse_args()
+
+    if args.ticker:
+        ticker_to_analyze = args.ticker.upper()
     else:
         ticker_to_analyze = input("분석할 티커를 입력하세요 (예: AAPL): ").upper()
 
-    if ticker_to_analyze:
-        get_combined_analysis(ticker_to_analyze)
+    complete = True
+    if not ticker_to_analyze:
+        print("티커가 입력되지 않아 분석을 시작할 수 없습니다.")
+    elif args.no_cache:
+        complete = get_combined_analysis(ticker_to_analyze)
     else:
-        print("티커가 입력되지 않아 분석을 시작할 수 없습니다.")
\ No newline at end of file
+        cached_output, computed, cached, complete = analyze_with_cache(ticker_to_analyze)
+        if cached:
+            print(cached_output, end='')
+            print(f"(캐시된 결과: {int(time.time() - computed)}초 전 분석, 새로 분석하려면 --no-cache)", file=sys.stderr)
+
+    if args.import_times:
+        print(format_import_times(time.perf_counter() - STARTED), file=sys.stderr)
+    if not complete:
+        sys.exit(INCOMPLETE_EXIT_CODE)
@@ -0,0 +1,246 @@
+import os
+import threading
+import configparser
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, 'config.ini')
+
+TRUE_VALUES = ('true', '1', 't', 'y', 'yes', 'on')
+FALSE_VALUES = ('false', '0', 'f', 'n', 'no', 'off')
+
+# --- 설정 스키마 ---
+# (섹션, 키) -> (형식, 선택지). 형식은 코드가 그 키를 읽는 방식(getint/getfloat/getboolean/get)과 같습니다.
+# 스키마에 없는 키는 현재 값으로 형식을 추론합니다.
+SCHEMA = {
+    ('Screener', 'index_name'): ('str', ['SP500', 'NASDAQ100']),
+    ('Screener', 'rsi_threshold'): ('int', None),
+    ('Screener', 'use_peg_filter'): ('bool', None),
+    ('Screener', 'peg_threshold'): ('float', None),
+
+    ('Analyzer', 'min_signals_to_find'): ('int', None),
+    ('Analyzer', 'initial_rsi_threshold'): ('int', None),
+    ('Analyzer', 'rsi_threshold_step'): ('int', None),
+    ('Analyzer', 'use_strict_filter'): ('bool', None),
+    ('Analyzer', 'use_bollinger_band'): ('bool', None),
+    ('Analyzer', 'bollinger_band_mode'): ('str', ['strict', 'normal', 'relaxed']),
+    ('Analyzer', 'bollinger_band_relaxed_pct'): ('float', None),
+    ('Analyzer', 'use_volume_filter'): ('bool', None),
+
+    ('Backtest', 'period'): ('str', None),
+    ('Backtest', 'horizons'): ('str', None),
+
+    ('Metrics', 'enabled'): ('bool', None),
+    ('Metrics', 'jsonl_path'): ('str', None),
+    ('Metrics', 'prometheus_path'): ('str', None),
+
+    ('Fundamental', 'use_analyst_filter'): ('bool', None),
+    ('Fundamental', 'sector_stats_dir'): ('str', None),
+    ('Fundamental', 'sector_stats_max_age_days'): ('float', None),
+
+    ('Data', 'provider'): ('str', ['yfinance', 'replay', 'synthetic']),
+    ('Data', 'replay_dir'): ('str', None),
+    ('Data', 'synthetic_seed'): ('int', None),
+    ('Data', 'synthetic_universe_size'): ('int', None),
+    ('Data', 'synthetic_end_date'): ('str', None),
+    ('Data', 'use_price_cache'): ('bool', None),
+    ('Data', 'price_cache_dir'): ('str', None),
+    ('Data', 'use_indicator_state'): ('bool', None),
+    ('Data', 'info_cache_dir'): ('str', None),
+    ('Data', 'info_cache_size'): ('int', None),
+    ('Data', 'analysis_page_ttl_hours'): ('float', None),
+    ('Data', 'http_cache_dir'): ('str', None),
+    ('Data', 'http_pool_size'): ('int', None),
+    ('Data', 'fetch_workers'): ('int', None),
+    ('Data', 'fetch_rate_per_sec'): ('float', None),
+    ('Data', 'fetch_retries'): ('int', None),
+    ('Data', 'fetch_batch_size'): ('int', None),
+    ('Data', 'memory_budget_mb'): ('int', None),
+    ('Data', 'index_registry_dir'): ('str', None),
+    ('Data', 'index_registry_ttl_hours'): ('float', None),
+
+    ('Bot', 'stock_workers'): ('int', None),
+    ('Bot', 'stock_worker_max_jobs'): ('int', None),
+    ('Bot', 'stock_timeout'): ('int', None),
+    ('Bot', 'worker_health_interval'): ('int', None),
+    ('Bot', 'stock_cache_ttl_minutes'): ('float', None),
+    ('Bot', 'stock_cache_size'): ('int', None),
+    ('Bot', 'stock_cache_file'): ('str', None),
+    ('Bot', 'workflow_jobs_dir'): ('str', None),
+    ('Bot', 'workflow_workers'): ('int', None),
+    ('Bot', 'workflow_timeout'): ('int', None),
+    ('Bot', 'workflow_job_history'): ('int', None),
+
+    ('Scheduler', 'indexes'): ('str', None),
+    ('Scheduler', 'run_after_close_minutes'): ('int', None),
+    ('Scheduler', 'workflow_timeout'): ('int', None),
+    ('Scheduler', 'snapshot_dir'): ('str', None),
+    ('Scheduler', 'snapshot_keep'): ('int', None),
+}
+
+
+def infer_type(value):
+    """스키마에 없는 키의 형식을 현재 값으로 추론합니다. (int -> float -> bool -> str 순)"""
+    for value_type, parse in (('int', int), ('float', float)):
+        try:
+            parse(value)
+            return value_type
+        except ValueError:
+            pass
+    if value.lower() in configparser.ConfigParser.BOOLEAN_STATES:
+        return 'bool'
+    return 'str'
+
+
+def parse_value(value, value_type):
+    """문자열 값을 형식에 맞게 변환합니다. 형식에 맞지 않으면 ValueError를 발생시킵니다."""
+    if value_type == 'int':
+        return int(value)
+    if value_type == 'float':
+        return float(value)
+    if value_type == 'bool':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f"Invalid boolean value: {value}")
+    return value
+
+
+class ConfigService:
+    """
+    config.ini를 한 번만 파싱해 메모리에 두고, 파일의 수정 시각/크기가 바뀌었을 때만 다시 읽는 설정 서비스입니다.
+
+    - get/getint/getfloat/getboolean 등 ConfigParser와 같은 메서드를 제공하며, 호출할 때마다 최신 파일 내용을 반영합니다.
+      (모듈 전역에 두어도 봇의 `/config_set` 변경이 재시작 없이 적용됩니다.)
+    - options()는 키별 형식/현재 값/선택지를 SCHEMA로 계산하고, 파일이 바뀔 때까지 결과를 재사용합니다.
+    - set()은 값을 검증한 뒤 임시 파일에 쓰고 os.replace로 교체하므로, 읽는 쪽은 항상 완성된 파일만 봅니다.
+    """
+
+    def __init__(self, path=CONFIG_FILE_PATH, schema=None):
+        self.path = path
+        self.schema = SCHEMA if schema is None else schema
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._parser = configparser.ConfigParser()
+        self._options = None
+        self.reloads = 0
+
+    # --- 읽기 ---
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def parser(self):
+        """최신 설정의 ConfigParser를 반환합니다. 파일이 바뀌면 새 객체로 교체하므로 반환값을 수정하지 마세요."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return self._parser
+        with self._lock:
+            if stamp != self._stamp:
+                parser = configparser.ConfigParser()
+                parser.read(self.path)
+                self._parser, self._stamp, self._options = parser, stamp, None
+                self.reloads += 1
+            return self._parser
+
+    def get(self, section, option, **kwargs):
+        return self.parser().get(section, option, **kwargs)
+
+    def getint(self, section, option, **kwargs):
+        return self.parser().getint(section, option, **kwargs)
+
+    def getfloat(self, section, option, **kwargs):
+        return self.parser().getfloat(section, option, **kwargs)
+
+    def getboolean(self, section, option, **kwargs):
+        return self.parser().getboolean(section, option, **kwargs)
+
+    def has_section(self, section):
+        return self.parser().has_section(section)
+
+    def has_option(self, section, option):
+        return self.parser().has_option(section, option)
+
+    def sections(self):
+        return self.parser().sections()
+
+    def items(self, section):
+        return self.parser().items(section)
+
+    def __getitem__(self, section):
+        return self.parser()[section]
+
+    # --- 스키마 ---
+    def key_type(self, section, key):
+        if (section, key) in self.schema:
+            return self.schema[(section, key)][0]
+        parser = self.parser()
+        return infer_type(parser.get(section, key)) if parser.has_option(section, key) else 'str'
+
+    def options(self):
+        """{섹션: {키: {'type', 'current'[, 'choices']}}}를 반환합니다. 파일이 바뀔 때까지 같은 객체를 재사용하므로 수정하지 마세요."""
+        parser = self.parser()
+        with self._lock:
+            if self._options is not None and parser is self._parser:
+                return self._options
+            options = {}
+            for section in parser.sections():
+                options[section] = {}
+                for key, value in parser.items(section):
+                    value_type, choices = self.schema.get((section, key), (infer_type(value), None))
+                    options[section][key] = {'type': value_type, 'current': value}
+                    if value_type == 'bool':
+                        options[section][key]['choices'] = ['True', 'False']
+                    elif choices:
+                        options[section][key]['choices'] = list(choices)
+            if parser is self._parser:
+                self._options = options
+            return options
+
+    # --- 쓰기 ---
+    def set(self, section, key, value):
+        """
+        값을 검증하고 config.ini에 원자적으로 저장합니다. 저장한 값을 반환합니다.
+        섹션/키가 없거나 형식/선택지에 맞지 않으면 KeyError/ValueError를 발생시킵니다.
+        """
+        with self._lock:
+            current = self.parser()
+            if not current.has_option(section, key):
+                raise KeyError((section, key))
+            value_type = self.key_type(section, key)
+            new_value = parse_value(value, value_type)
+            choices = self.schema.get((section, key), (None, None))[1]
+            if choices and new_value not in choices:
+                raise ValueError(f"'{new_value}' is not one of {choices}")
+
+            # 캐시된 파서는 다른 스레드가 읽는 중일 수 있으므로 복사본을 수정합니다.
+            updated = configparser.ConfigParser()
+            for name in current.sections():
+                updated.add_section(name)
+                for option, raw_value in current.items(name, raw=True):
+                    updated.set(name, option, raw_value)
+            updated.set(section, key, str(new_value))
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as configfile:
+                updated.write(configfile)
+                configfile.flush()
+                os.fsync(configfile.fileno())
+            os.replace(tmp_path, self.path)
+            self._parser, self._stamp, self._options = updated, self._file_stamp(), None
+            return new_value
+
+
+# --- 기본 서비스 ---
+_service = None
+_service_lock = threading.Lock()
+
+def get_config_service():
+    """프로젝트 config.ini의 프로세스 전역 설정 서비스를 반환합니다."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ConfigService()
+        return _service
@@ -5,8 +5,13 @@ import json
 import logging
 import asyncio
 import sys
+import time
+from datetime import datetime
 from discord import app_commands
 from commands import setup_commands
+from worker_pool import get_stock_pool
+from result_cache import Uncached, format_age, get_stock_cache, stock_cache_key
+from job_manager import SUMMARY_FILE, get_job_manager
 
 # --- 설정 파일 로드 ---
 def load_config():
@@ -21,6 +26,11 @@ WEBHOOK_URL = config['webhook_url']
 
 # --- 로깅 설정 ---
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+from fundamental_report import RESULTS_JSON, RESULTS_TEXT, format_report_parts, load_results
+from workflow_snapshots import get_snapshot_store
+from combined_analyzer import INCOMPLETE_EXIT_CODE
 log_dir = os.path.join(PROJECT_ROOT, 'discord', 'logs')
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
@@ -44,6 +54,18 @@ class MyClient(discord.Client):
         self.tree.copy_global_to(guild=MY_GUILD)
         setup_commands(self.tree, MY_GUILD, logger)
         await self.tree.sync(guild=MY_GUILD)
+        get_job_manager().start()
+        # `/stock`용 워커를 미리 띄워 두어 첫 명령부터 임포트 비용 없이 분석합니다.
+        stock_pool = get_stock_pool()
+        if stock_pool is not None:
+            await asyncio.to_thread(stock_pool.start)
+
+    async def close(self):
+        await get_job_manager().close()
+        stock_pool = get_stock_pool()
+        if stock_pool is not None:
+            await asyncio.to_thread(stock_pool.close)
+        await super().close()
 
 intents = discord.Intents.default()
 client = MyClient(intents=intents)
@@ -55,17 +77,31 @@ async def on_ready():
     print('------')
 
 # --- 헬퍼 함수 (Moved from commands.py) ---
-def run_analysis_sync(ticker: str) -> str:
+def run_analysis_sync(ticker: str):
+    """종합 분석을 실행하고 (출력, 분석 완료 여부)를 반환합니다."""
+    stock_pool = get_stock_pool()
+    if stock_pool is not None:
+        return stock_pool.run_stock(ticker.upper())
+    # [Bot] stock_workers = 0이면 예전처럼 명령마다 새 프로세스에서 분석합니다. (봇이 결과를 캐시하므로 스크립트 캐시는 끕니다)
     script_path = os.path.join(PROJECT_ROOT, 'combined_analyzer.py')
     result = subprocess.run(
-        [PYTHON_EXECUTABLE, script_path, ticker],
-        capture_output=True, text=True, check=True, timeout=120, cwd=PROJECT_ROOT
+        [PYTHON_EXECUTABLE, script_path, ticker, '--no-cache'],
+        capture_output=True, text=True, timeout=120, cwd=PROJECT_ROOT
     )
-    return result.stdout
+    if result.returncode not in (0, INCOMPLETE_EXIT_CODE):
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+    return result.stdout, result.returncode == 0
+
+def run_cached_analysis_sync(ticker: str):
+    """캐시를 거쳐 종합 분석을 실행하고 (출력, 결과 경과 시간(초), 캐시 사용 여부)를 반환합니다. 완료하지 못한 분석은 캐시하지 않습니다."""
+    ticker = ticker.upper()
 
-def run_workflow_sync(index_value: str):
-    script_path = os.path.join(PROJECT_ROOT, 'investment_workflow.py')
-    subprocess.run([PYTHON_EXECUTABLE, script_path, index_value], cwd=PROJECT_ROOT, check=True, timeout=900)
+    def compute():
+        output, complete = run_analysis_sync(ticker)
+        return output if complete else Uncached(output)
+
+    output, computed, cached = get_stock_cache().get_or_compute(stock_cache_key(ticker), compute)
+    return output, time.time() - computed, cached
 
 # --- 명령어 정의 (Moved from user's working example) ---
 @client.tree.command(name="stock", description="특정 티커의 종합 분석(기술적+펀더멘탈)을 수행합니다.", guild=MY_GUILD)
@@ -73,36 +109,71 @@ def run_workflow_sync(index_value: str):
 async def stock(interaction: discord.Interaction, ticker: str):
     await interaction.response.defer(thinking=True)
     try:
-        output = await asyncio.to_thread(run_analysis_sync, ticker)
-        if len(output) > 1980:
-            output = output[:1980] + "... (내용이 너무 길어 잘렸습니다)"
-        await interaction.followup.send(f"```\n{output}\n```")
+        output, age, cached = await asyncio.to_thread(run_cached_analysis_sync, ticker)
+        # 다른 요청이 만든 결과를 재사용한 경우 결과가 얼마나 오래되었는지 함께 표시합니다.
+        header = f"*{format_age(age)} 전 분석 결과 (캐시)*\n" if cached else ""
+        limit = 1980 - len(header)
+        if len(output) > limit:
+            output = output[:limit] + "... (내용이 너무 길어 잘렸습니다)"
+        await interaction.followup.send(f"{header}```\n{output}\n```")
     except Exception as e:
         error_message = e.stderr if hasattr(e, 'stderr') else str(e)
         logger.critical(f"/stock 명령어 오류 ({ticker}): {error_message}")
         await interaction.followup.send(f"'{ticker}' 분석 중 오류가 발생했습니다. 관리자가 로그를 확인해야 합니다.")
 
 @client.tree.command(name="workflow", description="선택한 시장 지수에 대한 전체 투자 분석 워크플로우를 시작합니다.", guild=MY_GUILD)
-@app_commands.describe(index='분석할 시장 지수를 선택합니다.')
+@app_commands.describe(index='분석할 시장 지수를 선택합니다.', live='장 마감 후 스냅샷 대신 지금 새로 계산합니다.')
 @app_commands.choices(index=[
     discord.app_commands.Choice(name='S&P 500', value='SP500'),
     discord.app_commands.Choice(name='NASDAQ 100', value='NASDAQ100'),
+    discord.app_commands.Choice(name='S&P 500 + NASDAQ 100', value='SP500,NASDAQ100'),
 ])
-async def workflow(interaction: discord.Interaction, index: discord.app_commands.Choice[str]):
+async def workflow(interaction: discord.Interaction, index: discord.app_commands.Choice[str], live: bool = False):
     await interaction.response.defer(thinking=True)
     try:
-        await interaction.followup.send(f"{index.name} 지수에 대한 전체 투자 분석 워크플로우를 시작합니다. 최대 15분까지 소요될 수 있으며, 완료되면 요약 결과를 게시합니다.")
-        
-        await asyncio.to_thread(run_workflow_sync, index.value)
+        # 장 마감 후 스케줄러가 만든 최신 스냅샷이 (선택한 모든 지수에) 있으면 다시 계산하지 않고 바로 게시합니다.
+        indexes = index.value.split(',')
+        snapshots = [] if live else [get_snapshot_store().current(index_name) for index_name in indexes]
+        if snapshots and None not in snapshots:
+            summaries = []
+            for index_name, snapshot in zip(indexes, snapshots):
+                summary_filepath = os.path.join(snapshot['path'], SUMMARY_FILE)
+                if os.path.exists(summary_filepath):
+                    with open(summary_filepath, "r", encoding="utf-8") as f:
+                        summary_output = f.read()
+                else:
+                    summary_output = "스냅샷 실행에서 최종 매수 신호 종목을 찾지 못했습니다."
+                summaries.append(f"**[{index_name}]** {summary_output}" if len(indexes) > 1 else summary_output)
+            snapshot = snapshots[0]
+            created = datetime.fromtimestamp(snapshot['created']).strftime('%Y-%m-%d %H:%M')
+            summary_output = "\n".join(summaries)
+            await interaction.followup.send(f"*{snapshot['session']} 장 마감 후 스냅샷 ({created} 생성). 새로 계산하려면 `live:True`로 실행하세요.*\n{summary_output}")
+            return
+
+        job, attached = get_job_manager().submit(index.value)
+        if attached:
+            intro = f"{index.name} 지수 워크플로우가 이미 진행 중입니다. 같은 작업의 결과를 함께 받습니다."
+        else:
+            intro = f"{index.name} 지수에 대한 전체 투자 분석 워크플로우를 시작합니다. 최대 15분까지 소요될 수 있으며, 완료되면 요약 결과를 게시합니다."
+        progress_message = await interaction.followup.send(f"{intro}\n{job.describe()}", wait=True)
 
-        await asyncio.sleep(1) # 파일 시스템 I/O 지연을 위한 1초 대기
+        # 워크플로우 단계가 진행될 때마다 같은 메시지를 수정하여 진행 상황을 보여줍니다.
+        async def update_progress(job):
+            await progress_message.edit(content=f"{intro}\n{job.describe()}")
+        job.listeners.append(update_progress)
+        try:
+            await job.wait()
+        finally:
+            job.listeners.remove(update_progress)
 
-        summary_filepath = os.path.join(PROJECT_ROOT, "workflow_summary.txt")
-        if os.path.exists(summary_filepath):
-            with open(summary_filepath, "r", encoding="utf-8") as f:
+        if job.status == 'cancelled':
+            await interaction.followup.send(f"{index.name} 워크플로우가 취소되었습니다.")
+        elif job.status != 'done':
+            raise RuntimeError(job.error)
+        elif os.path.exists(job.summary_path):
+            with open(job.summary_path, "r", encoding="utf-8") as f:
                 summary_output = f.read()
             await interaction.followup.send(summary_output)
-            os.remove(summary_filepath)
         else:
             await interaction.followup.send("워크플로우는 완료되었으나, 요약 파일이 생성되지 않았습니다.")
 
@@ -111,24 +182,61 @@ async def workflow(interaction: discord.Interaction, index: discord.app_commands
         logger.critical(f"/workflow 명령어 오류 ({index.name}): {error_message}")
         await interaction.followup.send(f"워크플로우 실행 중 오류가 발생했습니다. 관리자가 로그를 확인해야 합니다.")
 
+@client.tree.command(name="workflow_cancel", description="대기 중이거나 실행 중인 워크플로우를 취소합니다.", guild=MY_GUILD)
+@app_commands.describe(index='취소할 시장 지수를 선택합니다.')
+@app_commands.choices(index=[
+    discord.app_commands.Choice(name='S&P 500', value='SP500'),
+    discord.app_commands.Choice(name='NASDAQ 100', value='NASDAQ100'),
+    discord.app_commands.Choice(name='S&P 500 + NASDAQ 100', value='SP500,NASDAQ100'),
+])
+async def workflow_cancel(interaction: discord.Interaction, index: discord.app_commands.Choice[str]):
+    job = await get_job_manager().cancel(index.value)
+    if job is None:
+        await interaction.response.send_message(f"취소할 {index.name} 워크플로우가 없습니다.")
+    else:
+        await interaction.response.send_message(f"{index.name} 워크플로우(`{job.id}`) 취소를 요청했습니다.")
+
+def latest_result_dir(index_value=None):
+    """봇 작업과 스케줄러 스냅샷 중 가장 최근 결과 디렉토리를 반환합니다. 둘 다 없으면 None."""
+    candidates = []
+    for index_name in ([index_value] if index_value else ['SP500', 'NASDAQ100']):
+        # 여러 지수를 함께 실행한 작업은 지수별 하위 디렉토리에 결과가 있습니다.
+        latest_job = get_job_manager().latest(index_name)
+        if latest_job is not None:
+            candidates.append((latest_job.finished, latest_job.result_dir(index_name)))
+        snapshot = get_snapshot_store().latest(index_name)
+        if snapshot is not None:
+            candidates.append((snapshot['created'], snapshot['path']))
+    return max(candidates)[1] if candidates else None
+
 @client.tree.command(name="report", description="가장 최근에 실행된 워크플로우의 상세 분석 리포트를 확인합니다.", guild=MY_GUILD)
-async def report(interaction: discord.Interaction):
+@app_commands.describe(index='리포트를 볼 시장 지수 (생략하면 가장 최근 결과)')
+@app_commands.choices(index=[
+    discord.app_commands.Choice(name='S&P 500', value='SP500'),
+    discord.app_commands.Choice(name='NASDAQ 100', value='NASDAQ100'),
+])
+async def report(interaction: discord.Interaction, index: discord.app_commands.Choice[str] = None):
     await interaction.response.defer(thinking=True)
     try:
-        result_filepath = os.path.join(PROJECT_ROOT, "fundamental_analysis_results.txt")
-        if os.path.exists(result_filepath):
-            with open(result_filepath, "r", encoding="utf-8") as f:
-                full_output = f.read()
-            
-            # "--- 펀더멘탈 분석"을 기준으로 메시지 분할
-            chunks = full_output.split("--- 펀더멘탈 분석")
-            chunks = [chunk.strip() for chunk in chunks if chunk.strip()]
+        # 봇 작업이나 스냅샷의 가장 최근 결과를 우선 보여주고, 없으면 직접 실행한 워크플로우가 남긴 파일을 사용합니다.
+        managed_dir = latest_result_dir(index.value if index else None)
+        result_dir = managed_dir or PROJECT_ROOT
+        json_filepath = os.path.join(result_dir, RESULTS_JSON)
+        result_filepath = os.path.join(result_dir, RESULTS_TEXT)
+        if os.path.exists(json_filepath) or os.path.exists(result_filepath):
+            if os.path.exists(json_filepath):
+                # 구조화된 결과를 읽어 파트별 메시지로 바로 렌더링합니다.
+                chunks = [chunk.strip() for chunk in format_report_parts(load_results(json_filepath))]
+            else:
+                # 이전 버전이 남긴 텍스트 리포트는 "--- 펀더멘탈 분석"을 기준으로 분할
+                with open(result_filepath, "r", encoding="utf-8") as f:
+                    full_output = f.read()
+                chunks = [f"--- 펀더멘탈 분석{chunk.strip()}" for chunk in full_output.split("--- 펀더멘탈 분석") if chunk.strip()]
 
             if not chunks:
                 await interaction.followup.send("상세 리포트 파일은 있으나 내용이 비어있습니다.")
             else:
-                for i, chunk in enumerate(chunks):
-                    message_content = f"--- 펀더멘탈 분석{chunk}"
+                for i, message_content in enumerate(chunks):
                     if len(message_content) > 1980:
                         message_content = message_content[:1980] + "... (내용이 너무 길어 잘렸습니다)"
                     
@@ -137,7 +245,11 @@ async def report(interaction: discord.Interaction):
                     else:
                         await interaction.channel.send(f"```\n{message_content}\n```")
 
-            os.remove(result_filepath)
+            # 작업/스냅샷 디렉토리의 결과는 다른 사용자도 볼 수 있도록 남겨 둡니다. (오래된 결과는 각 관리자가 정리)
+            if managed_dir is None:
+                for path in (json_filepath, result_filepath):
+                    if os.path.exists(path):
+                        os.remove(path)
         else:
             await interaction.followup.send("표시할 상세 리포트가 없습니다. 먼저 `/workflow`를 실행해주세요.")
 
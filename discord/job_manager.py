@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import itertools
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+
+WORKFLOW_SCRIPT = os.path.join(PROJECT_ROOT, 'investment_workflow.py')
+# investment_workflow.py가 --output-dir 아래에 만드는 파일
+SUMMARY_FILE = 'workflow_summary.txt'
+PROGRESS_FILE = 'progress.jsonl'
+
+STATUS_LABELS = {
+    'queued': '대기 중',
+    'running': '실행 중',
+    'done': '완료',
+    'failed': '실패',
+    'cancelled': '취소됨',
+}
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def read_progress(path):
+    """진행 파일의 마지막 기록을 반환합니다. 아직 기록이 없으면 None."""
+    try:
+        with open(path, 'rb') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue  # 쓰는 중인 마지막 줄은 건너뜁니다.
+    return None
+
+
+class WorkflowJob:
+    """
+    `/workflow` 실행 한 건. 작업마다 전용 출력 디렉토리를 사용하므로 다른 실행의 결과 파일을 덮어쓰지 않습니다.
+    index_name이 'SP500,NASDAQ100'처럼 여러 지수면 한 번의 실행으로 공유 데이터를 계산하고 지수별 하위 디렉토리에 결과를 남깁니다.
+    """
+
+    def __init__(self, job_id, index_name, output_dir):
+        self.id = job_id
+        self.index_name = index_name
+        self.indexes = index_name.split(',')
+        self.output_dir = output_dir
+        self.status = 'queued'
+        self.progress = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.process = None
+        self.cancel_requested = False
+        self.listeners = []
+        self._done = asyncio.Event()
+
+    @property
+    def progress_path(self):
+        return os.path.join(self.output_dir, PROGRESS_FILE)
+
+    @property
+    def summary_path(self):
+        return os.path.join(self.output_dir, SUMMARY_FILE)
+
+    def result_dir(self, index_name):
+        """지수 하나의 결과 파일이 있는 디렉토리입니다. (investment_workflow.universe_dir와 같은 규칙)"""
+        return self.output_dir if len(self.indexes) == 1 else os.path.join(self.output_dir, index_name)
+
+    @property
+    def is_active(self):
+        return self.status in ACTIVE_STATUSES
+
+    async def wait(self):
+        await self._done.wait()
+
+    def describe(self):
+        """Discord 진행 메시지에 표시할 현재 상태 문자열을 만듭니다."""
+        line = f"`{self.id}` {STATUS_LABELS[self.status]}"
+        if self.started:
+            line += f" ({int((self.finished or time.time()) - self.started)}초 경과)"
+        if self.status == 'running' and self.progress:
+            line += f"\n- {self.progress.get('message') or '준비 중'}"
+            if self.progress.get('total'):
+                line += f" [{self.progress['done']}/{self.progress['total']}]"
+        if self.error:
+            line += f"\n- {self.error}"
+        return line
+
+
+class JobManager:
+    """
+    `/workflow` 실행을 큐에 넣어 백그라운드에서 처리하는 작업 관리자입니다. (봇의 이벤트 루프에서 사용)
+
+    - 같은 지수의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업에 합류합니다.
+    - 워크플로우가 --progress-file에 남기는 진행 상황을 poll_interval초마다 읽어 작업의 리스너(메시지 갱신 등)를 호출합니다.
+    - 대기 중인 작업은 큐에서 빼고, 실행 중인 작업은 프로세스를 종료하여 취소합니다.
+    - 작업 결과는 jobs_dir/<작업 ID>/에 저장하며, 끝난 작업은 최근 history개만 남깁니다.
+    """
+
+    def __init__(self, jobs_dir, workers=1, timeout=900, history=10, poll_interval=3.0):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.history = history
+        self.poll_interval = poll_interval
+        self.jobs = []
+        self._active = {}
+        self._queue = None
+        self._tasks = []
+        self._ids = itertools.count(1)
+
+    def start(self):
+        """작업 처리 태스크를 시작합니다. (이벤트 루프 안에서 호출)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for job in list(self._active.values()):
+            await self.cancel(job.index_name)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    # --- 작업 등록/취소 ---
+    def submit(self, index_name):
+        """지수 워크플로우 작업을 등록하고 (작업, 기존 작업 합류 여부)를 반환합니다."""
+        job = self._active.get(index_name)
+        if job is not None:
+            return job, True
+        job_id = f"{index_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{next(self._ids)}"
+        job = WorkflowJob(job_id, index_name, os.path.join(self.jobs_dir, job_id))
+        self.jobs.append(job)
+        self._active[index_name] = job
+        self._queue.put_nowait(job)
+        return job, False
+
+    async def cancel(self, index_name):
+        """지수의 대기/실행 중인 작업을 취소하고 반환합니다. 취소할 작업이 없으면 None."""
+        job = self._active.get(index_name)
+        if job is None:
+            return None
+        job.cancel_requested = True
+        if job.status == 'queued':
+            # 큐에 남은 작업은 처리 태스크가 꺼낼 때 건너뜁니다.
+            await self._finish(job, 'cancelled')
+        elif job.process is not None and job.process.returncode is None:
+            job.process.terminate()
+        return job
+
+    def latest(self, index_name=None):
+        """가장 최근에 완료된 작업을 반환합니다. index_name을 주면 그 지수를 포함한 작업만 찾습니다. 없으면 None."""
+        for job in reversed(self.jobs):
+            if job.status == 'done' and (index_name is None or index_name in job.indexes):
+                return job
+        return None
+
+    # --- 실행 ---
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status == 'queued':
+                    await self._run(job)
+            except Exception as e:
+                await self._finish(job, 'failed', f"작업 실행 오류: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        os.makedirs(job.output_dir, exist_ok=True)
+        job.status = 'running'
+        job.started = time.time()
+        job.process = await asyncio.create_subprocess_exec(
+            sys.executable, WORKFLOW_SCRIPT, *job.indexes,
+            '--output-dir', job.output_dir, '--progress-file', job.progress_path,
+            cwd=PROJECT_ROOT,
+        )
+        if job.cancel_requested:
+            # 프로세스를 띄우는 동안 들어온 취소 요청은 cancel()이 종료할 프로세스가 없었으므로 여기서 처리합니다.
+            job.process.terminate()
+        watcher = asyncio.create_task(self._watch_progress(job))
+        try:
+            returncode = await asyncio.wait_for(job.process.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            job.process.kill()
+            await job.process.wait()
+            await self._finish(job, 'failed', f"{self.timeout}초 안에 끝나지 않아 중단했습니다.")
+            return
+        finally:
+            watcher.cancel()
+
+        if job.cancel_requested:
+            await self._finish(job, 'cancelled')
+        elif returncode != 0:
+            await self._finish(job, 'failed', f"워크플로우가 종료 코드 {returncode}로 끝났습니다.")
+        else:
+            await self._finish(job, 'done')
+
+    async def _watch_progress(self, job):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            progress = read_progress(job.progress_path)
+            if progress is not None and progress != job.progress:
+                job.progress = progress
+                await self._notify(job)
+
+    async def _notify(self, job):
+        for listener in list(job.listeners):
+            try:
+                await listener(job)
+            except Exception:
+                pass  # 메시지 갱신 실패로 작업을 멈추지 않습니다.
+
+    async def _finish(self, job, status, error=None):
+        if not job.is_active:
+            return
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        if self._active.get(job.index_name) is job:
+            del self._active[job.index_name]
+        await self._notify(job)
+        job._done.set()
+        self._prune()
+
+    def _prune(self):
+        # 방금 끝난 작업은 기다리던 요청이, 가장 최근에 완료된 작업은 `/report`가 읽어야 하므로 항상 남깁니다.
+        finished = [job for job in self.jobs if not job.is_active]
+        keep = set(finished[-max(self.history, 1):]) | {self.latest()}
+        for job in [job for job in finished if job not in keep]:
+            self.jobs.remove(job)
+            shutil.rmtree(job.output_dir, ignore_errors=True)
+
+
+# --- 기본 관리자 ---
+_manager = None
+
+def get_job_manager():
+    """config.ini의 [Bot] 설정에 따른 `/workflow` 작업 관리자를 반환합니다."""
+    global _manager
+    if _manager is None:
+        config = get_config_service()
+        _manager = JobManager(
+            os.path.join(PROJECT_ROOT, config.get('Bot', 'workflow_jobs_dir', fallback='data/jobs')),
+            workers=config.getint('Bot', 'workflow_workers', fallback=1),
+            timeout=config.getint('Bot', 'workflow_timeout', fallback=900),
+            history=config.getint('Bot', 'workflow_job_history', fallback=10),
+        )
+    return _manager
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+
+
+def analysis_config_key():
+    """
+    `/stock` 결과에 영향을 주는 설정([Analyzer] 섹션 전체와 데이터 공급자)을 비교 가능한 튜플로 반환합니다.
+    설정이 바뀌면 키가 달라지므로 이전 설정으로 만든 결과를 재사용하지 않습니다.
+    """
+    config = get_config_service()
+    analyzer = tuple(sorted(config['Analyzer'].items())) if config.has_section('Analyzer') else ()
+    provider = os.environ.get('MARKET_DATA_PROVIDER') or config.get('Data', 'provider', fallback='yfinance')
+    return analyzer + (('provider', provider),)
+
+
+def stock_cache_key(ticker):
+    """`/stock` 결과 캐시 키 ('<티커>:<관련 설정 해시>')를 만듭니다."""
+    config_hash = hashlib.sha1(json.dumps(analysis_config_key()).encode('utf-8')).hexdigest()[:12]
+    return f"{ticker}:{config_hash}"
+
+
+def format_age(seconds):
+    """경과 시간을 '45초', '3분', '2시간'처럼 짧게 표시합니다."""
+    if seconds < 60:
+        return f"{int(seconds)}초"
+    if seconds < 60 * 60:
+        return f"{int(seconds // 60)}분"
+    return f"{int(seconds // (60 * 60))}시간"
+
+
+class Uncached:
+    """compute()가 반환하면 값은 돌려주되 캐시에는 저장하지 않는 결과입니다. (예: 데이터 조회 실패로 일부만 분석된 출력)"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ResultCache:
+    """
+    `/stock` 종합 분석 결과를 (티커, 관련 설정) 키로 TTL 동안 보관하는 캐시입니다.
+
+    - 같은 키를 동시에 요청하면 키별 잠금으로 한 번만 계산하고, 기다린 요청은 그 결과를 함께 받습니다.
+    - 실패한 계산(예외 또는 Uncached 반환)은 저장하지 않으므로 다음 요청에서 다시 시도합니다.
+    - 최대 개수를 넘으면 가장 오래 사용하지 않은 결과부터 제거합니다(LRU).
+    - path를 주면 새 결과를 계산할 때마다 JSON 파일에 저장하므로, 봇과 터미널의 combined_analyzer.py가 결과를 공유합니다.
+    """
+
+    def __init__(self, ttl=600, max_entries=200, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._compute_locks = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _read_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, saved):
+        """파일의 결과 중 메모리에 없거나 더 최근에 계산된 것을 합칩니다. (잠금을 잡은 상태에서 호출)"""
+        for key, entry in sorted(saved.items(), key=lambda item: item[1]['computed']):
+            current = self._entries.get(key)
+            if current is None or entry['computed'] > current['computed']:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        self._merge(self._read_file())
+
+    def save(self):
+        """
+        아직 유효한 결과를 디스크에 저장합니다. 그 사이 다른 프로세스(봇, 터미널)가 저장한 결과를 먼저 읽어 합치므로
+        서로의 결과를 지우지 않습니다.
+        """
+        if not self.path:
+            return
+        saved = self._read_file()
+        now = time.time()
+        with self._lock:
+            self._merge(saved)
+            snapshot = {key: entry for key, entry in self._entries.items() if now - entry['computed'] <= self.ttl}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 봇과 터미널 프로세스가 동시에 저장해도 파일이 깨지지 않도록 프로세스별 임시 파일을 교체합니다.
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _fresh(self, key, now=None):
+        self._ensure_loaded()
+        entry = self._entries.get(key)
+        if entry is None or (now or time.time()) - entry['computed'] > self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_or_compute(self, key, compute):
+        """
+        키의 결과와 계산 시각을 (결과, 계산 시각 epoch, 캐시 사용 여부)로 반환합니다.
+        신선한 결과가 없을 때만 compute()를 호출합니다. compute()가 Uncached를 반환하면 그 값을 저장하지 않고 반환합니다.
+        (블로킹, 스레드에서 호출)
+        """
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self.hits += 1
+                return entry['value'], entry['computed'], True
+            compute_lock = self._compute_locks.setdefault(key, threading.Lock())
+
+        with compute_lock:
+            # 먼저 잠금을 잡은 요청이 계산을 마쳤다면 그 결과를 사용합니다.
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is not None:
+                    self.coalesced += 1
+                    return entry['value'], entry['computed'], True
+                self.misses += 1
+
+            value = compute()
+            computed = time.time()
+            if isinstance(value, Uncached):
+                with self._lock:
+                    self._compute_locks.pop(key, None)
+                return value.value, computed, False
+            with self._lock:
+                self._entries[key] = {'computed': computed, 'value': value}
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._compute_locks.pop(key, None)
+            try:
+                self.save()
+            except OSError:
+                pass  # 저장 실패로 결과 반환을 막지 않습니다.
+            return value, computed, False
+
+    def invalidate(self, ticker=None):
+        """특정 티커(없으면 전체)의 결과를 비웁니다."""
+        with self._lock:
+            for key in [key for key in self._entries if ticker is None or key.split(':')[0] == ticker]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'coalesced': self.coalesced, 'misses': self.misses}
+
+
+# --- 기본 캐시 ---
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_stock_cache():
+    """config.ini의 [Bot] stock_cache_ttl_minutes/stock_cache_size/stock_cache_file 설정에 따른 `/stock` 결과 캐시를 반환합니다."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = get_config_service()
+            _cache = ResultCache(
+                ttl=config.getfloat('Bot', 'stock_cache_ttl_minutes', fallback=10) * 60,
+                max_entries=config.getint('Bot', 'stock_cache_size', fallback=200),
+                path=os.path.join(PROJECT_ROOT, config.get('Bot', 'stock_cache_file', fallback='data/stock_cache.json')),
+            )
+        return _cache
@@ -0,0 +1,312 @@
+import os
+import io
+import sys
+import time
+import queue
+import threading
+import traceback
+import contextlib
+import subprocess
+from multiprocessing.connection import Connection
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, 'config.ini')
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+
+def _config_mtime():
+    try:
+        return os.path.getmtime(CONFIG_FILE_PATH)
+    except OSError:
+        return None
+
+
+def _worker_main():
+    """
+    워커 프로세스 본체: 무거운 모듈을 미리 임포트해 두고 표준 입력/출력 파이프로 들어오는 작업을 하나씩 처리합니다.
+    (봇 스크립트를 다시 임포트하지 않도록 multiprocessing 대신 별도 인터프리터로 실행합니다.)
+    """
+    recv_conn = Connection(os.dup(0), writable=False)
+    send_conn = Connection(os.dup(1), readable=False)
+    # 라이브러리가 표준 출력에 쓰는 내용이 통신 채널을 망가뜨리지 않도록 fd 1을 stderr로 돌립니다.
+    os.dup2(2, 1)
+    if PROJECT_ROOT not in sys.path:
+        sys.path.append(PROJECT_ROOT)
+    # 첫 요청에서 임포트 비용을 내지 않도록 분석에 필요한 모듈을 모두 미리 임포트합니다.
+    import yfinance  # noqa: F401
+    from combined_analyzer import get_combined_analysis, load_analysis_modules
+    load_analysis_modules()
+    from info_cache import save_caches
+    send_conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            kind, payload = recv_conn.recv()
+        except (EOFError, OSError):
+            break
+        if kind == 'stop':
+            break
+        if kind == 'ping':
+            send_conn.send(('pong', None))
+            continue
+        if kind == 'stock':
+            output = io.StringIO()
+            try:
+                # 워커는 작업을 하나씩만 처리하므로 표준 출력을 바꿔도 안전합니다.
+                with contextlib.redirect_stdout(output):
+                    complete = get_combined_analysis(payload)
+                result = ('ok' if complete else 'incomplete', output.getvalue())
+            except Exception:
+                result = ('error', traceback.format_exc())
+            send_conn.send(result)
+    save_caches()
+
+
+class _Worker:
+    def __init__(self, process):
+        self.process = process
+        self.send_conn = Connection(os.dup(process.stdin.fileno()), readable=False)
+        self.recv_conn = Connection(os.dup(process.stdout.fileno()), writable=False)
+        process.stdin.close()
+        process.stdout.close()
+        self.jobs = 0
+        self.started = time.time()
+        self.config_mtime = _config_mtime()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def call(self, kind, payload=None, timeout=None):
+        """작업을 보내고 (종류, 결과)를 받습니다. timeout 안에 응답이 없으면 None을 반환합니다."""
+        self.send_conn.send((kind, payload))
+        if not self.recv_conn.poll(timeout):
+            return None
+        return self.recv_conn.recv()
+
+    def close(self):
+        self.send_conn.close()
+        self.recv_conn.close()
+
+
+class WorkerPool:
+    """
+    `/stock` 분석을 처리하는 상주 워커 프로세스 풀입니다.
+
+    - 워커는 pandas, yfinance, pandas_ta와 분석 모듈을 미리 임포트한 상태로 대기하므로,
+      명령 지연 시간에는 분석 자체의 시간만 포함됩니다.
+    - max_jobs개 작업을 처리했거나 config.ini가 바뀐 워커는 교체하고, 시간 초과/비정상 종료된 워커는 강제 종료 후 교체합니다.
+    - health_interval초마다 대기 중인 워커에 ping을 보내 응답하지 않는 워커를 교체합니다.
+    """
+
+    def __init__(self, size=2, max_jobs=50, timeout=120, start_timeout=120, health_interval=60):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.health_interval = health_interval
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._pending = 0  # 백그라운드에서 띄우는 중인 워커 수
+        self._closed = False
+        self._health_thread = None
+        self.completed = 0
+        self.replaced = 0
+
+    # --- 워커 수명 관리 ---
+    def start(self):
+        """워커를 모두 띄우고 준비될 때까지 기다립니다. (봇 시작 시 스레드에서 호출)"""
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        if self.health_interval and self._health_thread is None:
+            self._health_thread = threading.Thread(target=self._health_loop, name='worker-pool-health', daemon=True)
+            self._health_thread.start()
+
+    def _spawn(self):
+        process = subprocess.Popen([sys.executable, WORKER_SCRIPT, '--worker'], cwd=PROJECT_ROOT,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        worker = _Worker(process)
+        if not worker.recv_conn.poll(self.start_timeout):
+            process.kill()
+            worker.close()
+            raise TimeoutError(f"워커 프로세스가 {self.start_timeout}초 안에 준비되지 않았습니다.")
+        worker.recv_conn.recv()
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker, graceful=True):
+        with self._lock:
+            self._workers.discard(worker)
+        if graceful and worker.is_alive():
+            try:
+                worker.send_conn.send(('stop', None))
+                worker.process.wait(5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                pass
+        if worker.is_alive():
+            worker.process.kill()
+            worker.process.wait(5)
+        worker.close()
+
+    def _replace(self, worker, graceful=True):
+        """워커를 종료하고 새 워커를 백그라운드에서 띄워 대기열에 넣습니다. (요청 응답을 늦추지 않도록)"""
+        self._retire(worker, graceful)
+        self.replaced += 1
+
+        def spawn():
+            try:
+                if not self._closed:
+                    self._idle.put(self._spawn())
+            except Exception:
+                # 다음 상태 확인에서 모자란 워커를 다시 띄웁니다.
+                pass
+            finally:
+                with self._lock:
+                    self._pending -= 1
+        with self._lock:
+            self._pending += 1
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def _needs_recycle(self, worker):
+        return worker.jobs >= self.max_jobs or worker.config_mtime != _config_mtime()
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("사용 가능한 분석 워커가 없습니다.")
+            try:
+                worker = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if not worker.is_alive():
+                self._replace(worker, graceful=False)
+                continue
+            if self._needs_recycle(worker):
+                self._replace(worker)
+                continue
+            return worker
+
+    def _release(self, worker):
+        if self._closed:
+            self._retire(worker)
+        elif self._needs_recycle(worker):
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+    # --- 작업 실행 ---
+    def run_stock(self, ticker, timeout=None):
+        """
+        워커 하나에서 combined_analyzer 종합 분석을 실행하고 (출력 텍스트, 분석 완료 여부)를 반환합니다. (블로킹, 스레드에서 호출)
+        데이터를 가져오지 못해 일부만 분석한 경우 완료 여부가 False입니다.
+        """
+        if self._closed:
+            raise RuntimeError("워커 풀이 종료되었습니다.")
+        timeout = timeout or self.timeout
+        worker = self._acquire(timeout)
+        try:
+            response = worker.call('stock', ticker, timeout)
+        except (EOFError, OSError) as e:
+            self._replace(worker, graceful=False)
+            raise RuntimeError(f"분석 워커가 비정상 종료되었습니다: {e}") from e
+        if response is None:
+            self._replace(worker, graceful=False)
+            raise TimeoutError(f"'{ticker}' 분석이 {timeout}초 안에 끝나지 않았습니다.")
+        kind, payload = response
+
+        worker.jobs += 1
+        self.completed += 1
+        self._release(worker)
+        if kind == 'error':
+            raise RuntimeError(payload)
+        return payload, kind == 'ok'
+
+    # --- 상태 확인 ---
+    def health_check(self, timeout=5):
+        """대기 중인 워커에 ping을 보내 응답하지 않거나 종료된 워커를 교체하고, 모자란 워커를 채웁니다."""
+        checked = []
+        while True:
+            try:
+                checked.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in checked:
+            try:
+                response = worker.call('ping', timeout=timeout)
+                healthy = response is not None and response[0] == 'pong'
+            except (EOFError, OSError):
+                healthy = False
+            if not healthy:
+                self._replace(worker, graceful=False)
+            else:
+                self._release(worker)
+        with self._lock:
+            missing = self.size - len(self._workers) - self._pending
+        for _ in range(max(0, missing)):
+            if self._closed:
+                break
+            self._idle.put(self._spawn())
+
+    def _health_loop(self):
+        while not self._closed:
+            time.sleep(self.health_interval)
+            if self._closed:
+                break
+            try:
+                self.health_check()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            'workers': len(workers),
+            'idle': self._idle.qsize(),
+            'completed': self.completed,
+            'replaced': self.replaced,
+            'jobs_per_worker': sorted(worker.jobs for worker in workers),
+        }
+
+    def close(self):
+        """모든 워커를 종료합니다. 실행 중인 작업은 끝난 뒤 종료됩니다."""
+        self._closed = True
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+# --- 기본 풀 ---
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_stock_pool():
+    """config.ini의 [Bot] 설정에 따른 `/stock`용 워커 풀을 반환합니다. stock_workers가 0이면 None을 반환합니다."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = get_config_service()
+            size = config.getint('Bot', 'stock_workers', fallback=2)
+            if size <= 0:
+                return None
+            _pool = WorkerPool(
+                size=size,
+                max_jobs=config.getint('Bot', 'stock_worker_max_jobs', fallback=50),
+                timeout=config.getint('Bot', 'stock_timeout', fallback=120),
+                health_interval=config.getint('Bot', 'worker_health_interval', fallback=60),
+            )
+        return _pool
+
+
+if __name__ == '__main__' and '--worker' in sys.argv:
+    _worker_main()
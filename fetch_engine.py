@@ -0,0 +1,120 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config_service import get_config_service
+from market_data import get_provider
+from workflow_metrics import get_metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class TokenBucket:
+    """
+    전역 요청 속도 제한기입니다. 초당 rate 개의 토큰이 채워지며 최대 capacity 개까지 쌓입니다.
+    한 번에 capacity보다 큰 비용을 요청하면 토큰이 음수(빚)가 되고, 다음 요청자들이 그만큼 더 기다립니다.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """cost 만큼의 토큰을 사용할 수 있을 때까지 대기합니다. rate가 0 이하이면 제한하지 않습니다."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                needed = min(cost, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= cost
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def get_fetch_options():
+    """config.ini의 [Data] 섹션에서 동시 요청 설정을 읽습니다. 로컬 공급자(리플레이, 합성)는 속도 제한을 두지 않습니다."""
+    config = get_config_service()
+    return {
+        'workers': config.getint('Data', 'fetch_workers', fallback=8),
+        'rate': config.getfloat('Data', 'fetch_rate_per_sec', fallback=8.0) if get_provider().is_remote else 0,
+        'retries': config.getint('Data', 'fetch_retries', fallback=3),
+        'batch_size': config.getint('Data', 'fetch_batch_size', fallback=50),
+    }
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_rate_limiter(rate):
+    """같은 속도 설정을 쓰는 모든 호출이 공유하는 프로세스 전역 토큰 버킷을 반환합니다."""
+    with _buckets_lock:
+        if rate not in _buckets:
+            _buckets[rate] = TokenBucket(rate)
+        return _buckets[rate]
+
+
+def fetch_all(func, items, workers=None, rate=None, retries=None, backoff=1.0, cost=None, progress=None):
+    """
+    items의 각 항목에 대해 func(item)을 스레드 풀에서 동시에 실행합니다.
+
+    Args:
+        func (callable): 항목 하나를 받아 결과를 반환하는 함수.
+        items (list): 처리할 항목 리스트 (티커, 티커 묶음 등).
+        workers (int): 최대 동시 실행 수. 기본값은 config.ini의 fetch_workers.
+        rate (float): 전역 초당 요청 수 제한. 0 이하이면 제한하지 않습니다.
+        retries (int): 실패 시 재시도 횟수. 재시도 간격은 backoff * 2^시도 + 지터입니다.
+        cost (callable): 항목 하나가 소비하는 토큰 수를 반환하는 함수 (예: 묶음 다운로드의 티커 수).
+        progress (callable): 항목이 끝날 때마다 progress(완료 수, 전체 수, 항목)을 호출합니다.
+
+    Returns:
+        tuple: (성공한 항목별 결과 딕셔너리, 실패한 항목별 마지막 예외 딕셔너리). 일부가 실패해도 나머지 결과는 반환합니다.
+    """
+    options = get_fetch_options()
+    workers = workers or options['workers']
+    rate = options['rate'] if rate is None else rate
+    retries = options['retries'] if retries is None else retries
+    bucket = get_rate_limiter(rate)
+
+    def run(item):
+        for attempt in range(retries + 1):
+            bucket.acquire(cost(item) if cost else 1)
+            try:
+                return func(item)
+            except Exception:
+                if attempt == retries:
+                    get_metrics().inc('fetch_failures_total')
+                    raise
+                get_metrics().inc('fetch_retries_total')
+                time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff / 2))
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, item): item for item in items}
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                errors[item] = e
+            if progress:
+                progress(done, len(futures), item)
+
+    # 입력 순서를 유지합니다.
+    ordered = {item: results[item] for item in items if item in results}
+    return ordered, errors
+
+
+def chunked(items, size):
+    """리스트를 size 개씩 나눈 튜플 리스트를 반환합니다."""
+    size = max(1, size)
+    return [tuple(items[i:i + size]) for i in range(0, len(items), size)]
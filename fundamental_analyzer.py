@@ -1,109 +1,170 @@
-import yfinance as yf
-import pandas as pd
 import sys
 import re
-import requests
-import time # time 모듈 임포트
+from dataclasses import dataclass, asdict, replace
+# market_data/info_cache(pandas 포함)는 분석할 때 임포트합니다. FundamentalAnalysis 레코드와
+# 페이지 추출기만 쓰는 쪽(봇의 /report 렌더링 등)이 pandas를 임포트하지 않도록 하기 위함입니다.
+
+# 펀더멘탈 분석에 사용하는 info 필드 (캐시 신선도 판단용)
+FUNDAMENTAL_INFO_FIELDS = ('recommendationKey', 'targetMeanPrice', 'regularMarketPrice', 'currentPrice',
+                           'numberOfAnalystOpinions', 'forwardPE', 'profitMargins', 'returnOnEquity', 'sector')
+
+# --- 분석 페이지 폴백 추출기 ---
+# 세 구간(추천 추이, EPS 추정치, 5년 성장률)을 하나의 패턴으로 묶어 페이지를 한 번만 훑습니다.
+ANALYSIS_PAGE_SECTIONS = re.compile(
+    r'(?s:Recommendation Trends(?P<trends>.*?)</div>)'
+    r'|(?s:Earnings Estimate(?P<earnings>.*?)Revenue Estimate)'
+    r'|Next 5 Years \(per annum\)</td>.*?<span>(?P<growth>[\d\.\-%]+)</span>'
+)
+RECOMMENDATION_TREND = re.compile(r'([\d\.]+)</span.*?([a-zA-Z ]+)</div>')
+EPS_AVG_ESTIMATE = re.compile(r"Avg. Estimate</td>.*?<span>([\d\.\-]+)</span>")
+RECOMMENDATION_LABELS = {'Strong Buy': '강력 매수', 'Buy': '매수', 'Hold': '중립', 'Underperform': '시장 하회', 'Sell': '매도'}
+CAMEL_CASE_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+
+def _to_float(text):
+    try:
+        return float(text.strip('%'))
+    except ValueError:
+        return None
+
 
-def get_fundamental_analysis(ticker, sector_avg_pe=None):
+def extract_analysis_page(content):
+    """
+    Yahoo Finance 분석 페이지 HTML에서 폴백용 데이터를 추출합니다.
+    반환값: {'recommendation_trends': [[개수, 의견], ...], 'eps_estimates': [올해, 내년, ...], 'five_year_growth': 값}
+    (찾지 못한 항목은 포함하지 않습니다.)
+    """
+    parsed = {}
+    if not content:
+        return parsed
+    for match in ANALYSIS_PAGE_SECTIONS.finditer(content):
+        if match.group('trends') is not None and 'recommendation_trends' not in parsed:
+            parsed['recommendation_trends'] = [list(trend) for trend in RECOMMENDATION_TREND.findall(match.group('trends'))]
+        elif match.group('earnings') is not None and 'eps_estimates' not in parsed:
+            parsed['eps_estimates'] = [_to_float(value) for value in EPS_AVG_ESTIMATE.findall(match.group('earnings'))]
+        elif match.group('growth') is not None and 'five_year_growth' not in parsed:
+            parsed['five_year_growth'] = _to_float(match.group('growth'))
+        if len(parsed) == 3:
+            break
+    return parsed
+
+
+def get_analysis_page_data(ticker):
+    """
+    분석 페이지 파싱 결과를 캐시를 거쳐 가져옵니다. 페이지 요청은 재시도와 대기가 있어 비싸므로
+    [Data] analysis_page_ttl_hours 동안 파싱 결과를 디스크에 보관해 재사용합니다.
     """
-    yfinance와 웹 스크레이핑을 사용하여 특정 티커에 대한 펀더멘탈 및 애널리스트 분석을 제공합니다.
-    sector_avg_pe 딕셔너리를 받아 산업 평균 P/E를 결과에 포함할 수 있습니다.
+    from info_cache import HOUR, shared_cache
+    cache = shared_cache('analysis_page', options=lambda config: {
+        'field_ttls': {},
+        'default_ttl': config.getfloat('Data', 'analysis_page_ttl_hours', fallback=12) * HOUR,
+        'fetch': lambda provider, page_ticker: extract_analysis_page(provider.get_analysis_page(page_ticker)),
+        'metric': 'analysis_page_cache_requests_total',
+    })
+    return cache.get(ticker)
+
+
+@dataclass(slots=True)
+class FundamentalAnalysis:
     """
-    print(f"\n--- {ticker} 펀더멘탈 및 애널리스트 분석 ---")
+    티커 하나의 펀더멘탈/애널리스트 분석 결과입니다. 구할 수 없는 값은 None이며, 비율은 % 단위입니다.
+    출력 형식은 fundamental_report 모듈이 담당합니다.
+    """
+    ticker: str
+    recommendation: str = 'N/A'
+    recommendation_breakdown: tuple = ()  # ((의견, 개수), ...)
+    analyst_count: int | None = None
+    current_price: float | None = None
+    target_price: float | None = None
+    upside_pct: float | None = None
+    eps_growth_pct: float | None = None
+    five_year_growth_pct: float | None = None
+    forward_pe: float | None = None
+    sector: str | None = None
+    sector_avg_pe: float | None = None
+    sector_pe_percentile: float | None = None  # 섹터 안에서 P/E가 더 낮은 종목 비율(%)
+    profit_margin_pct: float | None = None
+    roe_pct: float | None = None
+    notes: tuple = ()  # 분석 중 남긴 디버그 메시지
+    error: str | None = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data['recommendation_breakdown'] = tuple(tuple(item) for item in data.get('recommendation_breakdown', ()))
+        data['notes'] = tuple(data.get('notes', ()))
+        return cls(**data)
+
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+
+def analyze_fundamentals(ticker, sector_avg_pe=None, sector_stats=None):
+    """
+    yfinance와 웹 스크레이핑을 사용하여 특정 티커에 대한 펀더멘탈 및 애널리스트 분석 결과를 반환합니다.
+    sector_avg_pe 딕셔너리 또는 sector_stats(SectorStats)를 받아 산업 평균 P/E를 결과에 포함할 수 있으며,
+    sector_stats를 주면 섹터 안에서의 P/E 백분위도 함께 계산합니다.
+    출력을 하지 않으므로 여러 스레드에서 동시에 호출할 수 있습니다. 오류가 나면 error가 채워진 결과를 반환합니다.
+    """
+    from market_data import get_provider
+    from info_cache import get_info
+
+    result = FundamentalAnalysis(ticker)
+    notes = []
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        url = f"https://finance.yahoo.com/quote/{ticker}/analysis/"
-        content = ""
-        
-        # 웹 스크레이핑 시도 (yfinance .analysis 데이터가 없을 경우 폴백용)
-        for attempt in range(3): # 최대 3번 재시도
-            try:
-                header = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-                "Accept-Language": "en-US,en;q=0.9,ko;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-            }
-                response = requests.get(url, headers=header, timeout=10)
-                response.raise_for_status()
-                content = response.text
-                break # 성공 시 루프 탈출
-            except requests.exceptions.HTTPError as http_err:
-                if http_err.response.status_code == 404:
-                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 404 오류 발생")
-                    break
-                elif http_err.response.status_code == 503:
-                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 503 오류 발생 (재시도 {attempt + 1}/3)... {http_err}")
-                    time.sleep(2) # 2초 대기 후 재시도
-                else:
-                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 HTTP 오류 발생: {http_err}")
-                    break # 다른 HTTP 오류는 재시도 안 함
-            except Exception as web_e:
-                print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 기타 오류 발생: {web_e}")
-                break # 기타 오류는 재시도 안 함
+        provider = get_provider()
+        info = get_info(ticker, fields=FUNDAMENTAL_INFO_FIELDS)
+        # 웹 스크레이핑 결과는 yfinance 데이터가 부족할 때만 처음 필요해지는 시점에 가져옵니다.
+        page_data = None
+
+        def analysis_page():
+            nonlocal page_data
+            if page_data is None:
+                page_data = get_analysis_page_data(ticker)
+            return page_data
 
         # --- 1. 애널리스트 종합 의견 (상세) ---
-        recommendation = info.get('recommendationKey', 'N/A').replace('_', ' ').title()
-        recommendation_details = ""
+        result.recommendation = info.get('recommendationKey', 'N/A').replace('_', ' ').title()
+        breakdown = []
 
         # yfinance의 stock.recommendations 데이터 사용 시도
         try:
-            recs = stock.recommendations
+            recs = provider.get_recommendations(ticker)
             if recs is not None and not recs.empty:
                 # 최신 추천 데이터만 사용
                 latest_recs = recs.iloc[-1]
-                details_list = []
                 # 컬럼 이름을 순회하며 0보다 큰 값을 가진 항목만 추가
                 for rec_type in ['strongBuy', 'buy', 'hold', 'sell', 'strongSell']:
                     if rec_type in latest_recs and latest_recs[rec_type] > 0:
                         # 컬럼 이름에서 카멜 케이스를 분리 (예: strongBuy -> Strong Buy)
-                        label = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', rec_type).title()
-                        details_list.append(f"{label}:{int(latest_recs[rec_type])}")
-
-                if details_list:
-                    recommendation_details = f" ({', '.join(details_list)})"
+                        label = CAMEL_CASE_BOUNDARY.sub(' ', rec_type).title()
+                        breakdown.append((label, int(latest_recs[rec_type])))
         except Exception as e:
-            print(f"  - 디버그: yfinance stock.recommendations 접근 중 오류: {e}")
-            pass # 오류 발생 시 웹 스크레이핑 폴백으로 진행
-
-        # stock.recommendations에서 상세 정보를 얻지 못했고, 웹 스크레이핑 content가 있다면 파싱 시도
-        if not recommendation_details and content: 
-            try:
-                rec_trends_html = re.search(r'Recommendation Trends(.*?)</div>', content, re.DOTALL)
-                if rec_trends_html:
-                    trends = re.findall(r'([\d\.]+)</span.*?([a-zA-Z ]+)</div>', rec_trends_html.group(1))
-                    details = []
-                    mapping = {'Strong Buy': '강력 매수', 'Buy': '매수', 'Hold': '중립', 'Underperform': '시장 하회', 'Sell': '매도'}
-                    for count, key in trends:
-                        if key in mapping:
-                            details.append(f"{mapping[key]}:{count}")
-                    if details:
-                        recommendation_details = f" ({', '.join(details)})"
-            except Exception as parse_e:
-                print(f"  - 디버그: 애널리스트 의견 웹 파싱 실패: {parse_e}")
-        
-        final_recommendation = f"{recommendation}{recommendation_details}"
-
-        target_price = info.get('targetMeanPrice')
-        current_price = info.get('regularMarketPrice') or info.get('currentPrice')
+            notes.append(f"yfinance stock.recommendations 접근 중 오류: {e}") # 오류 발생 시 웹 스크레이핑 폴백으로 진행
+
+        # stock.recommendations에서 상세 정보를 얻지 못했을 때만 웹 스크레이핑 결과를 사용합니다.
+        if not breakdown:
+            breakdown = [(RECOMMENDATION_LABELS[key], int(float(count)))
+                         for count, key in analysis_page().get('recommendation_trends', []) if key in RECOMMENDATION_LABELS]
+        result.recommendation_breakdown = tuple(breakdown)
+
+        result.target_price = _optional_float(info.get('targetMeanPrice'))
+        result.current_price = _optional_float(info.get('regularMarketPrice') or info.get('currentPrice'))
         analyst_count = info.get('numberOfAnalystOpinions')
-        
-        upside_potential = None
-        if target_price and current_price:
-            upside_potential = ((target_price - current_price) / current_price) * 100
+        result.analyst_count = int(analyst_count) if analyst_count is not None else None
+        if result.target_price and result.current_price:
+            result.upside_pct = ((result.target_price - result.current_price) / result.current_price) * 100
 
         # --- 2. 성장성 전망 ---
-        yoy_growth, five_year_growth = None, None
-        
         # yfinance .analysis 데이터 우선 사용
         try:
-            analysis = stock.analysis
+            analysis = provider.get_analysis(ticker)
             if analysis is None or analysis.empty:
-                print("  - 디버그: yfinance .analysis 데이터가 비어있습니다. 웹 스크레이핑 시도.")
+                notes.append("yfinance .analysis 데이터가 비어있습니다. 웹 스크레이핑 시도.")
                 raise ValueError("Empty analysis data") # 웹 스크레이핑 폴백 로직을 타도록 예외 발생
 
             # yfinance 라이브러리에서 데이터 추출
@@ -111,102 +172,58 @@ def get_fundamental_analysis(ticker, sector_avg_pe=None):
             current_year_eps = eps_estimate[eps_estimate.index == '0y']['Avg. Estimate'].iloc[0]
             next_year_eps = eps_estimate[eps_estimate.index == '+1y']['Avg. Estimate'].iloc[0]
             if current_year_eps and next_year_eps and current_year_eps > 0:
-                yoy_growth = ((next_year_eps - current_year_eps) / current_year_eps) * 100
+                result.eps_growth_pct = float((next_year_eps - current_year_eps) / current_year_eps) * 100
 
             growth_estimate = analysis.loc['Growth']
             five_year_growth_str = growth_estimate[growth_estimate.index == '+5y']['Avg. Estimate'].iloc[0]
             if isinstance(five_year_growth_str, str) and '%' in five_year_growth_str:
-                five_year_growth = float(five_year_growth_str.strip('%'))
+                result.five_year_growth_pct = float(five_year_growth_str.strip('%'))
 
         except Exception:
             # 폴백(Fallback) 로직: Yahoo Finance 웹에서 직접 데이터 가져오기
-            if content: # 웹 스크레이핑 성공했을 경우에만 파싱 시도
-                try:
-                    earnings_table = re.search(r"Earnings Estimate(.*?)Revenue Estimate", content, re.DOTALL)
-                    if earnings_table:
-                        estimates = re.findall(r"Avg. Estimate</td>.*?<span>([\d\.\-]+)</span>", earnings_table.group(1))
-                        if len(estimates) >= 2:
-                            current_year_eps = float(estimates[0])
-                            next_year_eps = float(estimates[1])
-                            if current_year_eps > 0:
-                                yoy_growth = ((next_year_eps - current_year_eps) / current_year_eps) * 100
-                    
-                    growth_match = re.search(r"Next 5 Years \(per annum\)</td>.*?<span>([\d\.\-%]+)</span>", content)
-                    if growth_match:
-                        five_year_growth = float(growth_match.group(1).strip('%'))
-                except Exception as web_e:
-                    print(f"    - 디버그: 웹 데이터 파싱 실패: {web_e}")
+            page = analysis_page()
+            estimates = page.get('eps_estimates', [])
+            if len(estimates) >= 2 and None not in estimates[:2]:
+                current_year_eps, next_year_eps = estimates[:2]
+                if current_year_eps > 0:
+                    result.eps_growth_pct = ((next_year_eps - current_year_eps) / current_year_eps) * 100
+            if page.get('five_year_growth') is not None:
+                result.five_year_growth_pct = page['five_year_growth']
 
         # --- 3. 핵심 통계 ---
-        forward_pe = info.get('forwardPE')
-        profit_margin = info.get('profitMargins', 0) * 100
-        roe = info.get('returnOnEquity', 0) * 100
-        sector = info.get('sector')
-        avg_pe_for_sector = sector_avg_pe.get(sector) if sector_avg_pe and sector else None
-
-        # P/E 비교 문자열 생성
-        pe_display_string = "N/A"
-        if forward_pe and avg_pe_for_sector:
-            pe_diff = forward_pe - avg_pe_for_sector
-            pe_display_string = f"{forward_pe:.2f} (평균 대비 {pe_diff:+.2f})"
-        elif forward_pe:
-            pe_display_string = f"{forward_pe:.2f} (산업 평균 N/A)"
-
-        # 애널리스트 분석 문자열 생성
-        recommendation_breakdown = recommendation_details.strip(" ()")
-
-        # 현재가 및 상승여력 문자열 생성
-        price_display_string = "N/A"
-        if current_price and upside_potential is not None:
-            price_display_string = f"{current_price:.2f} (Target Upside: {upside_potential:+.2f}%)"
-        elif current_price:
-            price_display_string = f"{current_price:.2f}"
-
-        # --- 4. 결과 취합 및 출력 ---
-        results = {
-            "Analyst Recommendation": recommendation,
-            "Detailed": recommendation_breakdown if recommendation_breakdown else "N/A",
-            "Current Price": price_display_string,
-            "Next Year EPS Growth (YoY)": f"{yoy_growth:.2f}%" if yoy_growth is not None else "N/A",
-            "5-Year Growth Estimate": f"{five_year_growth:.2f}%" if five_year_growth is not None else "N/A",
-            "Forward P/E (vs Sector)": pe_display_string,
-            "Profit Margin": f"{profit_margin:.2f}%",
-            "Return on Equity (ROE)": f"{roe:.2f}%"
-        }
-
-        print("\n--- 분석 결과 ---")
-        for key, value in results.items():
-            print(f"  - {key}: {value}")
-
-        # --- 5. 종합 분석 요약 ---
-        summary = []
-        if analyst_count and recommendation != 'N/A':
-            if upside_potential is not None:
-                summary.append(f"애널리스트들은 '{recommendation}' 의견이며, 평균적으로 {upside_potential:.2f}%의 주가 상승 여력을 기대합니다 ({analyst_count}명 참여). ")
-            else:
-                summary.append(f"애널리스트들은 '{recommendation}' 의견입니다 ({analyst_count}명 참여). ")
-        
-        if yoy_growth is not None or five_year_growth is not None:
-            growth_summary = "이는 "
-            if yoy_growth is not None:
-                growth_summary += f"다음 연도 예상 EPS 성장률 {results['Next Year EPS Growth (YoY)']}"
-                if five_year_growth is not None:
-                    growth_summary += " 및 "
-            if five_year_growth is not None:
-                growth_summary += f"향후 5년 연평균 성장률 전망 {results['5-Year Growth Estimate']}"
-            growth_summary += "에 기반한 것으로 보입니다. "
-            summary.append(growth_summary)
-
-        summary.append(f"현재 {results['Forward P/E (vs Sector)']}이며, 수익성은 순이익률 {results['Profit Margin']}, 자기자본이익률 {results['Return on Equity (ROE)']}로 나타납니다.")
-
-        print("\n--- 종합 요약 ---")
-        print(' '.join(summary))
-        
-        return results
+        result.forward_pe = _optional_float(info.get('forwardPE'))
+        result.profit_margin_pct = info.get('profitMargins', 0) * 100
+        result.roe_pct = info.get('returnOnEquity', 0) * 100
+        result.sector = info.get('sector')
+        if sector_stats is not None:
+            result = with_sector_stats(result, sector_stats)
+        elif sector_avg_pe and result.sector:
+            result.sector_avg_pe = _optional_float(sector_avg_pe.get(result.sector))
 
     except Exception as e:
-        print(f"'{ticker}' 분석 중 오류 발생: {e}")
-        return None
+        result.error = str(e)
+    result.notes = tuple(notes)
+    return result
+
+
+def with_sector_stats(result, sector_stats):
+    """
+    결과의 산업 평균 P/E와 섹터 백분위를 sector_stats(SectorStats) 기준으로 채운 사본을 반환합니다.
+    한 번 분석한 종목을 여러 지수의 섹터 통계와 비교할 때 다시 분석하지 않고 사용합니다.
+    """
+    if not result.sector or result.error:
+        return result
+    return replace(result, sector_avg_pe=sector_stats.mean(result.sector),
+                   sector_pe_percentile=sector_stats.percentile_rank(result.sector, result.forward_pe))
+
+
+def get_fundamental_analysis(ticker, sector_avg_pe=None, sector_stats=None):
+    """analyze_fundamentals 결과를 출력하고 반환합니다. (터미널, `/stock`용)"""
+    from fundamental_report import format_fundamental_analysis
+    result = analyze_fundamentals(ticker, sector_avg_pe, sector_stats)
+    print(format_fundamental_analysis(result), end='')
+    return result
+
 
 if __name__ == '__main__':
     if len(sys.argv) > 1:
@@ -0,0 +1,107 @@
+import os
+import json
+
+from fundamental_analyzer import FundamentalAnalysis
+
+# 워크플로우 5단계 결과 파일: 구조화된 결과(JSON)와 사람이 읽는 리포트(텍스트)
+RESULTS_JSON = 'fundamental_analysis_results.json'
+RESULTS_TEXT = 'fundamental_analysis_results.txt'
+SEPARATOR = "-" * 50
+
+
+def display_fields(result):
+    """결과 한 건을 '분석 결과' 항목별 표시 문자열 딕셔너리로 변환합니다."""
+    pe_display = "N/A"
+    if result.forward_pe and result.sector_avg_pe:
+        pe_display = f"{result.forward_pe:.2f} (평균 대비 {result.forward_pe - result.sector_avg_pe:+.2f}"
+        if result.sector_pe_percentile is not None:
+            pe_display += f", 섹터 백분위 {result.sector_pe_percentile:.0f}"
+        pe_display += ")"
+    elif result.forward_pe:
+        pe_display = f"{result.forward_pe:.2f} (산업 평균 N/A)"
+
+    price_display = "N/A"
+    if result.current_price and result.upside_pct is not None:
+        price_display = f"{result.current_price:.2f} (Target Upside: {result.upside_pct:+.2f}%)"
+    elif result.current_price:
+        price_display = f"{result.current_price:.2f}"
+
+    breakdown = ', '.join(f"{label}:{count}" for label, count in result.recommendation_breakdown)
+    return {
+        "Analyst Recommendation": result.recommendation,
+        "Detailed": breakdown or "N/A",
+        "Current Price": price_display,
+        "Next Year EPS Growth (YoY)": f"{result.eps_growth_pct:.2f}%" if result.eps_growth_pct is not None else "N/A",
+        "5-Year Growth Estimate": f"{result.five_year_growth_pct:.2f}%" if result.five_year_growth_pct is not None else "N/A",
+        "Forward P/E (vs Sector)": pe_display,
+        "Profit Margin": f"{result.profit_margin_pct:.2f}%",
+        "Return on Equity (ROE)": f"{result.roe_pct:.2f}%",
+    }
+
+
+def format_summary(result, fields):
+    """'종합 요약' 문단을 만듭니다."""
+    summary = []
+    if result.analyst_count and result.recommendation != 'N/A':
+        if result.upside_pct is not None:
+            summary.append(f"애널리스트들은 '{result.recommendation}' 의견이며, 평균적으로 {result.upside_pct:.2f}%의 주가 상승 여력을 기대합니다 ({result.analyst_count}명 참여). ")
+        else:
+            summary.append(f"애널리스트들은 '{result.recommendation}' 의견입니다 ({result.analyst_count}명 참여). ")
+
+    if result.eps_growth_pct is not None or result.five_year_growth_pct is not None:
+        growth_summary = "이는 "
+        if result.eps_growth_pct is not None:
+            growth_summary += f"다음 연도 예상 EPS 성장률 {fields['Next Year EPS Growth (YoY)']}"
+            if result.five_year_growth_pct is not None:
+                growth_summary += " 및 "
+        if result.five_year_growth_pct is not None:
+            growth_summary += f"향후 5년 연평균 성장률 전망 {fields['5-Year Growth Estimate']}"
+        growth_summary += "에 기반한 것으로 보입니다. "
+        summary.append(growth_summary)
+
+    summary.append(f"현재 {fields['Forward P/E (vs Sector)']}이며, 수익성은 순이익률 {fields['Profit Margin']}, 자기자본이익률 {fields['Return on Equity (ROE)']}로 나타납니다.")
+    return ' '.join(summary)
+
+
+def format_fundamental_analysis(result):
+    """결과 한 건을 터미널/리포트용 텍스트로 만듭니다."""
+    lines = [f"\n--- {result.ticker} 펀더멘탈 및 애널리스트 분석 ---"]
+    lines += [f"  - 디버그: {note}" for note in result.notes]
+    if result.error is not None:
+        lines.append(f"'{result.ticker}' 분석 중 오류 발생: {result.error}")
+        return "\n".join(lines) + "\n"
+
+    fields = display_fields(result)
+    lines.append("\n--- 분석 결과 ---")
+    lines += [f"  - {key}: {value}" for key, value in fields.items()]
+    lines.append("\n--- 종합 요약 ---")
+    lines.append(format_summary(result, fields))
+    return "\n".join(lines) + "\n"
+
+
+def format_report_parts(results, chunk_size=2):
+    """결과 리스트를 Discord 메시지 하나에 들어갈 만큼(chunk_size개씩) 나눈 리포트 텍스트 리스트로 만듭니다."""
+    total_parts = (len(results) + chunk_size - 1) // chunk_size
+    parts = []
+    for part, i in enumerate(range(0, len(results), chunk_size), start=1):
+        chunk = [f"--- 펀더멘탈 분석 (Part {part}/{total_parts}) ---\n"]
+        chunk += [format_fundamental_analysis(result) + SEPARATOR + "\n" for result in results[i:i + chunk_size]]
+        parts.append("\n".join(chunk))
+    return parts
+
+
+def save_results(results, directory):
+    """결과 리스트를 JSON과 텍스트 리포트로 저장합니다. 저장한 (JSON 경로, 텍스트 경로)를 반환합니다."""
+    json_path = os.path.join(directory, RESULTS_JSON)
+    text_path = os.path.join(directory, RESULTS_TEXT)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump([result.to_dict() for result in results], f, ensure_ascii=False)
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(format_report_parts(results)))
+    return json_path, text_path
+
+
+def load_results(path):
+    """save_results로 저장한 JSON 파일을 FundamentalAnalysis 리스트로 읽습니다."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [FundamentalAnalysis.from_dict(item) for item in json.load(f)]
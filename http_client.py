@@ -0,0 +1,144 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from config_service import get_config_service
+from workflow_metrics import get_metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _accept_encoding():
+    """brotli 디코더가 없으면 'br'을 요청하지 않습니다. (응답을 풀 수 없는 압축 형식을 받지 않도록)"""
+    try:
+        import brotli  # noqa: F401
+        return 'gzip, deflate, br'
+    except ImportError:
+        return 'gzip, deflate'
+
+ACCEPT_ENCODING = _accept_encoding()
+# 디스크 캐시에 함께 보관하는 응답 헤더
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpClient:
+    """
+    모든 웹 스크레이핑 요청이 공유하는 HTTP 클라이언트입니다.
+
+    - 하나의 requests.Session으로 호스트별 keep-alive 연결을 재사용합니다.
+    - ETag/Last-Modified가 있는 응답은 디스크에 (gzip으로 압축해) 저장해 두고, 다음 요청에서
+      If-None-Match/If-Modified-Since로 재검증합니다. 304 응답이면 저장된 본문을 그대로 반환합니다.
+    - 응답 본문의 gzip/deflate 압축은 requests가 자동으로 풉니다.
+    """
+
+    def __init__(self, cache_dir=None, timeout=10, pool_size=16):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.json'), os.path.join(self.cache_dir, f'{key}.body.gz')
+
+    def _load(self, url):
+        if not self.cache_dir:
+            return None, None
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = gzip.decompress(f.read())
+        except (OSError, ValueError, EOFError):
+            return None, None
+        if meta.get('url') != url:
+            return None, None
+        return meta, body
+
+    def _store(self, url, response):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'fetched': time.time(),
+            'encoding': response.encoding,
+            'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 여러 스레드가 같은 URL을 동시에 저장해도 섞이지 않도록 스레드별 임시 파일에 쓴 뒤 교체합니다.
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(body_path + suffix, 'wb') as f:
+            f.write(gzip.compress(response.content, compresslevel=6))
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(body_path + suffix, body_path)
+        os.replace(meta_path + suffix, meta_path)
+
+    @staticmethod
+    def _cached_response(url, meta, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.url = url
+        response._content = body
+        response.encoding = meta.get('encoding')
+        response.headers = CaseInsensitiveDict(meta.get('headers', {}))
+        response.from_cache = True
+        return response
+
+    def get(self, url, headers=None, timeout=None, use_cache=True):
+        """
+        GET 요청을 보내고 requests.Response를 반환합니다. 디스크 캐시로 재검증된 응답은 from_cache가 True입니다.
+        상태 코드 확인(raise_for_status)은 호출하는 쪽에서 합니다.
+        """
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = ACCEPT_ENCODING
+        meta, body = self._load(url) if use_cache else (None, None)
+        if meta:
+            if 'ETag' in meta['headers']:
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if 'Last-Modified' in meta['headers']:
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+        if response.status_code == 304 and meta:
+            get_metrics().inc('http_requests_total', result='not_modified')
+            return self._cached_response(url, meta, body)
+
+        get_metrics().inc('http_requests_total', result='fetched' if response.ok else 'error')
+        response.from_cache = False
+        if (use_cache and self.cache_dir and response.status_code == 200
+                and ('ETag' in response.headers or 'Last-Modified' in response.headers)):
+            try:
+                self._store(url, response)
+            except OSError:
+                pass  # 캐시 저장 실패로 요청을 실패시키지 않습니다.
+        return response
+
+
+# --- 기본 클라이언트 ---
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """config.ini의 [Data] http_cache_dir/http_pool_size 설정에 따른 프로세스 전역 HTTP 클라이언트를 반환합니다."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = get_config_service()
+            cache_dir = config.get('Data', 'http_cache_dir', fallback='data/http_cache')
+            _client = HttpClient(
+                cache_dir=os.path.join(PROJECT_ROOT, cache_dir) if cache_dir else None,
+                pool_size=config.getint('Data', 'http_pool_size', fallback=16),
+            )
+        return _client
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+# 경로 문제 해결 및 config 임포트
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+from market_data import INDEX_SOURCES, get_provider
+from workflow_metrics import get_metrics
+
+BUNDLED_DIR = os.path.join(PROJECT_ROOT, 'index_snapshots')
+DEFAULT_TTL_HOURS = 24
+# 레코드마다 보관할 최대 변경 이력 수
+MAX_HISTORY = 100
+
+
+def read_bundled_snapshot(index_name, bundled_dir=BUNDLED_DIR):
+    """저장소에 포함된 구성 종목 스냅샷(index_snapshots/<INDEX>.txt)을 읽습니다. 없으면 빈 리스트를 반환합니다."""
+    path = os.path.join(bundled_dir, f'{index_name}.txt')
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def diff_constituents(previous, current):
+    """두 스냅샷 사이에 추가/제외된 티커를 (added, removed) 정렬 리스트로 반환합니다."""
+    previous, current = set(previous), set(current)
+    return sorted(current - previous), sorted(previous - current)
+
+
+class IndexRegistry:
+    """
+    지수 구성 종목을 로컬(data/index_registry/<공급자>/<INDEX>.json)에 저장해 두고 TTL 동안 재사용하는 레지스트리입니다.
+
+    - TTL이 지났을 때만 공급자(Wikipedia)에서 다시 가져오고, 직전 스냅샷과 비교한 추가/제외 종목을 이력으로 남깁니다.
+    - 갱신에 실패하면 만료된 저장본을, 저장본도 없으면 저장소에 포함된 번들 스냅샷을 사용합니다.
+    - 로컬 공급자(replay, synthetic)는 요청 비용이 없으므로 저장하지 않고 그대로 전달합니다.
+    """
+
+    def __init__(self, registry_dir, ttl_hours=DEFAULT_TTL_HOURS, provider=None, bundled_dir=BUNDLED_DIR):
+        self.registry_dir = registry_dir
+        self.ttl = ttl_hours * 60 * 60
+        self.bundled_dir = bundled_dir
+        self._provider = provider
+        self._lock = threading.Lock()
+
+    @property
+    def provider(self):
+        return self._provider or get_provider()
+
+    def path(self, index_name):
+        return os.path.join(self.registry_dir, self.provider.name, f'{index_name}.json')
+
+    def load(self, index_name):
+        """저장된 레코드({'index', 'fetched', 'source', 'tickers', 'history'})를 반환합니다. 없으면 None."""
+        path = self.path(index_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, index_name, record):
+        path = self.path(index_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def is_fresh(self, record, now=None):
+        return record is not None and (now or time.time()) - record['fetched'] <= self.ttl
+
+    def get(self, index_name, force_refresh=False):
+        """
+        지수 구성 종목 티커 리스트(원본 표기, 예: 'BRK.B')를 반환합니다.
+        저장본이 TTL 안에 있으면 네트워크 요청 없이 반환하고, force_refresh면 TTL과 관계없이 갱신합니다.
+        """
+        provider = self.provider
+        if not provider.is_remote:
+            return provider.get_index_tickers(index_name)
+
+        with self._lock:
+            record = self.load(index_name)
+            if not force_refresh and self.is_fresh(record):
+                get_metrics().inc('index_registry_requests_total', result='hit')
+                return record['tickers']
+            get_metrics().inc('index_registry_requests_total', result='refresh')
+            return self._refresh(index_name, record)
+
+    def _refresh(self, index_name, record):
+        try:
+            tickers = self.provider.get_index_tickers(index_name)
+        except Exception as e:
+            tickers = []
+            print(f"  - {index_name} 구성 종목 갱신 실패: {e}")
+        if not tickers:
+            return self._fallback(index_name, record)
+
+        previous = record['tickers'] if record else read_bundled_snapshot(index_name, self.bundled_dir)
+        added, removed = diff_constituents(previous, tickers)
+        history = record.get('history', []) if record else []
+        if added or removed:
+            history.append({'time': datetime.now().isoformat(timespec='seconds'), 'added': added, 'removed': removed,
+                            'base': 'registry' if record else 'bundled'})
+            print(f"  - {index_name} 구성 종목 변경: 추가 {len(added)}개 {added[:10]}, 제외 {len(removed)}개 {removed[:10]}")
+        self._save(index_name, {'index': index_name, 'fetched': time.time(), 'source': INDEX_SOURCES[index_name][0],
+                                'tickers': tickers, 'history': history[-MAX_HISTORY:]})
+        return tickers
+
+    def _fallback(self, index_name, record):
+        if record and record.get('tickers'):
+            fetched = datetime.fromtimestamp(record['fetched']).strftime('%Y-%m-%d %H:%M')
+            print(f"  - {index_name}: {fetched}에 저장한 구성 종목을 사용합니다.")
+            get_metrics().inc('index_registry_requests_total', result='stale')
+            return record['tickers']
+        tickers = read_bundled_snapshot(index_name, self.bundled_dir)
+        if tickers:
+            print(f"  - {index_name}: 저장소에 포함된 번들 스냅샷을 사용합니다.")
+            get_metrics().inc('index_registry_requests_total', result='bundled')
+        return tickers
+
+    def changes(self, index_name):
+        """저장된 구성 종목 변경 이력(오래된 순)을 반환합니다."""
+        record = self.load(index_name)
+        return record.get('history', []) if record else []
+
+    def export_bundle(self, index_name):
+        """현재 저장본을 번들 스냅샷 파일로 내보냅니다. 내보낸 경로를 반환합니다."""
+        record = self.load(index_name)
+        if not record or not record.get('tickers'):
+            raise ValueError(f"{index_name} 저장본이 없습니다. 먼저 --refresh로 갱신하세요.")
+        fetched = datetime.fromtimestamp(record['fetched']).strftime('%Y-%m-%d')
+        path = os.path.join(self.bundled_dir, f'{index_name}.txt')
+        os.makedirs(self.bundled_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# {index_name} 구성 종목 번들 스냅샷 (기준일: {fetched})\n")
+            f.write(f"# 네트워크 없이 실행하거나 Wikipedia 갱신에 실패했을 때 사용합니다. "
+                    f"갱신: python index_registry.py {index_name} --export-bundle\n")
+            f.write("\n".join(record['tickers']) + "\n")
+        return path
+
+
+# --- 기본 레지스트리 ---
+_registry = None
+
+def get_index_registry():
+    """config.ini의 [Data] index_registry_dir/index_registry_ttl_hours 설정에 따른 프로세스 전역 레지스트리를 반환합니다."""
+    global _registry
+    if _registry is None:
+        config = get_config_service()
+        _registry = IndexRegistry(
+            os.path.join(PROJECT_ROOT, config.get('Data', 'index_registry_dir', fallback='data/index_registry')),
+            ttl_hours=config.getfloat('Data', 'index_registry_ttl_hours', fallback=DEFAULT_TTL_HOURS),
+        )
+    return _registry
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="지수 구성 종목 레지스트리를 조회/갱신합니다.")
+    parser.add_argument('index_name', choices=list(INDEX_SOURCES))
+    parser.add_argument('--refresh', action='store_true', help="TTL과 관계없이 Wikipedia에서 다시 가져옵니다.")
+    parser.add_argument('--changes', action='store_true', help="저장된 구성 종목 변경 이력을 출력합니다.")
+    parser.add_argument('--export-bundle', action='store_true', help="현재 저장본을 index_snapshots/에 번들 스냅샷으로 저장합니다.")
+    args = parser.parse_args()
+
+    registry = get_index_registry()
+    index_tickers = registry.get(args.index_name, force_refresh=args.refresh)
+    print(f"{args.index_name}: {len(index_tickers)}개 종목")
+
+    if args.changes:
+        for change in registry.changes(args.index_name):
+            print(f"  - {change['time']}: 추가 {change['added'] or '-'}, 제외 {change['removed'] or '-'}")
+    if args.export_bundle:
+        print(f"번들 스냅샷 저장: {registry.export_bundle(args.index_name)}")
@@ -1,12 +1,13 @@
 import pandas as pd
-import yfinance as yf
 import pandas_ta as ta
-import urllib.request
+from market_data import INDEX_SOURCES, get_provider
+from info_cache import get_info
+from index_registry import get_index_registry
 
 def get_index_tickers(index_name="SP500"):
     """
-    Wikipedia에서 지정된 지수(SP500 또는 NASDAQ100)의 종목 티커 리스트를 가져옵니다.
-    403 Forbidden 오류를 피하기 위해 User-Agent 헤더를 추가합니다.
+    지정된 지수(SP500 또는 NASDAQ100)의 종목 티커 리스트를 가져옵니다.
+    구성 종목 레지스트리에 저장된 목록이 유효 기간 안에 있으면 Wikipedia에 요청하지 않습니다.
     
     Args:
         index_name (str): 가져올 지수의 이름 ("SP500" 또는 "NASDAQ100").
@@ -15,32 +16,14 @@ def get_index_tickers(index_name="SP500"):
         list: 지정된 지수의 종목 티커 리스트.
     """
     try:
-        if index_name == "SP500":
-            url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-            symbol_col = 'Symbol'
-        elif index_name == "NASDAQ100":
-            url = 'https://en.wikipedia.org/wiki/Nasdaq-100'
-            symbol_col = 'Ticker' # NASDAQ 100 페이지에서는 'Ticker' 컬럼 사용
-        else:
+        if index_name not in INDEX_SOURCES:
             print(f"지원하지 않는 지수 이름입니다: {index_name}")
             return []
 
-        req = urllib.request.Request(
-            url, 
-            headers={'User-Agent': 'Mozilla/5.0'}
-        )
-        with urllib.request.urlopen(req) as response:
-            html = response.read()
-        
-        tables = pd.read_html(html)
-        tickers = []
-        for table in tables:
-            if symbol_col in table.columns:
-                tickers = table[symbol_col].tolist()
-                break
+        tickers = get_index_registry().get(index_name)
         
         if not tickers:
-            print(f"{index_name} 페이지에서 '{symbol_col}' 컬럼을 찾을 수 없습니다.")
+            print(f"{index_name} 페이지에서 '{INDEX_SOURCES[index_name][1]}' 컬럼을 찾을 수 없습니다.")
             return []
 
         tickers = [s.replace('.', '-') for s in tickers]
@@ -77,8 +60,7 @@ def find_undervalued_stocks(rsi_threshold=50, peg_threshold=1.0, use_peg_filter=
         progress_msg = f"  - 진행: [{i + 1}/{total_tickers}] {ticker}"
         
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            info = get_info(ticker, fields=('pegRatio',))
             peg_ratio = None
 
             # 1. PEG Ratio 필터링
@@ -90,7 +72,7 @@ def find_undervalued_stocks(rsi_threshold=50, peg_threshold=1.0, use_peg_filter=
                     continue
 
             # 2. RSI 계산
-            df = stock.history(period="1mo", timeout=10)
+            df = get_provider().download(ticker, period="1mo")
             if df.empty:
                 print(f"{progress_msg} (데이터 없음 -> SKIP)          ", end='\r')
                 continue
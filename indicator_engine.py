@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+# 1단계에서 계산하는 지표 컬럼 (trading_strategy_analyzer.find_buy_signals가 사용하는 이름과 동일)
+INDICATOR_COLUMNS = ['SMA_20', 'SMA_50', 'SMA_200', 'RSI_14', 'BBL_20_2.0', 'VOLUME_SMA_20']
+
+
+class IndicatorPanel:
+    """
+    여러 티커의 같은 필드를 하나의 2차원 배열(봉 × 티커)로 정렬한 패널입니다.
+
+    티커마다 상장일이 달라 길이가 다르므로 각 티커의 데이터를 배열 아래쪽(마지막 봉)에 맞춰 정렬하고
+    위쪽 빈 칸은 NaN으로 채웁니다. 따라서 각 열은 해당 티커 자신의 봉 순서를 그대로 유지하며,
+    마지막 행은 모든 티커의 최신 봉입니다. 티커 j의 날짜는 dates[j]로 확인합니다.
+    """
+
+    def __init__(self, tickers, dates, fields):
+        self.tickers = list(tickers)
+        self.dates = dates
+        self.fields = fields
+        self.lengths = np.array([len(d) for d in dates], dtype=np.int64)
+
+    @property
+    def n_bars(self):
+        return next(iter(self.fields.values())).shape[0] if self.fields else 0
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def column(self, ticker_index, values):
+        """패널 배열에서 티커 하나의 유효 구간(자신의 봉 길이 만큼)을 잘라 반환합니다."""
+        return values[self.n_bars - self.lengths[ticker_index]:, ticker_index]
+
+
+def build_panel(ticker_dataframes, fields=('Close', 'Volume'), dtype=np.float64):
+    """
+    {티커: OHLCV DataFrame} 딕셔너리를 필드별 2차원 NumPy 패널로 변환합니다. 빈 DataFrame은 제외합니다.
+    """
+    items = [(ticker, df) for ticker, df in ticker_dataframes.items() if df is not None and not df.empty]
+    n_bars = max((len(df) for _, df in items), default=0)
+    arrays = {field: np.full((n_bars, len(items)), np.nan, dtype=dtype) for field in fields}
+    for j, (_, df) in enumerate(items):
+        for field in fields:
+            arrays[field][n_bars - len(df):, j] = df[field].to_numpy(dtype=dtype)
+    return IndicatorPanel([ticker for ticker, _ in items], [df.index for _, df in items], arrays)
+
+
+def _windowed_sums(values, window):
+    """
+    열마다 window 길이 구간의 합과 유효값 개수를 누적합 두 번으로 계산합니다.
+    정밀도 손실을 줄이기 위해 열별 기준값을 뺀 뒤 누적합을 구하고, 기준값(ref)을 함께 반환합니다.
+    """
+    valid = ~np.isnan(values)
+    n_valid = valid.sum(axis=0)
+    ref = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(n_valid, 1)
+    centered = np.where(valid, values - ref, 0.0)
+    padded = np.zeros((values.shape[0] + 1, values.shape[1]), dtype=values.dtype)
+    np.cumsum(centered, axis=0, out=padded[1:])
+    counts = np.concatenate([np.zeros((1, values.shape[1]), dtype=np.int64), np.cumsum(valid, axis=0)])
+    sq_padded = np.zeros_like(padded)
+    np.cumsum(centered * centered, axis=0, out=sq_padded[1:])
+    return ref, padded[window:] - padded[:-window], sq_padded[window:] - sq_padded[:-window], counts[window:] - counts[:-window]
+
+
+def rolling_mean(values, window):
+    """열별 단순 이동평균. 구간 안에 NaN이 하나라도 있으면 NaN입니다. (pandas rolling(min_periods=window)과 동일)"""
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    if values.shape[0] < window:
+        return out
+    ref, sums, _, counts = _windowed_sums(values, window)
+    out[window - 1:] = np.where(counts == window, sums / window + ref, np.nan)
+    return out
+
+
+def rolling_std(values, window, ddof=0):
+    """열별 이동 표준편차. 볼린저 밴드(pandas_ta bbands)와 같이 기본 ddof=0을 사용합니다."""
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    if values.shape[0] < window:
+        return out
+    _, sums, sq_sums, counts = _windowed_sums(values, window)
+    variance = (sq_sums - sums * sums / window) / (window - ddof)
+    out[window - 1:] = np.where(counts == window, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+    return out
+
+
+def ewm_mean(values, alpha, min_periods):
+    """
+    열별 지수가중평균. pandas `ewm(alpha=alpha, min_periods=min_periods).mean()`(adjust=True, ignore_na=False)과 같습니다.
+    시간축은 순차 점화식이 필요하므로 봉 단위로 진행하되, 각 봉에서는 모든 티커를 한 번의 배열 연산으로 처리합니다.
+    """
+    n_bars, n_cols = values.shape
+    out = np.full(values.shape, np.nan, dtype=values.dtype)
+    weighted = np.full(n_cols, np.nan, dtype=values.dtype)
+    old_weight = np.ones(n_cols, dtype=values.dtype)
+    n_obs = np.zeros(n_cols, dtype=np.int64)
+    decay = 1.0 - alpha
+    for t in range(n_bars):
+        current = values[t]
+        is_obs = ~np.isnan(current)
+        n_obs += is_obs
+        started = ~np.isnan(weighted)
+        old_weight = np.where(started, old_weight * decay, old_weight)
+        update = started & is_obs
+        weighted = np.where(update, (old_weight * weighted + current) / (old_weight + 1.0), weighted)
+        old_weight = np.where(update, old_weight + 1.0, old_weight)
+        weighted = np.where(~started & is_obs, current, weighted)
+        out[t] = np.where(n_obs >= min_periods, weighted, np.nan)
+    return out
+
+
+def wilder_rsi(close, length=14):
+    """열별 Wilder RSI. pandas_ta `rsi`의 기본 계산(TA-Lib 미사용, RMA = ewm(alpha=1/length))과 같습니다."""
+    diff = np.full(close.shape, np.nan, dtype=close.dtype)
+    diff[1:] = close[1:] - close[:-1]
+    positive = np.where(diff > 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    negative = np.where(diff < 0, diff, np.where(np.isnan(diff), np.nan, 0.0))
+    positive_avg = ewm_mean(positive, 1.0 / length, length)
+    negative_avg = ewm_mean(negative, 1.0 / length, length)
+    with np.errstate(all='ignore'):
+        return 100.0 * positive_avg / (positive_avg + np.abs(negative_avg))
+
+
+def compute_indicators(panel):
+    """패널 전체에 대해 1단계 지표(SMA 20/50/200, RSI 14, 볼린저 하단, 거래량 SMA 20)를 한 번에 계산합니다."""
+    close = panel['Close']
+    sma_20 = rolling_mean(close, 20)
+    return {
+        'SMA_20': sma_20,
+        'SMA_50': rolling_mean(close, 50),
+        'SMA_200': rolling_mean(close, 200),
+        'RSI_14': wilder_rsi(close, 14),
+        'BBL_20_2.0': sma_20 - 2.0 * rolling_std(close, 20),
+        'VOLUME_SMA_20': rolling_mean(panel['Volume'], 20),
+    }
+
+
+def attach_indicators(ticker_dataframes):
+    """
+    티커별 DataFrame에 INDICATOR_COLUMNS를 추가한 복사본 딕셔너리를 반환합니다.
+    종목 수만큼 pandas_ta를 반복 호출하던 1단계 계산을 패널 단위 배열 연산으로 대체합니다.
+    """
+    panel = build_panel(ticker_dataframes)
+    return _attach(ticker_dataframes, panel, indicators=compute_indicators(panel))
+
+
+def _attach(ticker_dataframes, panel, indicators):
+    result = {}
+    for j, ticker in enumerate(panel.tickers):
+        df = ticker_dataframes[ticker]
+        # 컬럼을 하나씩 추가하는 대신 한 번에 새 DataFrame을 만들어 티커당 오버헤드를 줄입니다.
+        columns = {column: df[column].to_numpy() for column in df.columns}
+        columns.update((column, panel.column(j, values)) for column, values in indicators.items())
+        result[ticker] = pd.DataFrame(columns, index=df.index)
+    return result
+
+
+def indicator_snapshot(panel, indicators):
+    """
+    패널의 마지막 두 행만으로 trading_strategy_analyzer.build_signal_table과 같은 형식의 최신 지표 표를 만듭니다.
+    티커별 DataFrame에서 행을 하나씩 꺼내지 않고 배열 슬라이스로 한 번에 만듭니다.
+    """
+    n_bars = panel.n_bars
+    last = lambda values: values[-1] if n_bars >= 1 else np.full(len(panel.tickers), np.nan)
+    prev = lambda values: values[-2] if n_bars >= 2 else np.full(len(panel.tickers), np.nan)
+    table = {'bars': panel.lengths.astype(float)}
+    table.update({field: last(panel[field]) for field in ('Close', 'Volume')})
+    table.update({column: last(indicators[column]) for column in ('SMA_20', 'SMA_50', 'SMA_200', 'RSI_14', 'VOLUME_SMA_20')})
+    table['prev_Close'] = prev(panel['Close'])
+    table['prev_BBL_20_2.0'] = prev(indicators['BBL_20_2.0'])
+    return pd.DataFrame(table, index=pd.Index(panel.tickers))
+
+
+def compute_snapshot(ticker_dataframes):
+    """티커별 OHLCV에서 2~3단계 스크리닝에 쓸 최신 지표 표만 계산합니다. (지표 컬럼을 붙인 DataFrame은 만들지 않습니다.)"""
+    panel = build_panel(ticker_dataframes)
+    return indicator_snapshot(panel, compute_indicators(panel))
+
+
+def compare_with_pandas_ta(ticker_dataframes, rtol=1e-6, atol=1e-6):
+    """
+    attach_indicators 결과를 pandas_ta 계산과 비교하여 허용 오차를 넘는 (티커, 컬럼, 최대 차이) 리스트를 반환합니다.
+    빈 리스트이면 모든 값이 허용 오차 안에서 일치합니다.
+    """
+    import pandas_ta as ta  # 검증할 때만 필요합니다.
+
+    vectorized = attach_indicators(ticker_dataframes)
+    mismatches = []
+    for ticker, df in vectorized.items():
+        reference = ticker_dataframes[ticker].copy()
+        bbands = reference.ta.bbands(length=20, std=2.0)
+        expected = {
+            'SMA_20': reference.ta.sma(length=20),
+            'SMA_50': reference.ta.sma(length=50),
+            'SMA_200': reference.ta.sma(length=200),
+            'RSI_14': reference.ta.rsi(length=14),
+            'BBL_20_2.0': bbands.iloc[:, 0] if bbands is not None else None,
+            'VOLUME_SMA_20': reference.ta.sma(close=reference['Volume'], length=20),
+        }
+        for column, series in expected.items():
+            if series is None:
+                continue
+            actual = df[column].to_numpy(dtype=float)
+            wanted = pd.Series(series).to_numpy(dtype=float)
+            if not np.allclose(actual, wanted, rtol=rtol, atol=atol, equal_nan=True):
+                mismatches.append((ticker, column, float(np.nanmax(np.abs(actual - wanted)))))
+    return mismatches
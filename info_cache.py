@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import OrderedDict
+
+from config_service import get_config_service
+from market_data import get_provider
+from workflow_metrics import get_metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# 필드별 유효 기간(초). 섹터처럼 거의 바뀌지 않는 값은 길게, 가격/목표가처럼 자주 바뀌는 값은 짧게 둡니다.
+FIELD_TTLS = {
+    'sector': 30 * DAY,
+    'industry': 30 * DAY,
+    'longName': 30 * DAY,
+    'shortName': 30 * DAY,
+    'profitMargins': 7 * DAY,
+    'returnOnEquity': 7 * DAY,
+    'forwardPE': DAY,
+    'pegRatio': DAY,
+    'trailingPegRatio': DAY,
+    'recommendationKey': DAY,
+    'numberOfAnalystOpinions': DAY,
+    'targetMeanPrice': 6 * HOUR,
+    'currentPrice': HOUR,
+    'regularMarketPrice': HOUR,
+}
+DEFAULT_TTL = 12 * HOUR
+# 빈 결과(404/503/네트워크 오류 등 조회 실패)를 재사용하는 기간(초). 일시적인 오류가 다음 실행까지 남지 않도록 짧게 둡니다.
+NEGATIVE_TTL = 5 * 60
+
+
+class InfoCache:
+    """
+    `Ticker.info` 결과를 프로세스 전역에서 공유하는 캐시입니다.
+    필드별 TTL로 신선도를 판단하고, 최대 개수를 넘으면 가장 오래 사용하지 않은 티커부터 제거(LRU)하며,
+    디스크(JSON)에 저장해 두었다가 다음 실행이나 `/stock` 호출에서 재사용합니다.
+    """
+
+    def __init__(self, path=None, max_entries=2000, field_ttls=None, default_ttl=DEFAULT_TTL, provider=None,
+                 fetch=None, metric='info_cache_requests_total', negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.field_ttls = FIELD_TTLS if field_ttls is None else field_ttls
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._provider = provider
+        # fetch(provider, ticker)로 info 대신 다른 티커별 딕셔너리(예: 분석 페이지 파싱 결과)를 캐시할 수 있습니다.
+        self.fetch = fetch or (lambda provider, ticker: provider.get_info(ticker))
+        self.metric = metric
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        # 새로 가져온 결과를 listener(ticker, info)로 통지합니다. (예: sector_stats의 증분 갱신)
+        self.listeners = []
+        self._loaded = False
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def provider(self):
+        return self._provider or get_provider()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for ticker, entry in saved.items():
+            self._entries[ticker] = entry
+        self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def is_fresh(self, entry, fields=None, now=None):
+        """
+        요청한 필드(없으면 저장된 모든 필드)가 모두 각자의 TTL 안에 있는지 확인합니다.
+        빈 결과는 확인할 필드가 없으므로 negative_ttl(default_ttl보다 길지 않게)로만 판단합니다.
+        """
+        age = (now or time.time()) - entry['fetched']
+        if not entry['info']:
+            return age <= min(self.negative_ttl, self.default_ttl)
+        for field in (fields if fields is not None else entry['info'].keys()):
+            if age > self.field_ttls.get(field, self.default_ttl):
+                return False
+        return True
+
+    def get(self, ticker, fields=None):
+        """
+        티커의 info 딕셔너리를 반환합니다. fields를 주면 해당 필드의 TTL만으로 신선도를 판단합니다.
+        캐시가 신선하지 않을 때만 공급자에 요청하며, 같은 티커를 동시에 요청하면 한 번만 가져옵니다.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(ticker)
+            if entry is not None and self.is_fresh(entry, fields):
+                self._entries.move_to_end(ticker)
+                self.hits += 1
+                get_metrics().inc(self.metric, result='hit')
+                return entry['info']
+            fetch_lock = self._fetch_locks.setdefault(ticker, threading.Lock())
+
+        with fetch_lock:
+            # 다른 스레드가 먼저 가져왔다면 그 결과를 사용합니다.
+            with self._lock:
+                entry = self._entries.get(ticker)
+                if entry is not None and self.is_fresh(entry, fields):
+                    self._entries.move_to_end(ticker)
+                    self.hits += 1
+                    get_metrics().inc(self.metric, result='hit')
+                    return entry['info']
+                self.misses += 1
+                get_metrics().inc(self.metric, result='miss')
+
+            info = self.fetch(self.provider, ticker) or {}
+            with self._lock:
+                self._entries[ticker] = {'fetched': time.time(), 'info': info}
+                self._entries.move_to_end(ticker)
+                self._evict()
+                self._dirty = True
+            for listener in list(self.listeners):
+                listener(ticker, info)
+            return info
+
+    def invalidate(self, ticker=None):
+        """특정 티커(없으면 전체)의 캐시를 비웁니다."""
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ticker, None)
+            self._dirty = True
+
+    def save(self):
+        """변경된 내용이 있으면 디스크에 저장합니다."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, default=str)
+        os.replace(self.path + '.tmp', self.path)
+
+
+# --- 기본 캐시 ---
+_caches = {}
+_caches_lock = threading.Lock()
+
+def shared_cache(kind='info', options=None):
+    """
+    현재 공급자용 프로세스 전역 캐시를 종류(kind)별로 하나씩 반환합니다. 종료 시 자동으로 디스크에 저장됩니다.
+    options(config)는 처음 생성할 때 InfoCache에 넘길 추가 인자 딕셔너리를 반환하는 함수입니다.
+    """
+    provider = get_provider()
+    key = (provider.name, kind)
+    # 여러 스레드가 동시에 처음 호출해도 캐시가 하나만 만들어지도록 잠금 안에서 생성합니다.
+    with _caches_lock:
+        if key not in _caches:
+            config = get_config_service()
+            cache_dir = config.get('Data', 'info_cache_dir', fallback='data/info_cache')
+            file_name = f'{provider.name}.json' if kind == 'info' else f'{provider.name}_{kind}.json'
+            cache = InfoCache(
+                path=os.path.join(PROJECT_ROOT, cache_dir, file_name),
+                max_entries=config.getint('Data', 'info_cache_size', fallback=2000),
+                **(options(config) if options else {}),
+            )
+            atexit.register(cache.save)
+            _caches[key] = cache
+        return _caches[key]
+
+def get_info_cache():
+    """현재 공급자용 프로세스 전역 info 캐시를 반환합니다."""
+    return shared_cache('info')
+
+def get_info(ticker, fields=None):
+    """info 캐시를 거쳐 티커의 info 딕셔너리를 가져옵니다."""
+    return get_info_cache().get(ticker, fields)
+
+def save_caches():
+    """지금까지 만든 모든 공유 캐시를 디스크에 저장합니다. (atexit가 실행되지 않는 종료 경로용)"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.save()
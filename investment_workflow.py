@@ -1,30 +1,180 @@
-import pandas as pd
 import os
 import sys
-import yfinance as yf
-import pandas_ta as ta
-import io
-import configparser
+import json
+import time
+import argparse
+import threading
 from datetime import datetime
-import pytz
 
 # 경로 문제 해결 및 config 임포트
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from index_screener import get_index_tickers
-from trading_strategy_analyzer import find_buy_signals
-from fundamental_analyzer import get_fundamental_analysis
+from config_service import get_config_service
+
+# 디스코드 요약 메시지 파일 이름 (--output-dir 아래에 저장)
+SUMMARY_FILE = 'workflow_summary.txt'
+# --save-stages로 저장하는 단계별 중간 결과 (스케줄러 스냅샷에 포함)
+STAGES_FILE = 'workflow_stages.json'
+# 구성 종목을 가져올 수 있는 지수와 사용자 티커 목록의 기본 이름
+KNOWN_INDEXES = ('SP500', 'NASDAQ100')
+CUSTOM_LIST_NAME = 'CUSTOM'
+
+# 설정 (config.ini가 바뀌면 다음 조회부터 새 값을 읽습니다)
+config = get_config_service()
+
+class ProgressFile:
+    """
+    --progress-file로 지정한 파일에 진행 상황을 JSON Lines로 기록합니다. (Discord 작업 관리자가 읽어 메시지를 갱신)
+    단계 시작은 항상 기록하고, 종목 단위 진행은 min_interval초에 한 번만 기록합니다.
+    """
+
+    def __init__(self, path=None, min_interval=2.0):
+        self.path = path
+        self.min_interval = min_interval
+        self._stage = None
+        self._message = None
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def _write(self, **event):
+        if not self.path:
+            return
+        event = {'time': time.time(), 'stage': self._stage, 'message': self._message, **event}
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        except OSError:
+            pass  # 진행 상황 기록 실패로 워크플로우를 멈추지 않습니다.
+
+    def stage(self, stage, message):
+        with self._lock:
+            self._stage, self._message = stage, message
+            self._last = time.monotonic()
+            self._write()
+
+    def step(self, done, total):
+        with self._lock:
+            now = time.monotonic()
+            if done < total and now - self._last < self.min_interval:
+                return
+            self._last = now
+            self._write(done=done, total=total)
+
+
+def parse_workflow_args(argv):
+    parser = argparse.ArgumentParser(description="지수 구성 종목 전체에 대한 투자 분석 워크플로우를 실행합니다.")
+    parser.add_argument('indexes', nargs='*',
+                        help="SP500, NASDAQ100 중 하나 이상 (공백이나 쉼표로 구분, 없으면 config.ini의 [Screener] index_name)")
+    parser.add_argument('--tickers', help="지수와 함께(또는 대신) 분석할 사용자 티커 목록 (쉼표로 구분)")
+    parser.add_argument('--tickers-file', help="사용자 티커 목록 파일 (한 줄에 하나, #으로 시작하는 줄은 무시)")
+    parser.add_argument('--list-name', default=CUSTOM_LIST_NAME, help="사용자 티커 목록의 결과 이름")
+    parser.add_argument('--output-dir', default=PROJECT_ROOT,
+                        help="결과/요약 파일을 저장할 디렉토리 (대상이 여럿이면 대상별 하위 디렉토리에 저장)")
+    parser.add_argument('--progress-file', help="진행 상황을 JSON Lines로 기록할 파일")
+    parser.add_argument('--save-stages', action='store_true', help=f"단계별 중간 결과를 결과 디렉토리의 {STAGES_FILE}에 저장합니다.")
+    args = parser.parse_args(argv)
+
+    args.indexes = list(dict.fromkeys(name.strip().upper() for value in args.indexes for name in value.split(',') if name.strip()))
+    unknown = [name for name in args.indexes if name not in KNOWN_INDEXES]
+    if unknown:
+        parser.error(f"알 수 없는 지수: {', '.join(unknown)} (사용 가능: {', '.join(KNOWN_INDEXES)})")
+    args.custom_tickers = load_custom_tickers(args.tickers, args.tickers_file)
+    if args.custom_tickers and args.list_name.upper() in KNOWN_INDEXES:
+        parser.error(f"--list-name은 지수 이름({', '.join(KNOWN_INDEXES)})과 달라야 합니다.")
+    return args
+
+
+def load_custom_tickers(tickers=None, tickers_file=None):
+    """--tickers/--tickers-file로 받은 사용자 티커를 대문자로 바꾸고 중복을 제거한 리스트로 반환합니다."""
+    names = (tickers or '').split(',')
+    if tickers_file:
+        with open(tickers_file, 'r', encoding='utf-8') as f:
+            names += [line for line in f if not line.startswith('#')]
+    return list(dict.fromkeys(name.strip().upper() for name in names if name.strip()))
+
+
+def universe_names(args):
+    """이번 실행의 분석 대상(지수 또는 사용자 목록) 이름을 순서대로 반환합니다."""
+    names = list(args.indexes)
+    if not names and not args.custom_tickers:
+        names = [config.get('Screener', 'index_name')]
+    if args.custom_tickers:
+        names.append(args.list_name)
+    return names
+
+
+def universe_dir(args, name):
+    """대상 하나의 결과 디렉토리. 대상이 하나면 --output-dir 그대로, 여럿이면 그 아래 '<이름>/'입니다."""
+    return args.output_dir if len(universe_names(args)) == 1 else os.path.join(args.output_dir, name)
 
-# 설정 파일 로드
-config = configparser.ConfigParser()
-config.read(os.path.join(PROJECT_ROOT, 'config.ini'))
 
 def run_investment_workflow():
     """
     최적화된 3단계 투자 분석 워크플로우를 실행합니다.
+    여러 지수와 사용자 티커 목록을 한 번에 받으면 겹치는 종목을 한 번만 가져와 계산하고, 대상별 결과를 따로 만듭니다.
+    단계별 소요 시간과 요청 지연 시간, 캐시/재시도 카운터를 discord/logs의 지표 파일에 기록합니다.
     """
+    args = parse_workflow_args(sys.argv[1:])
+    # 분석 모듈(pandas 포함)은 인자를 확인한 뒤에 임포트하여 인자 오류는 바로 알립니다.
+    from market_data import get_provider, set_provider
+    from workflow_metrics import InstrumentedProvider, get_metrics, peak_rss_mb
+
+    metrics = get_metrics()
+    metrics.reset()
+    # 모든 데이터 요청이 호출 수와 지연 시간을 남기도록 공급자를 감쌉니다.
+    previous_provider = set_provider(InstrumentedProvider(get_provider(), metrics))
+    status = 'error'
+    stage_outputs = {}
+    try:
+        _run_workflow_stages(metrics, args, ProgressFile(args.progress_file), stage_outputs)
+        status = 'ok'
+        if args.save_stages:
+            for name, outputs in stage_outputs.items():
+                with open(os.path.join(universe_dir(args, name), STAGES_FILE), 'w', encoding='utf-8') as f:
+                    json.dump(outputs, f, ensure_ascii=False, indent=1)
+    finally:
+        set_provider(previous_provider)
+        metrics.finish(status)
+        peak_mb = peak_rss_mb()
+        if peak_mb is not None:
+            print(f"최대 메모리 사용량(RSS): {peak_mb:.1f}MB")
+
+
+def write_summary(path, final_signals):
+    """디스코드 요약 메시지 파일을 만듭니다."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"**분석 완료!** 최종 매수 신호 종목 ({len(final_signals)}개)를 찾았습니다.\n")
+        f.write(f"티커: {', '.join(final_signals)}\n")
+        f.write("상세 리포트를 보려면 `/report` 명령어를 사용하세요.")
+
+
+def write_combined_summary(path, finals_by_universe):
+    """대상이 여럿일 때 --output-dir에 대상별 결과를 한데 모은 요약 메시지 파일을 만듭니다."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"**분석 완료!** ({', '.join(finals_by_universe)})\n")
+        for name, final_signals in finals_by_universe.items():
+            if final_signals:
+                f.write(f"- {name} 최종 매수 신호 종목 ({len(final_signals)}개): {', '.join(final_signals)}\n")
+            else:
+                f.write(f"- {name}: 최종 매수 신호 종목을 찾지 못했습니다.\n")
+        f.write("상세 리포트를 보려면 `/report` 명령어를 사용하세요. (대상별로 선택)")
+
+
+def _run_workflow_stages(metrics, args, progress, stage_outputs):
+    import pytz
+    from index_screener import get_index_tickers
+    from trading_strategy_analyzer import resolve_rsi_ladder
+    from fundamental_analyzer import analyze_fundamentals, with_sector_stats
+    from fundamental_report import RESULTS_TEXT, save_results
+    from info_cache import get_info, get_info_cache
+    from price_store import get_price_store, load_universe
+    from fetch_engine import fetch_all, get_fetch_options
+    from indicator_engine import compute_snapshot
+    from streaming_indicators import IndicatorStateStore, streaming_snapshot
+    from sector_stats import get_sector_stats
+
     # --- 0. 로그 파일 초기화 ---
     try:
         console_log_path = os.path.join(PROJECT_ROOT, 'discord', 'logs', 'console.log')
@@ -34,15 +184,17 @@ def run_investment_workflow():
         pass # 로그 파일 초기화 실패 시에도 워크플로우는 계속 진행
 
     # --- 0. 분석 조건 설정 (config.ini에서 로드) ---
-    screener_index_name = config.get('Screener', 'index_name')
-    if len(sys.argv) > 1 and sys.argv[1] in ["SP500", "NASDAQ100"]:
-        screener_index_name = sys.argv[1]
+    names = universe_names(args)
+    multiple = len(names) > 1
+    for name in names:
+        os.makedirs(universe_dir(args, name), exist_ok=True)
     
     screener_rsi_threshold = config.getint('Screener', 'rsi_threshold')
     screener_use_peg_filter = config.getboolean('Screener', 'use_peg_filter')
     screener_peg_threshold = config.getfloat('Screener', 'peg_threshold')
     analyzer_min_signals_to_find = config.getint('Analyzer', 'min_signals_to_find')
     analyzer_initial_rsi_threshold = config.getint('Analyzer', 'initial_rsi_threshold')
+    analyzer_rsi_threshold_step = config.getint('Analyzer', 'rsi_threshold_step', fallback=5)
     analyzer_max_rsi_threshold = screener_rsi_threshold
     analyzer_use_strict_filter = config.getboolean('Analyzer', 'use_strict_filter')
     analyzer_use_bollinger_band = config.getboolean('Analyzer', 'use_bollinger_band')
@@ -52,220 +204,239 @@ def run_investment_workflow():
     use_analyst_filter = config.getboolean('Fundamental', 'use_analyst_filter')
 
     # --- 1. 데이터 사전 로딩 및 지표 계산 ---
-    print(f"--- 1단계: {screener_index_name} 데이터 사전 로딩 및 지표 계산 시작 ---")
-    all_tickers = get_index_tickers(screener_index_name)
-    all_ticker_data = {}
-    
-    for i, ticker in enumerate(all_tickers):
-        print(f"  - 진행: [{i + 1}/{len(all_tickers)}] {ticker} 데이터 로딩 중...", end='\r')
-        try:
-            df = yf.download(ticker, period="250d", auto_adjust=True, progress=False, timeout=10)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.droplevel(1)
-
-            if df.empty:
-                continue
-            
-            df.ta.sma(length=20, append=True)
-            df.ta.sma(length=50, append=True)
-            df.ta.sma(length=200, append=True)
-            df.ta.rsi(length=14, append=True)
-            bbands = df.ta.bbands(length=20, std=2.0)
-            if bbands is not None and not bbands.empty:
-                df['BBL_20_2.0'] = bbands.iloc[:, 0]
-            df['VOLUME_SMA_20'] = df.ta.sma(close=df['Volume'], length=20)
-            
-            all_ticker_data[ticker] = df
-
-        except Exception as e:
-            print(f"\n  - 오류 발생 [{ticker}]: {e}")
-            continue
+    label = ' + '.join(names)
+    metrics.run_info['index'] = '+'.join(names)
+    metrics.begin_stage('stage1_prices')
+    progress.stage('stage1_prices', "1단계: 가격 데이터 로딩 및 지표 계산")
+    print(f"--- 1단계: {label} 데이터 사전 로딩 및 지표 계산 시작 ---")
+    universes = {name: (args.custom_tickers if name not in KNOWN_INDEXES else get_index_tickers(name)) for name in names}
+    # 여러 대상에 겹치는 종목은 한 번만 가져와 계산합니다.
+    all_tickers = list(dict.fromkeys(ticker for tickers in universes.values() for ticker in tickers))
+    if multiple:
+        print(f"[대상] {', '.join(f'{name} {len(tickers)}개' for name, tickers in universes.items())} -> 중복 제외 {len(all_tickers)}개")
+    metrics.inc('universe_tickers_total', len(all_tickers))
+
+    def print_progress(message):
+        def report(done, total, ticker):
+            print(f"  - 진행: [{done}/{total}] {ticker} {message}", end='\r')
+            progress.step(done, total)
+        return report
+
+    # 가격 저장소를 쓰는 경우 저장된 지표 상태에 새 봉만 반영하고(봉당 O(1)),
+    # 그렇지 않으면 전체 종목을 (봉 × 티커) 패널로 묶어 배열 연산으로 한 번에 계산합니다.
+    # 어느 쪽이든 이후 단계에서 쓰는 마지막 두 봉의 값만 종목별 한 행짜리 표로 남깁니다.
+    price_store = get_price_store()
+    state_store = None
+    if price_store is not None and config.getboolean('Data', 'use_indicator_state', fallback=True):
+        state_store = IndicatorStateStore(price_store.store_dir)
+        snapshot = lambda frames: streaming_snapshot(frames, price_store.store_dir, store=state_store)
+    else:
+        snapshot = lambda frames: (compute_snapshot(frames), {})
+
+    # 가격 데이터는 설정된 동시 실행 수와 속도 제한 아래에서 묶음 단위로 병렬 로딩하고, 메모리 예산에 맞춰 나눠 처리합니다.
+    # 티커별 DataFrame은 묶음마다 버리고, 이후 단계는 최신 지표 표만 사용합니다.
+    signal_table, price_errors, state_counts = load_universe(
+        all_tickers, "250d", snapshot,
+        memory_budget_mb=config.getint('Data', 'memory_budget_mb', fallback=0),
+        min_chunk=get_fetch_options()['batch_size'],
+        progress=print_progress("데이터 로딩 중..."))
+    if state_store is not None:
+        state_store.save()
+    metrics.set_gauge('signal_table_bytes', int(signal_table.memory_usage(deep=True).sum()))
+    for state_status, count in state_counts.items():
+        metrics.inc('indicator_state_total', count, result=state_status)
+    for ticker, e in price_errors.items():
+        print(f"\n  - 오류 발생 [{ticker}]: {e}")
     print("\n--- 데이터 로딩 및 계산 완료 ---")
-
-    # --- 1.5단계: 산업별 평균 Forward P/E 계산 ---
-    print("\n--- 1.5단계: 전체 산업별 평균 Forward P/E 계산 시작 ---")
-    sector_pes = {}
-    for i, ticker in enumerate(all_tickers):
-        progress_msg = f"  - 진행: [{i + 1}/{len(all_tickers)}] {ticker} 정보 조회 중..."
-        print(progress_msg, end='\r')
-        try:
-            stock_info = yf.Ticker(ticker).info
-            sector = stock_info.get('sector')
-            forward_pe = stock_info.get('forwardPE')
-            if sector and forward_pe and forward_pe > 0:
-                if sector not in sector_pes:
-                    sector_pes[sector] = []
-                sector_pes[sector].append(forward_pe)
-        except Exception:
-            continue # 정보 조회 실패 시 건너뛰기
-
-    sector_avg_pe = {}
-    for sector, pe_list in sector_pes.items():
-        sector_avg_pe[sector] = sum(pe_list) / len(pe_list)
-    
-    print("\n--- 산업별 평균 P/E 계산 완료 ---")
-    # print(sector_avg_pe) # 디버그 필요시 주석 해제
-
-    # --- 2. 저평가 후보 종목 스크리닝 (메모리 기반) ---
-    watchlist_data = {}
-    print("\n--- 2단계: 저평가 후보 종목 스크리닝 (메모리 기반) ---")
-    print(f"[스크리닝 조건] RSI < {screener_rsi_threshold}" + (f" | 0 < PEG < {screener_peg_threshold}" if screener_use_peg_filter else ""))
-
-    for i, (ticker, df) in enumerate(all_ticker_data.items()):
-        progress_msg = f"  - 진행: [{i + 1}/{len(all_ticker_data)}] {ticker}"
-        print(progress_msg, end='\r')
-
-        if df.empty or 'RSI_14' not in df.columns:
-            continue
-
-        latest_rsi = df.iloc[-1]['RSI_14']
-        if not (pd.notna(latest_rsi) and latest_rsi < screener_rsi_threshold):
-            continue
-
-        # PEG 필터 적용 (필요시)
-        if screener_use_peg_filter:
-            try:
-                stock_info = yf.Ticker(ticker).info
-                peg_ratio = stock_info.get('pegRatio')
-                if not (peg_ratio is not None and 0 < peg_ratio < screener_peg_threshold):
-                    continue # PEG 조건 미충족 시 건너뛰기
-            except Exception as e:
-                # print(f"\n  - {ticker} PEG 정보 조회 오류: {e}") # 디버그 필요시 주석 해제
-                continue # 정보 조회 실패 시 해당 종목은 제외
-
-        # 모든 필터를 통과한 경우에만 추가
-        watchlist_data[ticker] = df
-    
-    print("\n스크리닝 완료!                                  ")
-
-    if not watchlist_data:
-        print("\n2단계 스크리닝 결과, 저평가 후보 종목을 찾지 못했습니다.")
-        return
-
-    print(f"\n--- 2단계 결과: 최종 관심 종목 리스트 ({len(watchlist_data)}개) ---")
-    print(", ".join(watchlist_data.keys()))
-
-    # --- 3. 매수 타이밍 포착 (메모리 기반) ---
-    print("\n\n--- 3단계: 매수 타이밍 포착 시작 ---")
-    print(f"[추세 조건] {'엄격 모드' if analyzer_use_strict_filter else '완화 모드'}")
-
-    analyzer_rsi_threshold = analyzer_initial_rsi_threshold
-    previous_rsi_threshold = 0
-    cumulative_signals = set()
-
-    while analyzer_rsi_threshold <= analyzer_max_rsi_threshold:
-        print(f"\n- RSI < {analyzer_rsi_threshold} 기준으로 매수 신호 분석 시도...")
-        
-        eligible_data = {ticker: df for ticker, df in watchlist_data.items() 
-                         if not df.empty and 'RSI_14' in df.columns and 
-                         df.iloc[-1]['RSI_14'] < analyzer_rsi_threshold and 
-                         df.iloc[-1]['RSI_14'] >= previous_rsi_threshold}
+    for name, tickers in universes.items():
+        members = set(tickers)
+        stage_outputs[name] = {'index': name, 'tickers': len(tickers),
+                               'price_errors': sorted(ticker for ticker in price_errors if ticker in members)}
+
+    # --- 1.5단계: 산업별 Forward P/E 통계 갱신 ---
+    # 섹터 통계는 대상별 저장소에 유지되며 info 캐시가 티커 정보를 새로 가져올 때마다 증분 갱신됩니다.
+    # 여기서는 새로 편입되었거나 오래된 티커만 (여러 대상에 속해도 한 번만) 조회합니다.
+    metrics.begin_stage('stage1.5_sector_pe')
+    progress.stage('stage1.5_sector_pe', "1.5단계: 산업별 Forward P/E 통계 갱신")
+    print("\n--- 1.5단계: 산업별 Forward P/E 통계 갱신 시작 ---")
+    sector_stats = {name: get_sector_stats(name) for name in names}
+    stale_tickers = list(dict.fromkeys(ticker for name in names for ticker in sector_stats[name].sync_universe(universes[name])))
+    memberships = {name: set(tickers) for name, tickers in universes.items()}
+
+    def refresh_sector_pe(ticker):
+        info = get_info(ticker, fields=('sector', 'forwardPE'))
+        for name in names:
+            if ticker in memberships[name]:
+                sector_stats[name].update_from_info(ticker, info)
+
+    fetch_all(refresh_sector_pe, stale_tickers, progress=print_progress("정보 조회 중..."))
+    for name in names:
+        sector_stats[name].save()
+        stage_outputs[name]['sector_avg_pe'] = sector_stats[name].means()
+    metrics.inc('sector_stats_refreshed_total', len(stale_tickers))
+
+    kept = ', '.join(f"{name} {len(sector_stats[name])}개" for name in names) if multiple else f"{len(sector_stats[names[0]])}개"
+    print(f"\n--- 산업별 P/E 통계 갱신 완료 (조회 {len(stale_tickers)}개, 보관 {kept}) ---")
+    # print(sector_stats[names[0]].means()) # 디버그 필요시 주석 해제
+
+    def select_candidates(name):
+        """2~4단계: 대상 하나의 최신 지표 표 부분 집합에서 최종 후보를 고릅니다. 후보가 없으면 None."""
+        outputs = stage_outputs[name]
+        view = signal_table.loc[[ticker for ticker in universes[name] if ticker in signal_table.index]]
+
+        # --- 2. 저평가 후보 종목 스크리닝 (메모리 기반) ---
+        metrics.begin_stage('stage2_screening')
+        progress.stage('stage2_screening', f"2단계: {name} 저평가 후보 종목 스크리닝" if multiple else "2단계: 저평가 후보 종목 스크리닝")
+        watchlist = []
+        print("\n--- 2단계: 저평가 후보 종목 스크리닝 (메모리 기반) ---")
+        print(f"[스크리닝 조건] RSI < {screener_rsi_threshold}" + (f" | 0 < PEG < {screener_peg_threshold}" if screener_use_peg_filter else ""))
+
+        # RSI 조건은 1단계에서 만든 최신 지표 표에서 한 번에 걸러냅니다.
+        rsi_candidates = view.index[(view['RSI_14'] < screener_rsi_threshold).to_numpy()].tolist()
+
+        for i, ticker in enumerate(rsi_candidates):
+            progress_msg = f"  - 진행: [{i + 1}/{len(rsi_candidates)}] {ticker}"
+            print(progress_msg, end='\r')
+            progress.step(i + 1, len(rsi_candidates))
+
+            # PEG 필터 적용 (필요시, info 캐시 덕분에 여러 대상에 속한 종목도 한 번만 조회)
+            if screener_use_peg_filter:
+                try:
+                    stock_info = get_info(ticker, fields=('pegRatio',))
+                    peg_ratio = stock_info.get('pegRatio')
+                    if not (peg_ratio is not None and 0 < peg_ratio < screener_peg_threshold):
+                        continue # PEG 조건 미충족 시 건너뛰기
+                except Exception as e:
+                    # print(f"\n  - {ticker} PEG 정보 조회 오류: {e}") # 디버그 필요시 주석 해제
+                    continue # 정보 조회 실패 시 해당 종목은 제외
+
+            # 모든 필터를 통과한 경우에만 추가
+            watchlist.append(ticker)
         
-        if not eligible_data:
-            print("  -> 이 기준 범위에 해당하는 분석 대상 종목이 없습니다. 다음 기준으로 넘어갑니다.")
-            previous_rsi_threshold = analyzer_rsi_threshold
-            analyzer_rsi_threshold += 5
-            continue
-
-        print(f"  -> 분석 대상: {len(eligible_data)}개 종목")
-
-        current_signals = find_buy_signals(
-            eligible_data,
-            rsi_threshold=analyzer_rsi_threshold,
+        print("\n스크리닝 완료!                                  ")
+        outputs['watchlist'] = watchlist
+
+        if not watchlist:
+            print("\n2단계 스크리닝 결과, 저평가 후보 종목을 찾지 못했습니다.")
+            return None
+
+        print(f"\n--- 2단계 결과: 최종 관심 종목 리스트 ({len(watchlist)}개) ---")
+        print(", ".join(watchlist))
+
+        # --- 3. 매수 타이밍 포착 (메모리 기반) ---
+        metrics.begin_stage('stage3_signals')
+        progress.stage('stage3_signals', f"3단계: {name + ' ' if multiple else ''}관심 종목 {len(watchlist)}개 매수 타이밍 분석")
+        print("\n\n--- 3단계: 매수 타이밍 포착 시작 ---")
+        print(f"[추세 조건] {'엄격 모드' if analyzer_use_strict_filter else '완화 모드'}")
+
+        # RSI 임계값 사다리 전체를 정렬 한 번으로 해결한 뒤, 단계별 기록을 기존과 같은 형식으로 출력합니다.
+        final_buy_signals, ladder_steps = resolve_rsi_ladder(
+            view.loc[watchlist],
+            initial_rsi_threshold=analyzer_initial_rsi_threshold,
+            max_rsi_threshold=analyzer_max_rsi_threshold,
+            rsi_step=analyzer_rsi_threshold_step,
+            min_signals_to_find=analyzer_min_signals_to_find,
             use_strict_filter=analyzer_use_strict_filter,
             use_bollinger_band=analyzer_use_bollinger_band,
             bollinger_band_mode=analyzer_bollinger_band_mode,
             bollinger_band_relaxed_pct=analyzer_bollinger_band_relaxed_pct,
             use_volume_filter=analyzer_use_volume_filter
         )
-        
-        if current_signals:
-            cumulative_signals.update(current_signals)
-            print(f"  -> 신호 발견! (RSI: {analyzer_rsi_threshold}, {len(current_signals)}개 추가, 누적 {len(cumulative_signals)}개)")
-        else:
-            print("  -> 신호 없음.")
-        
-        if len(cumulative_signals) >= analyzer_min_signals_to_find:
-            print(f"  -> 목표 신호 개수({analyzer_min_signals_to_find}개) 달성. 분석을 종료합니다.")
-            break
-        
-        previous_rsi_threshold = analyzer_rsi_threshold
-        analyzer_rsi_threshold += 5
-
-    final_buy_signals = list(cumulative_signals)
-
-    # --- 4. 최종 결과 및 펀더멘탈 필터링 ---
-    if not final_buy_signals:
-        print(f"\n\n--- 최종 결과: 모든 RSI 기준({analyzer_initial_rsi_threshold}~{analyzer_max_rsi_threshold})에서 매수 신호를 찾지 못했습니다. ---")
-        return
-
-    unique_signals = sorted(list(set(final_buy_signals)))
-    print(f"\n\n--- 3단계 결과: 기술적 분석 통과 종목 ({len(unique_signals)}개) ---")
-    print(", ".join(unique_signals))
-
-    # --- 4단계: 애널리스트 의견 필터링 (옵션) ---
-    if use_analyst_filter:
-        print("\n--- 4단계: 애널리스트 의견 필터링 시작 (Buy 또는 Strong Buy) ---")
-        fundamental_buy_signals = []
-        for ticker in unique_signals:
-            print(f"  - {ticker} 펀더멘탈 확인 중...", end='\r')
-            try:
-                stock = yf.Ticker(ticker)
-                recommendation = stock.info.get('recommendationKey')
-                if recommendation in ['buy', 'strong_buy']:
-                    fundamental_buy_signals.append(ticker)
-            except Exception:
+
+        for step in ladder_steps:
+            print(f"\n- RSI < {step['threshold']} 기준으로 매수 신호 분석 시도...")
+            if not step['eligible']:
+                print("  -> 이 기준 범위에 해당하는 분석 대상 종목이 없습니다. 다음 기준으로 넘어갑니다.")
                 continue
-        print("\n필터링 완료!")
 
-        if not fundamental_buy_signals:
-            print("\n--- 최종 결과: 애널리스트 의견이 Buy/Strong Buy인 종목이 없습니다. ---")
-            return
-        
-        final_signals_to_analyze = fundamental_buy_signals
-    else:
-        final_signals_to_analyze = unique_signals
+            print(f"  -> 분석 대상: {step['eligible']}개 종목")
+            if step['new_signals']:
+                print(f"  -> 신호 발견! (RSI: {step['threshold']}, {len(step['new_signals'])}개 추가, 누적 {step['cumulative']}개)")
+            else:
+                print("  -> 신호 없음.")
+
+            if step['cumulative'] >= analyzer_min_signals_to_find:
+                print(f"  -> 목표 신호 개수({analyzer_min_signals_to_find}개) 달성. 분석을 종료합니다.")
+
+
+        # --- 4. 최종 결과 및 펀더멘탈 필터링 ---
+        if not final_buy_signals:
+            print(f"\n\n--- 최종 결과: 모든 RSI 기준({analyzer_initial_rsi_threshold}~{analyzer_max_rsi_threshold})에서 매수 신호를 찾지 못했습니다. ---")
+            return None
+
+        unique_signals = sorted(list(set(final_buy_signals)))
+        outputs['technical_signals'] = unique_signals
+        print(f"\n\n--- 3단계 결과: 기술적 분석 통과 종목 ({len(unique_signals)}개) ---")
+        print(", ".join(unique_signals))
+
+        # --- 4단계: 애널리스트 의견 필터링 (옵션) ---
+        if use_analyst_filter:
+            metrics.begin_stage('stage4_analyst')
+            progress.stage('stage4_analyst', f"4단계: {name + ' ' if multiple else ''}후보 {len(unique_signals)}개 애널리스트 의견 확인")
+            print("\n--- 4단계: 애널리스트 의견 필터링 시작 (Buy 또는 Strong Buy) ---")
+            fundamental_buy_signals = []
+            for ticker in unique_signals:
+                print(f"  - {ticker} 펀더멘탈 확인 중...", end='\r')
+                try:
+                    recommendation = get_info(ticker, fields=('recommendationKey',)).get('recommendationKey')
+                    if recommendation in ['buy', 'strong_buy']:
+                        fundamental_buy_signals.append(ticker)
+                except Exception:
+                    continue
+            print("\n필터링 완료!")
+
+            if not fundamental_buy_signals:
+                print("\n--- 최종 결과: 애널리스트 의견이 Buy/Strong Buy인 종목이 없습니다. ---")
+                return None
+            
+            final_signals_to_analyze = fundamental_buy_signals
+        else:
+            final_signals_to_analyze = unique_signals
 
-    # --- 5. 최종 후보 펀더멘탈 심층 분석 ---
-    print(f"\n\n--- 4단계 결과: 최종 후보 종목 ({len(final_signals_to_analyze)}개) ---")
-    print(", ".join(final_signals_to_analyze))
+        print(f"\n\n--- 4단계 결과: 최종 후보 종목 ({len(final_signals_to_analyze)}개) ---")
+        print(", ".join(final_signals_to_analyze))
+        outputs['final_candidates'] = final_signals_to_analyze
+        return final_signals_to_analyze
 
-    result_filepath = os.path.join(PROJECT_ROOT, "fundamental_analysis_results.txt")
-    print(f"\n--- 5단계: 최종 후보 펀더멘탈 심층 분석 (결과 파일: {result_filepath}) ---")
-    
-    chunk_size = 2
-    all_chunks_output = []
+    finals = {}
+    for name in names:
+        if multiple:
+            print(f"\n\n===== {name} ({len(universes[name])}개 종목) =====")
+        finals[name] = select_candidates(name)
 
-    for i in range(0, len(final_signals_to_analyze), chunk_size):
-        chunk_tickers = final_signals_to_analyze[i:i+chunk_size]
-        chunk_output = []
-        
-        chunk_output.append(f"--- 펀더멘탈 분석 (Part {i//chunk_size + 1}/{len(final_signals_to_analyze)//chunk_size + (1 if len(final_signals_to_analyze)%chunk_size > 0 else 0)}) ---\n")
-
-        for ticker in chunk_tickers:
-            original_stdout = sys.stdout
-            temp_output = io.StringIO()
-            sys.stdout = temp_output
-            try:
-                get_fundamental_analysis(ticker, sector_avg_pe)
-                sys.stdout.write("-" * 50 + "\n")
-            finally:
-                sys.stdout = original_stdout
-            chunk_output.append(temp_output.getvalue())
-        
-        all_chunks_output.append("\n".join(chunk_output))
+    # --- 5. 최종 후보 펀더멘탈 심층 분석 ---
+    # 여러 대상의 최종 후보에 겹치는 종목은 한 번만 분석하고, 산업 평균 비교만 대상별 섹터 통계로 채웁니다.
+    candidates = list(dict.fromkeys(ticker for final_signals in finals.values() if final_signals for ticker in final_signals))
+    if candidates:
+        metrics.begin_stage('stage5_fundamental')
+        progress.stage('stage5_fundamental', f"5단계: 최종 후보 {len(candidates)}개 펀더멘탈 분석")
+        result_target = os.path.join(universe_dir(args, names[0]), RESULTS_TEXT) if not multiple else f"대상별 디렉토리의 {RESULTS_TEXT}"
+        print(f"\n--- 5단계: 최종 후보 펀더멘탈 심층 분석 (결과 파일: {result_target}) ---")
+
+        def analyze(ticker):
+            with metrics.timed('ticker_seconds', ticker=ticker, stage='stage5_fundamental'):
+                return analyze_fundamentals(ticker)
+
+        # 분석 함수는 출력 없이 결과 레코드를 반환하므로 종목들을 동시에 분석할 수 있습니다. (오류는 레코드에 담겨 재시도하지 않음)
+        fundamental_results, _ = fetch_all(analyze, candidates, retries=0,
+                                           progress=lambda done, total, ticker: progress.step(done, total))
+        for name, final_signals in finals.items():
+            if not final_signals:
+                continue
+            output_dir = universe_dir(args, name)
+            save_results([with_sector_stats(fundamental_results[ticker], sector_stats[name]) for ticker in final_signals], output_dir)
+            # 디스코드 요약 메시지를 위한 별도 파일 생성
+            write_summary(os.path.join(output_dir, SUMMARY_FILE), final_signals)
 
-    with open(result_filepath, "w", encoding="utf-8") as f:
-        f.write("\n".join(all_chunks_output))
+    if multiple:
+        write_combined_summary(os.path.join(args.output_dir, SUMMARY_FILE), finals)
 
-    # 디스코드 요약 메시지를 위한 별도 파일 생성
-    summary_filepath = os.path.join(PROJECT_ROOT, "workflow_summary.txt")
-    with open(summary_filepath, "w", encoding="utf-8") as f:
-        f.write(f"**분석 완료!** 최종 매수 신호 종목 ({len(final_signals_to_analyze)}개)를 찾았습니다.\n")
-        f.write(f"티커: {', '.join(final_signals_to_analyze)}\n")
-        f.write("상세 리포트를 보려면 `/report` 명령어를 사용하세요.")
+    get_info_cache().save()
+    for name in names:
+        sector_stats[name].save()
 
-    print("분석 완료.")
+    if candidates:
+        print("분석 완료.")
 
 if __name__ == '__main__':
-    run_investment_workflow()
\ No newline at end of file
+    run_investment_workflow()
@@ -0,0 +1,491 @@
+import io
+import os
+import sys
+import json
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+import requests
+
+from config_service import get_config_service
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+INDEX_SOURCES = {
+    # 지수 이름: (Wikipedia URL, 티커 컬럼 이름)
+    'SP500': ('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies', 'Symbol'),
+    'NASDAQ100': ('https://en.wikipedia.org/wiki/Nasdaq-100', 'Ticker'),  # NASDAQ 100 페이지에서는 'Ticker' 컬럼 사용
+}
+ANALYSIS_PAGE_URL = "https://finance.yahoo.com/quote/{ticker}/analysis/"
+# Wikipedia 구성 종목 표의 HTML id (두 페이지 모두 같은 id를 사용합니다)
+INDEX_TABLE_ID = 'constituents'
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Accept-Language": "en-US,en;q=0.9,ko;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+def period_to_bars(period):
+    """
+    yfinance 스타일의 기간 문자열("250d", "1mo", "10y", "max" 등)을 대략적인 거래일 수로 변환합니다.
+    "max"는 None(전체 기간)을 반환합니다.
+    """
+    if period is None or period == 'max':
+        return None
+    if period == 'ytd':
+        today = pd.Timestamp.today().normalize()
+        return max(1, len(pd.bdate_range(pd.Timestamp(today.year, 1, 1), today)))
+    if period.endswith('mo'):
+        return int(period[:-2]) * 21
+    if period.endswith('wk'):
+        return int(period[:-2]) * 5
+    if period.endswith('d'):
+        return int(period[:-1])
+    if period.endswith('y'):
+        return int(period[:-1]) * 252
+    raise ValueError(f"지원하지 않는 기간 형식입니다: {period}")
+
+
+def last_session_date(now=None):
+    """미국 정규장 마감(16:00 America/New_York) 기준으로 가장 최근에 완료된 거래일(주말 제외)을 반환합니다."""
+    ny_now = now or datetime.now(pytz.timezone('America/New_York'))
+    session = pd.Timestamp(ny_now.date())
+    if ny_now.hour < 16:
+        session -= pd.Timedelta(days=1)
+    while session.weekday() >= 5:
+        session -= pd.Timedelta(days=1)
+    return session
+
+
+def normalize_ohlcv(df):
+    """다운로드 결과의 MultiIndex 컬럼을 평탄화하고 OHLCV 컬럼만 남깁니다."""
+    if df is None:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.droplevel(1)
+    if df.empty:
+        return df
+    df = df[[col for col in OHLCV_COLUMNS if col in df.columns]]
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+    df.index.name = 'Date'
+    return df
+
+
+def _slice_period(df, period="250d", start=None):
+    """전체 히스토리에서 start 이후 또는 마지막 period 만큼의 구간을 잘라냅니다."""
+    if start is not None:
+        return df[df.index >= pd.Timestamp(start)]
+    bars = period_to_bars(period)
+    return df if bars is None else df.iloc[-bars:]
+
+
+def legacy_analysis_frame(earnings_estimate, growth_estimates):
+    """
+    yfinance `earnings_estimate`(기간별 'avg')와 `growth_estimates`(기간별 'stockTrend', 비율)를
+    이전 `Ticker.analysis` 형식((구분, 기간) 인덱스, 'Avg. Estimate' 컬럼)의 DataFrame으로 변환합니다.
+    둘 다 비어 있으면 None을 반환합니다.
+    """
+    rows = []
+    if earnings_estimate is not None and 'avg' in getattr(earnings_estimate, 'columns', ()):
+        rows += [('Earnings Estimate', period, value) for period, value in earnings_estimate['avg'].dropna().items()]
+    if growth_estimates is not None and 'stockTrend' in getattr(growth_estimates, 'columns', ()):
+        rows += [('Growth', period, f"{value * 100:.2f}%") for period, value in growth_estimates['stockTrend'].dropna().items()]
+    if not rows:
+        return None
+    return pd.DataFrame({'Avg. Estimate': [value for _, _, value in rows]},
+                        index=pd.MultiIndex.from_tuples([(section, period) for section, period, _ in rows]))
+
+
+def has_parquet_support():
+    """Parquet 엔진(pyarrow 또는 fastparquet) 설치 여부를 확인합니다."""
+    for engine in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def read_table(path_without_ext):
+    """'<경로>.parquet' 또는 '<경로>.csv' 중 존재하는 파일을 읽습니다. 둘 다 없으면 None을 반환합니다."""
+    parquet_path = path_without_ext + '.parquet'
+    csv_path = path_without_ext + '.csv'
+    if os.path.exists(parquet_path) and has_parquet_support():
+        return pd.read_parquet(parquet_path)
+    if os.path.exists(csv_path):
+        # 저장한 값과 비트 단위로 같은 값을 읽도록 round_trip 파서를 사용합니다.
+        return pd.read_csv(csv_path, index_col=0, parse_dates=True, float_precision='round_trip')
+    return None
+
+
+def write_table(df, path_without_ext):
+    """
+    Parquet 엔진이 있으면 Parquet으로, 없으면 CSV로 저장합니다. 저장된 파일 경로를 반환합니다.
+    임시 파일에 쓴 뒤 교체하므로 다른 프로세스가 반쯤 쓰인 파일을 읽는 일이 없습니다.
+    """
+    os.makedirs(os.path.dirname(path_without_ext), exist_ok=True)
+    if has_parquet_support():
+        path = path_without_ext + '.parquet'
+        df.to_parquet(path + '.tmp')
+    else:
+        path = path_without_ext + '.csv'
+        df.to_csv(path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class MarketDataProvider:
+    """
+    시장 데이터 공급자 인터페이스입니다.
+    모든 분석 모듈은 yfinance나 웹 요청을 직접 호출하지 않고 이 인터페이스를 통해 데이터를 가져옵니다.
+    """
+    name = 'base'
+    is_remote = False  # 원격 공급자만 요청 속도 제한을 적용합니다.
+
+    def download(self, ticker, period="250d", start=None):
+        """수정주가(auto_adjust) 기준 일봉 OHLCV DataFrame을 반환합니다. 데이터가 없으면 빈 DataFrame을 반환합니다."""
+        raise NotImplementedError
+
+    def download_many(self, tickers, period="250d", start=None):
+        """여러 티커의 OHLCV를 한 번에 가져와 {티커: DataFrame} 딕셔너리로 반환합니다. 데이터가 없는 티커는 빠집니다."""
+        frames = {}
+        for ticker in tickers:
+            df = self.download(ticker, period=period, start=start)
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+    def get_info(self, ticker):
+        """yfinance `Ticker.info`와 같은 형식의 딕셔너리를 반환합니다."""
+        raise NotImplementedError
+
+    def get_recommendations(self, ticker):
+        """애널리스트 추천 집계 DataFrame(strongBuy, buy, hold, sell, strongSell 컬럼)을 반환합니다."""
+        return None
+
+    def get_analysis(self, ticker):
+        """yfinance `Ticker.analysis` 형식의 DataFrame을 반환합니다. 지원하지 않으면 None을 반환합니다."""
+        return None
+
+    def get_analysis_page(self, ticker):
+        """Yahoo Finance 분석 페이지 HTML을 반환합니다. 가져올 수 없으면 빈 문자열을 반환합니다."""
+        return ""
+
+    def get_index_tickers(self, index_name):
+        """지수 구성 종목 티커 리스트를 반환합니다."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """yfinance와 웹 스크레이핑(Yahoo Finance, Wikipedia)을 사용하는 기본 온라인 공급자입니다."""
+    name = 'yfinance'
+    is_remote = True
+
+    def __init__(self, timeout=10, http=None, analysis_url=ANALYSIS_PAGE_URL, index_sources=None):
+        self.timeout = timeout
+        self._http = http
+        # 로컬 대역 서버로 시험할 수 있도록 요청 URL을 바꿀 수 있습니다.
+        self.analysis_url = analysis_url
+        self.index_sources = index_sources or INDEX_SOURCES
+
+    @property
+    def http(self):
+        from http_client import get_http_client
+        return self._http or get_http_client()
+
+    def download(self, ticker, period="250d", start=None):
+        import yfinance as yf
+        if start is not None:
+            df = yf.download(ticker, start=start, auto_adjust=True, progress=False, timeout=self.timeout)
+        else:
+            df = yf.download(ticker, period=period, auto_adjust=True, progress=False, timeout=self.timeout)
+        return normalize_ohlcv(df)
+
+    def download_many(self, tickers, period="250d", start=None):
+        # yfinance의 다중 티커 다운로드를 사용합니다. 동시성은 fetch_engine이 관리하므로 내부 스레드는 끕니다.
+        import yfinance as yf
+        tickers = list(tickers)
+        if len(tickers) == 1:
+            return super().download_many(tickers, period=period, start=start)
+        kwargs = {'start': start} if start is not None else {'period': period}
+        data = yf.download(tickers, group_by='ticker', auto_adjust=True, progress=False,
+                           threads=False, timeout=self.timeout, **kwargs)
+        frames = {}
+        if data is None or data.empty:
+            return frames
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            df = data[ticker].dropna(how='all')
+            if not df.empty:
+                frames[ticker] = normalize_ohlcv(df)
+        return frames
+
+    def get_info(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).info
+
+    def get_recommendations(self, ticker):
+        import yfinance as yf
+        return yf.Ticker(ticker).recommendations
+
+    def get_analysis(self, ticker):
+        import yfinance as yf
+        stock = yf.Ticker(ticker)
+        analysis = getattr(stock, 'analysis', None)
+        if analysis is not None:
+            return analysis
+        # 최신 yfinance에는 .analysis가 없으므로 earnings_estimate/growth_estimates를 이전 .analysis 형식으로 합칩니다.
+        return legacy_analysis_frame(stock.earnings_estimate, stock.growth_estimates)
+
+    def get_analysis_page(self, ticker):
+        url = self.analysis_url.format(ticker=ticker)
+        for attempt in range(3): # 최대 3번 재시도
+            try:
+                response = self.http.get(url, headers=BROWSER_HEADERS, timeout=self.timeout)
+                response.raise_for_status()
+                return response.text
+            except requests.exceptions.HTTPError as http_err:
+                if http_err.response.status_code == 404:
+                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 404 오류 발생")
+                    break
+                elif http_err.response.status_code == 503:
+                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 503 오류 발생 (재시도 {attempt + 1}/3)... {http_err}")
+                    time.sleep(2) # 2초 대기 후 재시도
+                else:
+                    print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 HTTP 오류 발생: {http_err}")
+                    break # 다른 HTTP 오류는 재시도 안 함
+            except Exception as web_e:
+                print(f"  - 디버그: Yahoo Finance 웹페이지({url}) 접근 중 기타 오류 발생: {web_e}")
+                break # 기타 오류는 재시도 안 함
+        return ""
+
+    def get_index_tickers(self, index_name):
+        url, symbol_col = self.index_sources[index_name]
+        # 403 Forbidden 오류를 피하기 위해 User-Agent 헤더를 추가합니다.
+        response = self.http.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=self.timeout)
+        response.raise_for_status()
+        html = response.text
+
+        # 페이지의 모든 표를 파싱하지 않고 구성 종목 표만 파싱합니다.
+        # 표 id가 바뀐 경우에는 티커 컬럼 이름이 들어 있는 표만 골라 파싱합니다.
+        try:
+            tables = pd.read_html(io.StringIO(html), attrs={'id': INDEX_TABLE_ID})
+        except ValueError:
+            tables = pd.read_html(io.StringIO(html), match=symbol_col)
+        for table in tables:
+            if symbol_col in table.columns:
+                return table[symbol_col].dropna().astype(str).tolist()
+        return []
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    로컬에 저장된 데이터를 재생하는 오프라인 공급자입니다. 디렉토리 구조:
+        prices/<TICKER>.parquet|csv, info/<TICKER>.json, recommendations/<TICKER>.csv,
+        pages/<TICKER>.html, index/<INDEX>.txt
+    `record_replay`로 온라인 공급자의 데이터를 이 구조로 저장할 수 있습니다.
+    """
+    name = 'replay'
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+
+    def _path(self, kind, name):
+        return os.path.join(self.data_dir, kind, name)
+
+    def download(self, ticker, period="250d", start=None):
+        df = read_table(self._path('prices', ticker))
+        if df is None or df.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        return _slice_period(normalize_ohlcv(df).sort_index(), period, start)
+
+    def get_info(self, ticker):
+        path = self._path('info', f'{ticker}.json')
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get_recommendations(self, ticker):
+        path = self._path('recommendations', f'{ticker}.csv')
+        return pd.read_csv(path) if os.path.exists(path) else None
+
+    def get_analysis_page(self, ticker):
+        path = self._path('pages', f'{ticker}.html')
+        if not os.path.exists(path):
+            return ""
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def get_index_tickers(self, index_name):
+        path = self._path('index', f'{index_name}.txt')
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    시드 고정 합성 OHLCV(기하 브라운 운동)를 생성하는 오프라인 공급자입니다.
+    같은 시드와 티커는 항상 같은 데이터를 만들며, 네트워크 없이 전체 워크플로우 프로파일링/벤치마크에 사용합니다.
+    """
+    name = 'synthetic'
+    ORIGIN = pd.Timestamp('2005-01-03')
+    SECTORS = ['Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Industrials',
+               'Communication Services', 'Consumer Defensive', 'Energy', 'Utilities', 'Real Estate', 'Basic Materials']
+    RECOMMENDATIONS = ['strong_buy', 'buy', 'hold', 'underperform', 'sell']
+
+    def __init__(self, seed=42, universe_size=500, end_date=None):
+        self.seed = seed
+        self.universe_size = universe_size
+        self.end_date = pd.Timestamp(end_date) if end_date else None
+        self._dates = None
+
+    def _calendar(self):
+        # 영업일 달력 생성 비용이 크므로 공급자당 한 번만 계산합니다.
+        if self._dates is None:
+            self._dates = pd.DatetimeIndex(pd.bdate_range(self.ORIGIN, self.end_date or last_session_date()), name='Date')
+        return self._dates
+
+    def _rng(self, ticker, stream=0):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode()), stream])
+
+    def _full_history(self, ticker):
+        dates = self._calendar()
+        # 필드마다 별도 난수 스트림을 사용하여 종료일이 바뀌어도 과거 구간의 값이 변하지 않게 합니다.
+        rng = self._rng(ticker)
+        n = len(dates)
+        drift = rng.normal(0.0004, 0.0004)
+        volatility = rng.uniform(0.01, 0.03)
+        base_price = rng.uniform(20, 500)
+        base_volume = rng.uniform(5e5, 2e7)
+        close = base_price * np.exp(np.cumsum(self._rng(ticker, 10).normal(drift, volatility, n)))
+        open_ = np.concatenate(([close[0]], close[:-1])) * (1 + self._rng(ticker, 11).normal(0, volatility / 4, n))
+        high = np.maximum(open_, close) * (1 + np.abs(self._rng(ticker, 12).normal(0, volatility / 2, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(self._rng(ticker, 13).normal(0, volatility / 2, n)))
+        volume = np.round(self._rng(ticker, 14).lognormal(np.log(base_volume), 0.4, n))
+        return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                            index=dates)
+
+    def download(self, ticker, period="250d", start=None):
+        return _slice_period(self._full_history(ticker), period, start)
+
+    def get_info(self, ticker):
+        rng = self._rng(ticker, stream=1)
+        current_price = float(self._full_history(ticker)['Close'].iloc[-1])
+        return {
+            'symbol': ticker,
+            'sector': self.SECTORS[int(rng.integers(len(self.SECTORS)))],
+            'forwardPE': float(rng.lognormal(np.log(20), 0.4)),
+            'pegRatio': float(rng.uniform(0.3, 3.0)),
+            'recommendationKey': self.RECOMMENDATIONS[int(rng.integers(len(self.RECOMMENDATIONS)))],
+            'numberOfAnalystOpinions': int(rng.integers(3, 45)),
+            'targetMeanPrice': current_price * (1 + float(rng.normal(0.08, 0.12))),
+            'currentPrice': current_price,
+            'regularMarketPrice': current_price,
+            'profitMargins': float(rng.normal(0.12, 0.08)),
+            'returnOnEquity': float(rng.normal(0.15, 0.1)),
+        }
+
+    def get_recommendations(self, ticker):
+        rng = self._rng(ticker, stream=2)
+        counts = rng.integers(0, 15, size=5)
+        return pd.DataFrame([{'period': '0m', 'strongBuy': counts[0], 'buy': counts[1], 'hold': counts[2],
+                              'sell': counts[3], 'strongSell': counts[4]}])
+
+    def get_index_tickers(self, index_name):
+        size = self.universe_size if index_name == 'SP500' else min(100, self.universe_size)
+        return [f'SYN{i:04d}' for i in range(size)]
+
+
+def record_replay(tickers, data_dir, index_name=None, source=None, period="max"):
+    """
+    source 공급자(기본: 현재 설정된 공급자)에서 데이터를 가져와 ReplayProvider 디렉토리 구조로 저장합니다.
+    네트워크가 되는 환경에서 한 번 기록해두면 이후 오프라인에서 같은 데이터로 워크플로우를 재실행할 수 있습니다.
+    """
+    source = source or get_provider()
+    replay = ReplayProvider(data_dir)
+    if index_name:
+        os.makedirs(os.path.join(data_dir, 'index'), exist_ok=True)
+        with open(replay._path('index', f'{index_name}.txt'), 'w', encoding='utf-8') as f:
+            f.write("\n".join(tickers) + "\n")
+
+    for i, ticker in enumerate(tickers):
+        print(f"  - 기록: [{i + 1}/{len(tickers)}] {ticker}", end='\r')
+        try:
+            df = source.download(ticker, period=period)
+            if not df.empty:
+                write_table(df, replay._path('prices', ticker))
+
+            os.makedirs(os.path.join(data_dir, 'info'), exist_ok=True)
+            with open(replay._path('info', f'{ticker}.json'), 'w', encoding='utf-8') as f:
+                json.dump(source.get_info(ticker), f, default=str)
+
+            recs = source.get_recommendations(ticker)
+            if recs is not None and not recs.empty:
+                os.makedirs(os.path.join(data_dir, 'recommendations'), exist_ok=True)
+                recs.to_csv(replay._path('recommendations', f'{ticker}.csv'), index=False)
+        except Exception as e:
+            print(f"\n  - 기록 오류 [{ticker}]: {e}")
+            continue
+    print(f"\n기록 완료: {data_dir}")
+
+
+# --- 공급자 선택 ---
+_provider = None
+
+def create_provider(name=None):
+    """config.ini의 [Data] 섹션(또는 MARKET_DATA_PROVIDER 환경 변수)에 따라 공급자를 생성합니다."""
+    config = get_config_service()
+    name = name or os.environ.get('MARKET_DATA_PROVIDER') or config.get('Data', 'provider', fallback='yfinance')
+
+    if name == 'yfinance':
+        return YFinanceProvider()
+    if name == 'replay':
+        replay_dir = config.get('Data', 'replay_dir', fallback='data/replay')
+        return ReplayProvider(os.path.join(PROJECT_ROOT, replay_dir))
+    if name == 'synthetic':
+        return SyntheticProvider(
+            seed=config.getint('Data', 'synthetic_seed', fallback=42),
+            universe_size=config.getint('Data', 'synthetic_universe_size', fallback=500),
+            end_date=config.get('Data', 'synthetic_end_date', fallback='') or None,
+        )
+    raise ValueError(f"지원하지 않는 데이터 공급자입니다: {name}")
+
+def get_provider():
+    """프로세스 전역 공급자를 반환합니다. 처음 호출 시 설정에 따라 생성합니다."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+def set_provider(provider):
+    """프로세스 전역 공급자를 교체합니다. (벤치마크, 오프라인 실행용) 이전 공급자를 반환합니다."""
+    global _provider
+    previous, _provider = _provider, provider
+    return previous
+
+
+if __name__ == '__main__':
+    # 사용법: python market_data.py record <SP500|NASDAQ100> [저장 디렉토리]
+    if len(sys.argv) >= 3 and sys.argv[1] == 'record':
+        index_to_record = sys.argv[2]
+        target_dir = sys.argv[3] if len(sys.argv) > 3 else os.path.join(PROJECT_ROOT, 'data', 'replay')
+        index_tickers = [s.replace('.', '-') for s in get_provider().get_index_tickers(index_to_record)]
+        record_replay(index_tickers, target_dir, index_name=index_to_record)
+    else:
+        print("사용법: python market_data.py record <SP500|NASDAQ100> [저장 디렉토리]")
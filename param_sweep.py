@@ -0,0 +1,303 @@
+import os
+import sys
+import time
+import random
+import pickle
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# 경로 문제 해결 및 config 임포트
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+DISCORD_DIR = os.path.join(PROJECT_ROOT, 'discord')
+if DISCORD_DIR not in sys.path:
+    sys.path.append(DISCORD_DIR)
+
+from config_service import get_config_service
+from config_manager import get_configurable_options
+from market_data import get_provider, last_session_date
+from index_screener import get_index_tickers
+from info_cache import get_info
+from fetch_engine import fetch_all
+from indicator_engine import IndicatorPanel
+from trading_strategy_analyzer import evaluate_buy_rules
+from backtester import DEFAULT_HORIZONS, load_backtest_data, forward_outcomes, rule_inputs, summarize_backtest
+
+# 백테스트 결과에 영향을 주는 config.ini 키 -> 평가 인자 이름
+SWEEP_KEYS = {
+    ('Screener', 'rsi_threshold'): 'rsi_threshold',
+    ('Screener', 'use_peg_filter'): 'use_peg_filter',
+    ('Screener', 'peg_threshold'): 'peg_threshold',
+    ('Analyzer', 'use_strict_filter'): 'use_strict_filter',
+    ('Analyzer', 'use_bollinger_band'): 'use_bollinger_band',
+    ('Analyzer', 'bollinger_band_mode'): 'bollinger_band_mode',
+    ('Analyzer', 'bollinger_band_relaxed_pct'): 'bollinger_band_relaxed_pct',
+    ('Analyzer', 'use_volume_filter'): 'use_volume_filter',
+}
+
+# 검색 공간을 지정하지 않았을 때 사용하는 기본 그리드
+DEFAULT_GRID = [
+    'rsi_threshold=30:70:5',
+    'use_strict_filter',
+    'use_bollinger_band',
+    'bollinger_band_mode',
+    'bollinger_band_relaxed_pct=1,2,3,5',
+    'use_volume_filter',
+    'use_peg_filter',
+    'peg_threshold=0.5,1.0,1.5,2.0',
+]
+
+
+# --- 검색 공간 ---
+def _resolve_key(name, options):
+    """'section.key' 또는 'key'를 config_manager 옵션의 (section, key)로 해석합니다."""
+    if '.' in name:
+        section, key = name.split('.', 1)
+        matches = [(section, key)] if key in options.get(section, {}) else []
+    else:
+        matches = [(section, name) for section, keys in options.items() if name in keys]
+    if not matches:
+        raise ValueError(f"config.ini에 '{name}' 키가 없습니다.")
+    if len(matches) > 1:
+        raise ValueError(f"'{name}' 키가 여러 섹션에 있습니다. 'section.key' 형식으로 지정하세요: {matches}")
+    if matches[0] not in SWEEP_KEYS:
+        raise ValueError(f"'{name}' 키는 백테스트 결과에 영향을 주지 않아 검색할 수 없습니다.")
+    return matches[0]
+
+
+def _parse_value(text, value_type):
+    text = text.strip()
+    if value_type == 'bool':
+        return text.lower() in ('true', '1', 't', 'y', 'yes', 'on')
+    if value_type == 'int':
+        return int(text)
+    if value_type == 'float':
+        return float(text)
+    return text
+
+
+def parse_search_space(specs, options=None):
+    """
+    'key=값1,값2', 'key=시작:끝:간격'(끝 포함), 'key'(선택지 전체) 형식의 문자열 리스트를
+    {평가 인자 이름: 값 리스트} 딕셔너리로 변환합니다. 값의 형식은 config_manager가 추론한 형식을 따릅니다.
+    """
+    options = options if options is not None else get_configurable_options()
+    space = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        section, key = _resolve_key(name.strip(), options)
+        option = options[section][key]
+        if not values:
+            if 'choices' not in option:
+                raise ValueError(f"'{name}' 키는 선택지가 없으므로 값을 지정해야 합니다. (예: {name}=1,2,3)")
+            parsed = [_parse_value(choice, option['type']) for choice in option['choices']]
+        elif ':' in values:
+            start, stop, step = (float(v) for v in values.split(':'))
+            steps = np.arange(start, stop + step / 2, step)
+            parsed = [int(round(v)) if option['type'] == 'int' else round(float(v), 10) for v in steps]
+        else:
+            parsed = [_parse_value(v, option['type']) for v in values.split(',') if v.strip()]
+        if 'choices' in option and option['type'] == 'str':
+            invalid = [v for v in parsed if v not in option['choices']]
+            if invalid:
+                raise ValueError(f"'{name}' 키의 값 {invalid}은(는) 허용되지 않습니다. 선택지: {option['choices']}")
+        space[SWEEP_KEYS[(section, key)]] = list(dict.fromkeys(parsed))
+    return space
+
+
+def current_settings(config=None):
+    """config.ini의 현재 값을 평가 인자 딕셔너리로 반환합니다. 검색하지 않는 키는 이 값으로 고정됩니다."""
+    if config is None:
+        config = get_config_service()
+    options = get_configurable_options()
+    return {argument: _parse_value(config.get(section, key), options[section][key]['type'])
+            for (section, key), argument in SWEEP_KEYS.items()}
+
+
+def _canonical(settings):
+    """결과에 영향을 주지 않는 값(볼린저 밴드를 끈 경우의 모드 등)을 정리하여 중복 조합을 합칩니다."""
+    settings = dict(settings)
+    if not settings['use_bollinger_band']:
+        settings['bollinger_band_mode'] = None
+        settings['bollinger_band_relaxed_pct'] = None
+    elif settings['bollinger_band_mode'] != 'relaxed':
+        settings['bollinger_band_relaxed_pct'] = None
+    if not settings['use_peg_filter']:
+        settings['peg_threshold'] = None
+    return settings
+
+
+def build_combinations(space, base, samples=None, seed=42):
+    """검색 공간의 모든 조합(그리드) 또는 samples 개의 무작위 조합을 중복 없이 만듭니다."""
+    keys = list(space)
+    grid = itertools.product(*(space[key] for key in keys))
+    if samples is not None:
+        grid = list(grid)
+        random.Random(seed).shuffle(grid)
+    combinations, seen = [], set()
+    for values in grid:
+        settings = _canonical({**base, **dict(zip(keys, values))})
+        identity = tuple(sorted(settings.items()))
+        if identity in seen:
+            continue
+        seen.add(identity)
+        combinations.append(settings)
+        if samples is not None and len(combinations) >= samples:
+            break
+    return combinations
+
+
+# --- 가격 패널 캐시 ---
+def _panel_cache_dir(index_name, period):
+    return os.path.join(PROJECT_ROOT, 'data', 'sweep', get_provider().name, f'{index_name}_{period}')
+
+
+def prepare_panel_cache(index_name, period="10y", horizons=DEFAULT_HORIZONS, progress=None):
+    """
+    가격 패널, 지표, 미래 수익률, 종목별 PEG를 한 번만 계산하여 .npy 파일로 저장합니다.
+    같은 세션에 다시 실행하면 저장된 파일을 그대로 사용하며, 작업 프로세스들은 이 파일을 메모리 맵으로 공유합니다.
+    """
+    cache_dir = _panel_cache_dir(index_name, period)
+    meta_path = os.path.join(cache_dir, 'meta.pkl')
+    session = str(last_session_date())
+    if os.path.exists(meta_path):
+        with open(meta_path, 'rb') as f:
+            meta = pickle.load(f)
+        if meta['session'] == session and set(horizons) <= set(meta['horizons']):
+            return cache_dir
+
+    tickers = get_index_tickers(index_name)
+    panel, indicators, _ = load_backtest_data(tickers, period=period, progress=progress)
+    infos, _ = fetch_all(lambda ticker: get_info(ticker, fields=('pegRatio',)), panel.tickers)
+    peg = np.array([infos.get(ticker, {}).get('pegRatio') or np.nan for ticker in panel.tickers], dtype=float)
+
+    arrays = dict(panel.fields)
+    arrays.update(indicators)
+    for horizon, (returns, drawdowns) in forward_outcomes(panel, horizons).items():
+        arrays[f'return_{horizon}'] = returns
+        arrays[f'drawdown_{horizon}'] = drawdowns
+    arrays['pegRatio'] = peg
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(cache_dir, f'{name}.npy'), values)
+    meta = {
+        'session': session, 'horizons': list(horizons), 'tickers': panel.tickers, 'dates': panel.dates,
+        'fields': list(panel.fields), 'indicators': list(indicators),
+    }
+    with open(meta_path + '.tmp', 'wb') as f:
+        pickle.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return cache_dir
+
+
+def load_panel_cache(cache_dir, horizons):
+    """prepare_panel_cache로 저장한 파일을 메모리 맵으로 읽어 (패널, 지표, 미래 수익률, PEG)를 반환합니다."""
+    with open(os.path.join(cache_dir, 'meta.pkl'), 'rb') as f:
+        meta = pickle.load(f)
+    load = lambda name: np.load(os.path.join(cache_dir, f'{name}.npy'), mmap_mode='r')
+    panel = IndicatorPanel(meta['tickers'], meta['dates'], {field: load(field) for field in meta['fields']})
+    indicators = {column: load(column) for column in meta['indicators']}
+    outcomes = {horizon: (load(f'return_{horizon}'), load(f'drawdown_{horizon}')) for horizon in horizons}
+    return panel, indicators, outcomes, np.asarray(load('pegRatio'))
+
+
+# --- 평가 ---
+_worker_state = {}
+
+def _init_worker(cache_dir, horizons):
+    panel, indicators, outcomes, peg = load_panel_cache(cache_dir, horizons)
+    # 규칙 입력(이전 봉 값, 봉 수)은 조합과 무관하므로 작업 프로세스마다 한 번만 만듭니다.
+    _worker_state['data'] = (rule_inputs(panel, indicators), outcomes, peg)
+
+
+def evaluate_combination(settings):
+    """조합 하나를 평가하여 설정값과 보유 기간별 요약 지표를 한 행의 딕셔너리로 반환합니다."""
+    inputs, outcomes, peg = _worker_state['data']
+    rule_kwargs = {key: value for key, value in settings.items()
+                   if key not in ('use_peg_filter', 'peg_threshold') and value is not None}
+    signal = evaluate_buy_rules(inputs, **rule_kwargs)['signal']
+    if settings['use_peg_filter']:
+        # PEG는 과거 값이 없어 현재 값을 정적 필터로만 적용합니다. (미래 정보가 섞이는 점에 유의)
+        with np.errstate(invalid='ignore'):
+            signal &= ((peg > 0) & (peg < settings['peg_threshold']))[None, :]
+
+    summary = summarize_backtest(signal, outcomes)
+    row = dict(settings)
+    for horizon, stats in summary.iterrows():
+        row[f'signals_{horizon}d'] = int(stats['completed'])
+        row[f'hit_rate_{horizon}d'] = stats['hit_rate']
+        row[f'avg_return_{horizon}d'] = stats['avg_return']
+        row[f'excess_return_{horizon}d'] = stats['avg_return'] - stats['baseline_avg_return']
+        row[f'avg_max_drawdown_{horizon}d'] = stats['avg_max_drawdown']
+    return row
+
+
+def run_sweep(combinations, cache_dir, horizons=DEFAULT_HORIZONS, workers=None, rank_by='avg_return', rank_horizon=None,
+              min_signals=30, progress=None):
+    """
+    모든 조합을 프로세스 풀에서 평가하고 순위를 매긴 결과 DataFrame을 반환합니다.
+    신호가 min_signals 건 미만인 조합은 순위에서 맨 뒤로 보냅니다.
+    """
+    rank_horizon = rank_horizon or horizons[-1]
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir, tuple(horizons))) as executor:
+        chunksize = max(1, len(combinations) // (workers * 8))
+        for done, row in enumerate(executor.map(evaluate_combination, combinations, chunksize=chunksize), start=1):
+            rows.append(row)
+            if progress and (done % max(1, len(combinations) // 100) == 0 or done == len(combinations)):
+                progress(done, len(combinations))
+
+    results = pd.DataFrame(rows)
+    score_column = f'{rank_by}_{rank_horizon}d'
+    enough = results[f'signals_{rank_horizon}d'] >= min_signals
+    results['score'] = results[score_column].where(enough)
+    results = results.sort_values('score', ascending=False, na_position='last', kind='stable').reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+if __name__ == '__main__':
+    config = get_config_service()
+
+    parser = argparse.ArgumentParser(description="config.ini 전략 설정 조합을 백테스트로 일괄 평가합니다.")
+    parser.add_argument('index_name', nargs='?', default=config.get('Screener', 'index_name'), choices=['SP500', 'NASDAQ100'])
+    parser.add_argument('--grid', action='append', default=None,
+                        help="검색 공간 (반복 지정). 예: rsi_threshold=30:70:5, Analyzer.bollinger_band_mode, peg_threshold=0.5,1.0")
+    parser.add_argument('--random', type=int, default=None, help="그리드 전체 대신 무작위로 평가할 조합 수")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--period', default=config.get('Backtest', 'period', fallback='10y'))
+    parser.add_argument('--horizons', default=config.get('Backtest', 'horizons', fallback='5, 10, 20'))
+    parser.add_argument('--rank-by', default='avg_return', choices=['avg_return', 'excess_return', 'hit_rate', 'avg_max_drawdown'])
+    parser.add_argument('--min-signals', type=int, default=30, help="순위에 포함할 최소 신호 수")
+    parser.add_argument('--workers', type=int, default=None, help="작업 프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument('--output', default=os.path.join(PROJECT_ROOT, 'sweep_results.csv'))
+    args = parser.parse_args()
+
+    sweep_horizons = tuple(int(h) for h in args.horizons.split(',') if h.strip())
+    sweep_space = parse_search_space(args.grid or DEFAULT_GRID)
+    sweep_combinations = build_combinations(sweep_space, current_settings(config), samples=args.random, seed=args.seed)
+    print(f"--- {args.index_name} 파라미터 검색: {len(sweep_combinations)}개 조합 ({', '.join(sweep_space)}) ---")
+
+    started = time.perf_counter()
+    panel_cache_dir = prepare_panel_cache(
+        args.index_name, period=args.period, horizons=sweep_horizons,
+        progress=lambda done, total, ticker: print(f"  - 진행: [{done}/{total}] {ticker} 데이터 로딩 중...", end='\r'))
+    prepared = time.perf_counter()
+    print(f"\n  - 가격 패널 준비 완료 ({prepared - started:.1f}초): {panel_cache_dir}")
+
+    sweep_results = run_sweep(
+        sweep_combinations, panel_cache_dir, horizons=sweep_horizons, workers=args.workers,
+        rank_by=args.rank_by, min_signals=args.min_signals,
+        progress=lambda done, total: print(f"  - 진행: [{done}/{total}] 조합 평가 중...", end='\r'))
+    print(f"\n  - 평가 완료 ({time.perf_counter() - prepared:.1f}초)")
+
+    sweep_results.to_csv(args.output, index=False)
+    print(f"\n--- 상위 10개 조합 (기준: {args.rank_by}_{sweep_horizons[-1]}d) ---")
+    print(sweep_results.head(10).to_string(index=False))
+    print(f"\n  - 전체 결과 저장: {args.output}")
@@ -0,0 +1,361 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from config_service import get_config_service
+from market_data import get_provider, last_session_date, period_to_bars, read_table, write_table
+from fetch_engine import chunked, fetch_all, get_fetch_options
+from workflow_metrics import get_metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+class PriceStore:
+    """
+    티커별 일봉 OHLCV를 디스크(Parquet, 엔진이 없으면 CSV)에 저장하고 증분 갱신하는 가격 저장소입니다.
+
+    - 저장된 데이터가 없거나 요청 기간보다 짧으면 전체 기간을 한 번 다운로드합니다.
+    - 이후에는 마지막 저장일 직전 몇 개 봉(overlap_bars)부터의 꼬리 구간만 가져와 이어 붙입니다.
+    - 겹치는 봉의 종가가 달라졌다면(분할/배당으로 수정주가가 재계산된 경우) 해당 티커만 전체를 다시 받습니다.
+    - 마지막 정규장 마감 이후 이미 확인한 티커는 네트워크 요청 없이 로컬 데이터만 읽습니다.
+    """
+
+    def __init__(self, store_dir, provider=None, overlap_bars=5, rtol=1e-4):
+        self.store_dir = store_dir
+        self._provider = provider
+        self.overlap_bars = overlap_bars
+        self.rtol = rtol
+
+    @property
+    def provider(self):
+        return self._provider or get_provider()
+
+    def _path(self, ticker):
+        return os.path.join(self.store_dir, ticker)
+
+    def _load_meta(self, ticker):
+        path = self._path(ticker) + '.meta.json'
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, ticker, meta):
+        path = self._path(ticker) + '.meta.json'
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    def load(self, ticker):
+        """저장된 전체 히스토리를 반환합니다. 없으면 None을 반환합니다."""
+        df = read_table(self._path(ticker))
+        if df is None or df.empty:
+            return None
+        df.index.name = 'Date'
+        return df
+
+    def _save(self, ticker, df, meta, session, requested_bars):
+        write_table(df, self._path(ticker))
+        meta.update({'checked_session': session.strftime('%Y-%m-%d'), 'requested_bars': requested_bars})
+        self._save_meta(ticker, meta)
+
+    def _history_changed(self, stored, tail):
+        """겹치는 구간의 종가를 비교하여 수정주가가 재계산되었는지 확인합니다."""
+        common = stored.index.intersection(tail.index)
+        if len(common) == 0:
+            return True
+        return not np.allclose(stored.loc[common, 'Close'].to_numpy(dtype=float),
+                               tail.loc[common, 'Close'].to_numpy(dtype=float),
+                               rtol=self.rtol, equal_nan=True)
+
+    def _plan(self, ticker, requested_bars, session):
+        """
+        티커별로 필요한 작업을 결정합니다.
+        반환값: (작업, 저장된 DataFrame, 메타데이터, 꼬리 구간 시작일) - 작업은 'full', 'hit', 'tail' 중 하나입니다.
+        """
+        meta = self._load_meta(ticker)
+        stored = self.load(ticker)
+        covered = meta.get('requested_bars')
+        if stored is None or covered is None or (covered != 0 and (requested_bars == 0 or covered < requested_bars)):
+            return 'full', stored, meta, None
+        if meta.get('checked_session', '') >= session.strftime('%Y-%m-%d') or stored.index[-1] >= session:
+            return 'hit', stored, meta, None
+        start = stored.index[max(0, len(stored) - self.overlap_bars)]
+        return 'tail', stored, meta, start.strftime('%Y-%m-%d')
+
+    def _apply_full(self, ticker, df, meta, session, requested_bars):
+        if not df.empty:
+            self._save(ticker, df, meta, session, requested_bars)
+        return df
+
+    def _apply_tail(self, ticker, stored, tail, meta, session):
+        """
+        꼬리 구간을 이어 붙입니다. 겹치는 봉이 달라졌다면 저장하지 않고 None을 반환하며,
+        호출자가 해당 티커의 전체 기간을 다시 받아야 합니다.
+        """
+        if tail.empty:
+            # 꼬리 구간은 이미 저장된 overlap_bars개 봉부터 요청하므로, 성공했다면 휴장일이어도 비어 있지 않습니다.
+            # 비어 있으면 다운로드 실패이므로 확인 시점을 기록하지 않고 저장된 데이터만 반환해 다음 호출에서 다시 받습니다.
+            return stored
+        if self._history_changed(stored, tail):
+            return None
+        new_rows = tail[tail.index > stored.index[-1]]
+        df = pd.concat([stored, new_rows]) if not new_rows.empty else stored
+        self._save(ticker, df, meta, session, meta['requested_bars'])
+        return df
+
+    def _refetch_period(self, stored, meta, new_bars=0):
+        covered = meta.get('requested_bars', 0)
+        return "max" if covered == 0 else f"{max(covered, len(stored) + new_bars)}d"
+
+    def refresh(self, ticker, period="250d"):
+        """
+        필요한 경우에만 공급자에서 데이터를 가져와 저장소를 갱신하고 전체 히스토리를 반환합니다.
+        반환값: (DataFrame, 상태 문자열) - 상태는 'hit', 'append', 'refetch', 'full' 중 하나입니다.
+        """
+        requested_bars = period_to_bars(period) or 0  # 'max'는 0으로 기록해 항상 전체 기간으로 간주합니다.
+        session = last_session_date()
+        action, stored, meta, start = self._plan(ticker, requested_bars, session)
+        get_metrics().inc('price_cache_requests_total', result=action)
+
+        if action == 'full':
+            return self._apply_full(ticker, self.provider.download(ticker, period=period), meta, session, requested_bars), 'full'
+        if action == 'hit':
+            return stored, 'hit'
+
+        tail = self.provider.download(ticker, start=start)
+        df = self._apply_tail(ticker, stored, tail, meta, session)
+        if df is not None:
+            return df, 'append'
+
+        df = self.provider.download(ticker, period=self._refetch_period(stored, meta, len(tail)))
+        meta['refetches'] = meta.get('refetches', 0) + 1
+        get_metrics().inc('price_cache_requests_total', result='refetch')
+        return self._apply_full(ticker, df, meta, session, meta['requested_bars']), 'refetch'
+
+    def refresh_many(self, tickers, period="250d", progress=None, **fetch_options):
+        """
+        여러 티커를 한 번에 갱신합니다. 갱신이 필요한 티커만 같은 시작일끼리 묶어 다중 티커 다운로드로 가져오며,
+        묶음들은 fetch_engine의 스레드 풀과 전역 속도 제한 아래에서 동시에 실행됩니다.
+        반환값: ({티커: 전체 히스토리 DataFrame}, {티커: 예외}) - 실패한 티커가 있어도 나머지 결과는 반환합니다.
+        """
+        options = get_fetch_options()
+        options.update(fetch_options)
+        batch_size = options.pop('batch_size')
+        requested_bars = period_to_bars(period) or 0
+        session = last_session_date()
+
+        frames, errors, plans = {}, {}, {}
+        full_tickers, tail_groups = [], {}
+        for ticker in tickers:
+            try:
+                action, stored, meta, start = self._plan(ticker, requested_bars, session)
+            except Exception as e:
+                errors[ticker] = e
+                continue
+            plans[ticker] = (stored, meta)
+            get_metrics().inc('price_cache_requests_total', result=action)
+            if action == 'hit':
+                frames[ticker] = stored
+            elif action == 'full':
+                full_tickers.append(ticker)
+            else:
+                tail_groups.setdefault(start, []).append(ticker)
+
+        # 다운로드 작업: (시작일 또는 None, 기간, 티커 묶음)
+        jobs = [(None, period, chunk) for chunk in chunked(full_tickers, batch_size)]
+        for start, group in tail_groups.items():
+            jobs += [(start, None, chunk) for chunk in chunked(group, batch_size)]
+
+        total = len(tickers)
+        completed = [len(frames)]
+        def report(job):
+            completed[0] += len(job[2])
+            if progress:
+                progress(min(completed[0], total), total, job[2][-1])
+
+        def download_job(job):
+            start, job_period, chunk = job
+            return download_chunk(self.provider, chunk, period=job_period or period, start=start)
+
+        def run_jobs(job_list):
+            results, failures = fetch_all(download_job, job_list, cost=lambda job: len(job[2]),
+                                          progress=lambda done, count, job: report(job), **options)
+            for job, exc in failures.items():
+                for ticker in job[2]:
+                    errors[ticker] = exc
+                    if job[0] is not None:
+                        # 꼬리 구간 갱신에 실패하면 마지막으로 저장된 데이터라도 사용합니다.
+                        frames[ticker] = plans[ticker][0]
+            return results
+
+        refetch = []
+        def apply_downloads(results):
+            """다운로드 결과를 저장소에 반영하고, 결과에서 빠진 티커를 {(시작일, 기간): [티커]}로 반환합니다."""
+            missing = {}
+            for job, downloaded in results.items():
+                start, job_period, chunk = job
+                for ticker in chunk:
+                    if ticker not in downloaded:
+                        missing.setdefault((start, job_period), []).append(ticker)
+                        continue
+                    stored, meta = plans[ticker]
+                    if start is None:
+                        frames[ticker] = self._apply_full(ticker, downloaded[ticker], meta, session, requested_bars)
+                        continue
+                    tail = downloaded[ticker]
+                    df = self._apply_tail(ticker, stored, tail, meta, session)
+                    if df is None:
+                        refetch.append((ticker, len(tail)))
+                    else:
+                        frames[ticker] = df
+            return missing
+
+        # yfinance는 실패한 티커를 예외 대신 빈 열로 돌려주므로, 묶음 결과에서 빠진 티커는 한 번 더 묶어 요청하고
+        # 그래도 없으면 오류로 보고합니다. (꼬리 구간이면 마지막으로 저장된 데이터를 사용하되 확인 시점은 기록하지 않습니다)
+        missing = apply_downloads(run_jobs(jobs))
+        retry_jobs = [(start, job_period, chunk) for (start, job_period), group in missing.items()
+                      for chunk in chunked(group, batch_size)]
+        for (start, _), group in apply_downloads(run_jobs(retry_jobs)).items():
+            for ticker in group:
+                errors[ticker] = LookupError(f"{ticker}의 가격 데이터가 다운로드 결과에 없습니다.")
+                if start is not None:
+                    frames[ticker] = plans[ticker][0]
+
+        # 분할/배당으로 과거 수정주가가 바뀐 티커만 전체 기간을 다시 받습니다.
+        if refetch:
+            refetch_jobs = [(None, self._refetch_period(plans[t][0], plans[t][1], new_bars), (t,)) for t, new_bars in refetch]
+            for job, downloaded in run_jobs(refetch_jobs).items():
+                ticker = job[2][0]
+                stored, meta = plans[ticker]
+                meta['refetches'] = meta.get('refetches', 0) + 1
+                get_metrics().inc('price_cache_requests_total', result='refetch')
+                if ticker not in downloaded:
+                    errors[ticker] = LookupError(f"{ticker}의 가격 데이터가 다운로드 결과에 없습니다.")
+                    continue
+                frames[ticker] = self._apply_full(ticker, downloaded[ticker], meta, session, meta['requested_bars'])
+
+        return {ticker: frames[ticker] for ticker in tickers if ticker in frames}, errors
+
+    def get_prices(self, ticker, period="250d"):
+        """증분 갱신된 히스토리 중 마지막 period 만큼의 구간을 반환합니다."""
+        df, _ = self.refresh(ticker, period)
+        return _tail_bars(df, period)
+
+    def get_prices_many(self, tickers, period="250d", progress=None, **fetch_options):
+        """refresh_many 결과를 티커별 마지막 period 구간으로 잘라 반환합니다."""
+        frames, errors = self.refresh_many(tickers, period, progress=progress, **fetch_options)
+        return {ticker: _tail_bars(df, period) for ticker, df in frames.items()}, errors
+
+
+def download_chunk(provider, chunk, period="250d", start=None):
+    """
+    티커 묶음을 다중 티커 다운로드로 가져와 데이터가 있는 티커만 {티커: DataFrame}으로 반환합니다.
+    묶음 전체가 비어 있으면 네트워크 오류로 보고 LookupError를 발생시켜 fetch_all이 재시도하게 합니다.
+    """
+    frames = {ticker: df for ticker, df in provider.download_many(chunk, period=period, start=start).items()
+              if df is not None and not df.empty}
+    if chunk and not frames:
+        raise LookupError(f"티커 {len(chunk)}개({chunk[0]} 등)의 가격 데이터를 받지 못했습니다.")
+    return frames
+
+
+def _tail_bars(df, period):
+    bars = period_to_bars(period)
+    return df if bars is None or df.empty else df.iloc[-bars:]
+
+
+# --- 기본 저장소 ---
+_stores = {}
+
+def get_price_store():
+    """config.ini의 [Data] 설정에 따라 현재 공급자용 기본 가격 저장소를 반환합니다. 캐시가 꺼져 있으면 None을 반환합니다."""
+    config = get_config_service()
+    if not config.getboolean('Data', 'use_price_cache', fallback=True):
+        return None
+
+    provider = get_provider()
+    # 공급자마다 데이터가 다르므로 저장 디렉토리를 공급자 이름으로 분리합니다.
+    store_dir = os.path.join(PROJECT_ROOT, config.get('Data', 'price_cache_dir', fallback='data/prices'), provider.name)
+    if store_dir not in _stores:
+        _stores[store_dir] = PriceStore(store_dir)
+    return _stores[store_dir]
+
+def get_prices(ticker, period="250d"):
+    """가격 저장소를 거쳐 일봉 OHLCV를 가져옵니다. 캐시가 꺼져 있으면 공급자에서 바로 다운로드합니다."""
+    store = get_price_store()
+    if store is None:
+        return get_provider().download(ticker, period=period)
+    return store.get_prices(ticker, period)
+
+def get_prices_many(tickers, period="250d", progress=None, **fetch_options):
+    """
+    여러 티커의 일봉 OHLCV를 동시에 가져옵니다.
+    반환값: ({티커: DataFrame}, {티커: 예외}) - 데이터를 받지 못한 티커는 예외 쪽에 포함됩니다.
+    """
+    store = get_price_store()
+    if store is not None:
+        return store.get_prices_many(tickers, period, progress=progress, **fetch_options)
+
+    options = get_fetch_options()
+    options.update(fetch_options)
+    chunks = chunked(list(tickers), options.pop('batch_size'))
+    provider = get_provider()
+    results, failures = fetch_all(lambda chunk: download_chunk(provider, chunk, period=period), chunks,
+                                  cost=len, progress=progress and (lambda done, count, chunk: progress(done, count, chunk[-1])),
+                                  **options)
+    frames = {}
+    for downloaded in results.values():
+        frames.update(downloaded)
+    errors = {ticker: exc for chunk, exc in failures.items() for ticker in chunk}
+    for chunk in results:
+        for ticker in chunk:
+            if ticker not in frames:
+                errors[ticker] = LookupError(f"{ticker}의 가격 데이터가 다운로드 결과에 없습니다.")
+    return {ticker: frames[ticker] for ticker in tickers if ticker in frames}, errors
+
+
+def frame_nbytes(frames):
+    """{티커: DataFrame}이 차지하는 대략적인 메모리(바이트)를 반환합니다."""
+    return int(sum(df.memory_usage(index=True).sum() for df in frames.values() if df is not None))
+
+def load_universe(tickers, period, snapshot, memory_budget_mb=0, min_chunk=50, progress=None):
+    """
+    유니버스 전체 가격을 묶음 단위로 가져와 최신 지표 표를 만듭니다. 티커별 DataFrame은 묶음을 처리한 뒤 버립니다.
+
+    - snapshot({티커: DataFrame})은 (최신 지표 표, {처리 방식: 티커 수})를 반환해야 하며, 묶음별 표를 이어 붙이므로
+      결과는 한 번에 계산할 때와 같습니다.
+    - memory_budget_mb가 0보다 크면 한 묶음의 DataFrame이 예산 안에 들어가도록 묶음 크기를 정합니다.
+      (최소 min_chunk개씩, 0이면 전체를 한 번에 가져옵니다)
+    반환값: (최신 지표 표, {티커: 예외}, {처리 방식: 티커 수})
+    """
+    tickers = list(dict.fromkeys(tickers))
+    budget = memory_budget_mb * 1024 * 1024
+    tables, errors, counts = [], {}, {}
+    chunk_size = max(min_chunk, 1) if budget > 0 else max(len(tickers), 1)
+    start = 0
+    while start < len(tickers):
+        chunk = tickers[start:start + chunk_size]
+        offset = start
+        report = progress and (lambda done, total, ticker: progress(offset + done, len(tickers), ticker))
+        frames, chunk_errors = get_prices_many(chunk, period=period, progress=report)
+        errors.update(chunk_errors)
+        frames = {ticker: df for ticker, df in frames.items() if df is not None and not df.empty}
+        if frames:
+            table, chunk_counts = snapshot(frames)
+            tables.append(table)
+            for status, count in chunk_counts.items():
+                counts[status] = counts.get(status, 0) + count
+            if budget > 0:
+                per_ticker = frame_nbytes(frames) / len(frames)
+                chunk_size = max(min_chunk, int(budget // max(per_ticker, 1)))
+        start += len(chunk)
+        del frames
+
+    table = pd.concat(tables) if tables else snapshot({})[0]
+    return table, errors, counts
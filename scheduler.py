@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+# 경로 문제 해결 및 config 임포트
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from config_service import get_config_service
+from workflow_snapshots import NEW_YORK, completed_session, get_snapshot_store, next_run_time
+
+WORKFLOW_SCRIPT = os.path.join(PROJECT_ROOT, 'investment_workflow.py')
+
+
+def log(message):
+    print(f"[{datetime.now(NEW_YORK).strftime('%Y-%m-%d %H:%M:%S %Z')}] {message}", flush=True)
+
+
+def load_settings():
+    config = get_config_service()
+    return {
+        'indexes': [name.strip() for name in config.get('Scheduler', 'indexes', fallback='SP500, NASDAQ100').split(',') if name.strip()],
+        'timeout': config.getint('Scheduler', 'workflow_timeout', fallback=1800),
+    }
+
+
+def run_snapshot(index_names, store, session, timeout=1800):
+    """
+    지수 워크플로우를 새 프로세스에서 실행하고, 성공하면 지수별 스냅샷으로 확정합니다.
+    지수가 여럿이면 한 번의 실행으로 겹치는 종목을 공유해 계산하고, 결과를 지수별 스냅샷으로 나눠 담습니다.
+    확정한 {지수: 매니페스트}(실패 시 None)를 반환합니다.
+    """
+    staging_dirs = {index_name: store.begin(index_name) for index_name in index_names}
+    # 지수가 하나면 스냅샷 디렉토리에 바로 쓰고, 여럿이면 워크플로우가 만드는 지수별 하위 디렉토리를 나중에 옮깁니다.
+    output_dir = staging_dirs[index_names[0]] if len(index_names) == 1 else tempfile.mkdtemp(prefix='.run-', dir=store.root)
+    label = ' + '.join(index_names)
+    started = time.time()
+    log(f"{label} 워크플로우 실행 시작 (거래일 {session}, 출력: {output_dir})")
+    log_path = os.path.join(output_dir, 'workflow.log')
+    try:
+        with open(log_path, 'w', encoding='utf-8') as output:
+            subprocess.run([sys.executable, WORKFLOW_SCRIPT, *index_names, '--output-dir', output_dir, '--save-stages'],
+                           cwd=PROJECT_ROOT, stdout=output, stderr=subprocess.STDOUT, check=True, timeout=timeout)
+        if len(index_names) > 1:
+            for index_name, staging_dir in staging_dirs.items():
+                result_dir = os.path.join(output_dir, index_name)
+                for name in os.listdir(result_dir):
+                    os.replace(os.path.join(result_dir, name), os.path.join(staging_dir, name))
+                shutil.copy(log_path, staging_dir)
+    except (subprocess.SubprocessError, OSError) as e:
+        log(f"{label} 워크플로우 실패: {e}")
+        for staging_dir in staging_dirs.values():
+            store.discard(staging_dir)
+        return None
+    finally:
+        if len(index_names) > 1:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    seconds = round(time.time() - started, 1)
+    manifests = {}
+    for index_name, staging_dir in staging_dirs.items():
+        manifests[index_name] = store.commit(index_name, staging_dir, session, seconds=seconds, run_indexes=list(index_names))
+        log(f"{index_name} 스냅샷 저장 완료: {manifests[index_name]['version']} ({seconds}초)")
+    return manifests
+
+
+def run_due(store, settings, force=False):
+    """최신 거래일 스냅샷이 없거나 설정이 바뀐 지수만 한 번의 워크플로우 실행으로 계산합니다. force면 모든 지수를 다시 실행합니다."""
+    session = completed_session(delay_minutes=store.delay_minutes)
+    due = []
+    for index_name in settings['indexes']:
+        if not force and store.current(index_name) is not None:
+            log(f"{index_name}: 거래일 {session} 스냅샷이 이미 있어 건너뜁니다.")
+            continue
+        due.append(index_name)
+    if due:
+        run_snapshot(due, store, session, settings['timeout'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="미국 장 마감 후 지수별 워크플로우를 미리 실행하여 스냅샷으로 저장합니다. "
+                    "cron에서는 --once로 실행하고, 옵션 없이 실행하면 상주하며 매 거래일 장 마감 후 실행합니다.")
+    parser.add_argument('--once', action='store_true', help="필요한 지수만 한 번 실행하고 종료합니다. (cron용)")
+    parser.add_argument('--force', action='store_true', help="최신 스냅샷이 있어도 다시 실행합니다.")
+    args = parser.parse_args()
+
+    snapshot_store = get_snapshot_store()
+    scheduler_settings = load_settings()
+    run_due(snapshot_store, scheduler_settings, force=args.force)
+    if not args.once:
+        while True:
+            run_at = next_run_time(delay_minutes=snapshot_store.delay_minutes)
+            log(f"다음 실행 예정: {run_at.strftime('%Y-%m-%d %H:%M %Z')}")
+            time.sleep(max(0, (run_at - datetime.now(NEW_YORK)).total_seconds()))
+            scheduler_settings = load_settings()
+            run_due(snapshot_store, scheduler_settings)
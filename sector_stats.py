@@ -0,0 +1,201 @@
+import os
+import json
+import math
+import time
+import bisect
+import threading
+
+from config_service import get_config_service
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DAY = 24 * 60 * 60
+# 절사 평균에서 양쪽 끝에서 각각 잘라낼 비율
+TRIM_PROPORTION = 0.1
+
+
+def _valid_pe(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+class SectorStats:
+    """
+    지수 구성 종목의 산업(섹터)별 Forward P/E를 정렬된 배열로 보관하고 증분 갱신하는 저장소입니다.
+
+    - 티커별 (섹터, P/E, 갱신 시각)을 기록하고, 섹터마다 양수 P/E만 정렬된 리스트로 유지합니다.
+      티커 하나가 갱신되면 이전 값을 이진 탐색으로 찾아 빼고 새 값을 끼워 넣으므로 전체를 다시 모으지 않습니다.
+    - 평균, 중앙값, 절사 평균과 이진 탐색 기반 백분위 순위를 제공합니다.
+    - info 캐시가 티커 정보를 새로 가져올 때마다 통지를 받아 해당 티커를 갱신합니다. (get_sector_stats)
+    - JSON 파일에 저장해 두었다가 다음 실행에서는 새로 편입되었거나 max_age보다 오래된 티커만 다시 조회합니다.
+    """
+
+    def __init__(self, path=None, max_age=7 * DAY):
+        self.path = path
+        self.max_age = max_age
+        self._entries = {}   # 티커 -> [섹터, P/E, 갱신 시각]
+        self._sorted = {}    # 섹터 -> 정렬된 P/E 리스트
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, ticker):
+        return ticker in self._entries
+
+    # --- 저장/로드 ---
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for ticker, (sector, forward_pe, updated) in saved.items():
+            self._entries[ticker] = [sector, forward_pe, updated]
+            if sector and forward_pe is not None:
+                self._sorted.setdefault(sector, []).append(forward_pe)
+        for values in self._sorted.values():
+            values.sort()
+
+    def save(self):
+        """변경된 내용이 있으면 디스크에 저장합니다."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    # --- 갱신 ---
+    def _discard(self, ticker):
+        entry = self._entries.pop(ticker, None)
+        if entry is None or not entry[0] or entry[1] is None:
+            return
+        values = self._sorted[entry[0]]
+        del values[bisect.bisect_left(values, entry[1])]
+        if not values:
+            del self._sorted[entry[0]]
+
+    def update(self, ticker, sector, forward_pe, now=None):
+        """티커의 섹터/P/E를 갱신합니다. P/E가 없거나 0 이하면 통계에서 제외하되 조회한 시각은 기록합니다."""
+        forward_pe = _valid_pe(forward_pe)
+        with self._lock:
+            self._discard(ticker)
+            self._entries[ticker] = [sector, forward_pe, now or time.time()]
+            if sector and forward_pe is not None:
+                bisect.insort(self._sorted.setdefault(sector, []), forward_pe)
+            self._dirty = True
+
+    def update_from_info(self, ticker, info):
+        """
+        info 딕셔너리의 sector/forwardPE로 갱신합니다. 빈 info는 조회 실패이므로 기존 값과 갱신 시각을 그대로 두어
+        다음 실행에서 다시 조회하게 합니다.
+        """
+        if not info:
+            return
+        self.update(ticker, info.get('sector'), info.get('forwardPE'))
+
+    def remove(self, ticker):
+        with self._lock:
+            if ticker in self._entries:
+                self._discard(ticker)
+                self._dirty = True
+
+    def sync_universe(self, tickers, now=None):
+        """
+        구성 종목 목록에 맞춰 빠진 티커를 제거하고, 새로 조회해야 하는 티커(처음 보거나 max_age보다 오래된 티커)를 반환합니다.
+        """
+        now = now or time.time()
+        members = set(tickers)
+        with self._lock:
+            for ticker in [ticker for ticker in self._entries if ticker not in members]:
+                self._discard(ticker)
+                self._dirty = True
+            return [ticker for ticker in tickers
+                    if ticker not in self._entries or now - self._entries[ticker][2] > self.max_age]
+
+    # --- 조회 ---
+    def values(self, sector):
+        """섹터의 정렬된 P/E 리스트(복사본)를 반환합니다."""
+        with self._lock:
+            return list(self._sorted.get(sector, ()))
+
+    def sectors(self):
+        with self._lock:
+            return sorted(self._sorted)
+
+    def mean(self, sector):
+        values = self.values(sector)
+        return math.fsum(values) / len(values) if values else None
+
+    def median(self, sector):
+        values = self.values(sector)
+        if not values:
+            return None
+        middle = len(values) // 2
+        return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+    def trimmed_mean(self, sector, proportion=TRIM_PROPORTION):
+        """양쪽 끝에서 각각 proportion만큼 잘라낸 평균입니다. (scipy.stats.trim_mean과 같은 방식)"""
+        values = self.values(sector)
+        cut = int(len(values) * proportion)
+        values = values[cut:len(values) - cut]
+        return math.fsum(values) / len(values) if values else None
+
+    def percentile_rank(self, sector, forward_pe):
+        """섹터 안에서 forward_pe보다 P/E가 낮은 종목의 비율(%)입니다. 같은 값은 절반씩 셉니다. O(log n)"""
+        forward_pe = _valid_pe(forward_pe)
+        with self._lock:
+            values = self._sorted.get(sector)
+            if not values or forward_pe is None:
+                return None
+            below = bisect.bisect_left(values, forward_pe)
+            equal = bisect.bisect_right(values, forward_pe) - below
+            return (below + equal / 2) / len(values) * 100
+
+    def summary(self, sector):
+        values = self.values(sector)
+        return {'count': len(values), 'mean': self.mean(sector), 'median': self.median(sector),
+                'trimmed_mean': self.trimmed_mean(sector)}
+
+    def means(self):
+        """{섹터: 평균 P/E} 딕셔너리를 반환합니다. (이전 sector_avg_pe와 같은 형식)"""
+        return {sector: self.mean(sector) for sector in self.sectors()}
+
+
+# --- 기본 저장소 ---
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_sector_stats(index_name):
+    """
+    현재 공급자와 지수에 대한 프로세스 전역 섹터 통계 저장소를 반환합니다.
+    처음 만들 때 info 캐시에 등록하므로, 이후 어느 단계에서든 티커 정보를 새로 가져오면 통계가 함께 갱신됩니다.
+    """
+    from market_data import get_provider
+    from info_cache import get_info_cache
+
+    provider = get_provider()
+    key = (provider.name, index_name)
+    with _stores_lock:
+        if key not in _stores:
+            config = get_config_service()
+            stats_dir = config.get('Fundamental', 'sector_stats_dir', fallback='data/sector_stats')
+            store = SectorStats(
+                path=os.path.join(PROJECT_ROOT, stats_dir, provider.name, f'{index_name}.json'),
+                max_age=config.getfloat('Fundamental', 'sector_stats_max_age_days', fallback=7) * DAY,
+            )
+            get_info_cache().listeners.append(
+                lambda ticker, info: store.update_from_info(ticker, info) if ticker in store else None)
+            _stores[key] = store
+        return _stores[key]
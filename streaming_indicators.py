@@ -0,0 +1,358 @@
+import os
+import pickle
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from indicator_engine import compute_snapshot
+
+# 1단계가 지표를 계산하는 구간 길이 (investment_workflow의 period="250d")
+DEFAULT_WINDOW = 250
+
+# indicator_engine.indicator_snapshot과 같은 컬럼 순서
+SNAPSHOT_COLUMNS = ['bars', 'Close', 'Volume', 'SMA_20', 'SMA_50', 'SMA_200', 'RSI_14', 'VOLUME_SMA_20', 'prev_Close', 'prev_BBL_20_2.0']
+
+
+class RollingWindow:
+    """
+    길이 size인 이동 구간의 평균과 분산(ddof=0)을 봉 하나당 O(1)로 갱신합니다.
+    평균/분산은 Welford 방식의 값 교체 공식으로 갱신하며, 반올림 오차가 쌓이지 않도록
+    size번 갱신할 때마다 구간 전체로 다시 계산합니다. (분할 상환 O(1))
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._updates = 0
+
+    def _replace(self, old, new):
+        n = len(self.values)
+        new_mean = self.mean + (new - old) / n
+        self.m2 += (new - old) * (new - new_mean + old - self.mean)
+        self.mean = new_mean
+
+    def _resync(self):
+        self._updates = 0
+        n = len(self.values)
+        self.mean = math.fsum(self.values) / n if n else 0.0
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+
+    def push(self, value):
+        if len(self.values) < self.size:
+            self.values.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(self.values)
+            self.m2 += delta * (value - self.mean)
+        else:
+            old = self.values.popleft()
+            self.values.append(value)
+            self._replace(old, value)
+        self._updates += 1
+        if self._updates >= self.size:
+            self._resync()
+
+    def replace_last(self, value):
+        """마지막 값을 바꿉니다. (장중에 진행 중인 봉을 다시 받은 경우)"""
+        old = self.values[-1]
+        self.values[-1] = value
+        self._replace(old, value)
+
+    def average(self):
+        return self.mean if len(self.values) == self.size else np.nan
+
+    def std(self):
+        return math.sqrt(max(self.m2 / self.size, 0.0)) if len(self.values) == self.size else np.nan
+
+    def to_dict(self):
+        return {'size': self.size, 'values': list(self.values), 'mean': self.mean, 'm2': self.m2, 'updates': self._updates}
+
+    @classmethod
+    def from_dict(cls, data):
+        window = cls(data['size'])
+        window.values = deque(data['values'])
+        window.mean, window.m2, window._updates = data['mean'], data['m2'], data['updates']
+        return window
+
+
+class WilderRSIState:
+    """
+    Wilder RSI (pandas ewm(alpha=1/length, adjust=True))를 봉 하나당 O(1)로 갱신합니다.
+    상승/하락폭의 가중합과 가중치 합을 유지하고, 구간(window) 밖으로 밀려난 가장 오래된 변화량의
+    가중치를 빼서 '마지막 window개 봉으로 처음부터 계산한 값'과 같은 결과를 냅니다.
+    """
+
+    def __init__(self, length=14, window=DEFAULT_WINDOW):
+        self.length = length
+        self.window = window
+        self.decay = 1.0 - 1.0 / length
+        self.diffs = deque()
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+
+    def push(self, diff):
+        self.gain_sum = self.decay * self.gain_sum + max(diff, 0.0)
+        self.loss_sum = self.decay * self.loss_sum + min(diff, 0.0)
+        self.diffs.append(diff)
+        # 종가 window개 구간의 변화량은 window - 1개입니다.
+        if self.window and len(self.diffs) > self.window - 1:
+            oldest = self.diffs.popleft()
+            weight = self.decay ** len(self.diffs)
+            self.gain_sum -= weight * max(oldest, 0.0)
+            self.loss_sum -= weight * min(oldest, 0.0)
+
+    def replace_last(self, diff):
+        old = self.diffs[-1]
+        self.diffs[-1] = diff
+        self.gain_sum += max(diff, 0.0) - max(old, 0.0)
+        self.loss_sum += min(diff, 0.0) - min(old, 0.0)
+
+    def value(self):
+        if len(self.diffs) < self.length:
+            return np.nan
+        # 가중 평균의 분모(가중치 합)는 상승/하락에 공통이므로 약분됩니다.
+        total = self.gain_sum + abs(self.loss_sum)
+        return 100.0 * self.gain_sum / total if total > 0 else np.nan
+
+    def to_dict(self):
+        return {'length': self.length, 'window': self.window, 'diffs': list(self.diffs),
+                'gain_sum': self.gain_sum, 'loss_sum': self.loss_sum}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['length'], data['window'])
+        state.diffs = deque(data['diffs'])
+        state.gain_sum, state.loss_sum = data['gain_sum'], data['loss_sum']
+        return state
+
+
+class IndicatorState:
+    """
+    티커 하나의 1단계 지표(SMA 20/50/200, RSI 14, 볼린저 하단, 거래량 SMA 20)를 새 봉마다 O(1)로 갱신하는 상태입니다.
+    snapshot()은 indicator_engine.indicator_snapshot과 같은 형식의 최신 값 한 행을 반환합니다.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.closes = deque(maxlen=window)
+        self.dates = deque(maxlen=2)
+        self.last_volume = np.nan
+        self.sma = {length: RollingWindow(length) for length in (20, 50, 200)}
+        self.volume_sma = RollingWindow(20)
+        self.rsi = WilderRSIState(14, window)
+        self.prev_bbl = np.nan
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if self.dates else None
+
+    def _bbl(self):
+        return self.sma[20].average() - 2.0 * self.sma[20].std()
+
+    def update(self, date, close, volume):
+        """
+        새 봉 하나를 반영합니다. 날짜가 마지막 봉과 같으면 그 봉을 새 값으로 교체합니다. (장중 갱신)
+        값이 NaN이면 증분 계산을 할 수 없으므로 ValueError를 발생시킵니다.
+        """
+        close, volume = float(close), float(volume)
+        if not (math.isfinite(close) and math.isfinite(volume)):
+            raise ValueError(f"{date}: 종가 또는 거래량이 비어 있습니다.")
+        date = pd.Timestamp(date)
+        if self.dates and date == self.dates[-1]:
+            previous = self.closes[-2] if len(self.closes) >= 2 else None
+            self.closes[-1] = close
+            self.last_volume = volume
+            for window in self.sma.values():
+                window.replace_last(close)
+            self.volume_sma.replace_last(volume)
+            if previous is not None:
+                self.rsi.replace_last(close - previous)
+            return
+        if self.dates and date < self.dates[-1]:
+            raise ValueError(f"{date}: 마지막 봉({self.dates[-1]})보다 이전 날짜입니다.")
+
+        self.prev_bbl = self._bbl() if self.closes else np.nan
+        if self.closes:
+            self.rsi.push(close - self.closes[-1])
+        self.closes.append(close)
+        self.dates.append(date)
+        self.last_volume = volume
+        for window in self.sma.values():
+            window.push(close)
+        self.volume_sma.push(volume)
+
+    def snapshot(self):
+        n_bars = len(self.closes)
+        return {
+            'bars': float(n_bars),
+            'Close': self.closes[-1] if n_bars else np.nan,
+            'Volume': self.last_volume,
+            'SMA_20': self.sma[20].average(),
+            'SMA_50': self.sma[50].average(),
+            'SMA_200': self.sma[200].average(),
+            'RSI_14': self.rsi.value(),
+            'VOLUME_SMA_20': self.volume_sma.average(),
+            'prev_Close': self.closes[-2] if n_bars >= 2 else np.nan,
+            'prev_BBL_20_2.0': self.prev_bbl if n_bars >= 2 else np.nan,
+        }
+
+    @classmethod
+    def from_history(cls, df, window=DEFAULT_WINDOW):
+        """OHLCV DataFrame의 마지막 window개 봉을 차례로 반영한 상태를 만듭니다."""
+        state = cls(window)
+        tail = df.iloc[-window:] if window else df
+        for date, close, volume in zip(tail.index, tail['Close'].to_numpy(dtype=float), tail['Volume'].to_numpy(dtype=float)):
+            state.update(date, close, volume)
+        return state
+
+    def to_dict(self):
+        return {
+            'window': self.window,
+            'closes': list(self.closes),
+            'dates': [d.strftime('%Y-%m-%d') for d in self.dates],
+            'last_volume': self.last_volume,
+            'sma': {str(length): window.to_dict() for length, window in self.sma.items()},
+            'volume_sma': self.volume_sma.to_dict(),
+            'rsi': self.rsi.to_dict(),
+            'prev_bbl': None if np.isnan(self.prev_bbl) else self.prev_bbl,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['window'])
+        state.closes = deque(data['closes'], maxlen=data['window'])
+        state.dates = deque((pd.Timestamp(d) for d in data['dates']), maxlen=2)
+        state.last_volume = data['last_volume']
+        state.sma = {int(length): RollingWindow.from_dict(window) for length, window in data['sma'].items()}
+        state.volume_sma = RollingWindow.from_dict(data['volume_sma'])
+        state.rsi = WilderRSIState.from_dict(data['rsi'])
+        state.prev_bbl = np.nan if data['prev_bbl'] is None else data['prev_bbl']
+        return state
+
+
+class IndicatorStateStore:
+    """
+    티커별 IndicatorState를 가격 저장소 디렉토리(indicator_state.pkl)에 저장하고,
+    가격 데이터에 새로 생긴 봉만 반영하여 최신 지표를 돌려줍니다.
+    모든 티커의 상태를 파일 하나로 묶어 실행당 한 번 읽고 한 번 씁니다.
+    """
+
+    FILENAME = 'indicator_state.pkl'
+
+    def __init__(self, store_dir, window=DEFAULT_WINDOW):
+        self.store_dir = store_dir
+        self.window = window
+        self._states = None
+        self._dirty = False
+
+    @property
+    def path(self):
+        return os.path.join(self.store_dir, self.FILENAME)
+
+    def _ensure_loaded(self):
+        if self._states is not None:
+            return
+        self._states = {}
+        try:
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('window') == self.window:
+                self._states = saved['states']
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+            pass
+
+    def load(self, ticker):
+        self._ensure_loaded()
+        data = self._states.get(ticker)
+        return IndicatorState.from_dict(data) if data is not None else None
+
+    def put(self, ticker, state):
+        self._ensure_loaded()
+        self._states[ticker] = state.to_dict()
+        self._dirty = True
+
+    def save(self):
+        """변경된 상태가 있으면 디스크에 저장합니다."""
+        if not self._dirty:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self.path + '.tmp', 'wb') as f:
+            pickle.dump({'window': self.window, 'states': self._states}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + '.tmp', self.path)
+        self._dirty = False
+
+    def sync(self, ticker, df):
+        """
+        가격 데이터(df)에 맞춰 상태를 갱신하고 (상태, 처리 방식)을 반환합니다.
+        처리 방식은 'hit'(변화 없음), 'append'(새 봉만 반영), 'revise'(마지막 봉 교체), 'rebuild'(처음부터 다시 계산)입니다.
+        저장된 마지막 두 봉의 종가가 df와 다르면(수정주가 재계산) 처음부터 다시 계산합니다.
+        """
+        state = self.load(ticker)
+        index = df.index
+        closes = df['Close'].to_numpy(dtype=float)
+        volumes = df['Volume'].to_numpy(dtype=float)
+
+        def position(date):
+            pos = index.searchsorted(date)
+            return pos if pos < len(index) and index[pos] == date else None
+
+        def same_close(pos, close):
+            return pos is not None and math.isclose(closes[pos], close, rel_tol=1e-12)
+
+        status, start = 'rebuild', None
+        if state is not None and state.dates:
+            last = position(state.dates[-1])
+            prev = position(state.dates[0]) if len(state.dates) == 2 else None
+            prev_ok = len(state.dates) < 2 or same_close(prev, state.closes[-2])
+            if prev_ok and same_close(last, state.closes[-1]):
+                status, start = ('append' if last + 1 < len(index) else 'hit'), last + 1
+            elif prev_ok and last is not None and len(state.dates) == 2:
+                status, start = 'revise', last
+            if start is not None and len(index) - start > self.window:
+                status = 'rebuild'
+
+        if status in ('append', 'revise'):
+            try:
+                for pos in range(start, len(index)):
+                    state.update(index[pos], closes[pos], volumes[pos])
+            except ValueError:
+                status = 'rebuild'
+        if status == 'rebuild':
+            state = IndicatorState.from_history(df, self.window)
+        if status != 'hit':
+            self.put(ticker, state)
+        return state, status
+
+
+def streaming_snapshot(ticker_dataframes, store_dir, window=DEFAULT_WINDOW, store=None):
+    """
+    티커별 저장된 지표 상태를 새 봉만큼만 갱신하여 indicator_snapshot과 같은 형식의 최신 지표 표를 만듭니다.
+    증분 갱신할 수 없는 티커(값이 비어 있는 봉 등)는 compute_snapshot으로 처음부터 계산합니다.
+    여러 묶음에 나눠 호출할 때는 같은 store를 넘기고 마지막에 store.save()를 직접 호출합니다.
+    반환값: (지표 표, {처리 방식: 티커 수})
+    """
+    owns_store = store is None
+    if owns_store:
+        store = IndicatorStateStore(store_dir, window)
+    rows, fallback, counts = {}, {}, {}
+    for ticker, df in ticker_dataframes.items():
+        if df is None or df.empty:
+            continue
+        try:
+            state, status = store.sync(ticker, df)
+            rows[ticker] = state.snapshot()
+        except ValueError:
+            fallback[ticker] = df.iloc[-window:]
+            status = 'fallback'
+        counts[status] = counts.get(status, 0) + 1
+    if owns_store:
+        store.save()
+
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=SNAPSHOT_COLUMNS)
+    if fallback:
+        table = pd.concat([table, compute_snapshot(fallback)])
+    order = [ticker for ticker in ticker_dataframes if ticker in table.index]
+    return table.loc[order], counts
@@ -1,6 +1,5 @@
-import yfinance as yf
-import pandas_ta as ta
 import pandas as pd
+import numpy as np
 import time
 
 def find_buy_signals(ticker_dataframes: dict, rsi_threshold=30, short_ma=20, mid_ma=50, long_ma=200, use_strict_filter=False, rsi_period=14, use_bollinger_band=False, bollinger_band_mode='relaxed', bollinger_band_relaxed_pct=1.0, use_volume_filter=True):
@@ -76,6 +75,166 @@ def find_buy_signals(ticker_dataframes: dict, rsi_threshold=30, short_ma=20, mid
 
     return buy_signals
 
+def build_signal_table(ticker_dataframes: dict, short_ma=20, mid_ma=50, long_ma=200, rsi_period=14):
+    """
+    find_buy_signals가 사용하는 마지막 두 봉의 값만 뽑아 티커별 한 행짜리 표로 만듭니다.
+    이전 봉 값은 'prev_' 접두사 컬럼으로 저장하며, 없는 지표 컬럼은 NaN으로 채웁니다.
+    """
+    last_columns = ['Close', 'Volume', f'SMA_{short_ma}', f'SMA_{mid_ma}', f'SMA_{long_ma}', f'RSI_{rsi_period}', 'VOLUME_SMA_20']
+    prev_columns = ['Close', 'BBL_20_2.0']
+    rows = {}
+    for ticker, df in ticker_dataframes.items():
+        row = {'bars': len(df)}
+        if len(df) >= 2:
+            last_row = df.iloc[-1]
+            prev_row = df.iloc[-2]
+            row.update({col: last_row.get(col, np.nan) for col in last_columns})
+            row.update({f'prev_{col}': prev_row.get(col, np.nan) for col in prev_columns})
+        rows[ticker] = row
+    columns = ['bars'] + last_columns + [f'prev_{col}' for col in prev_columns]
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns).astype(float)
+
+def evaluate_buy_rules(values, rsi_threshold=30, short_ma=20, mid_ma=50, long_ma=200, use_strict_filter=False, rsi_period=14, use_bollinger_band=False, bollinger_band_mode='relaxed', bollinger_band_relaxed_pct=1.0, use_volume_filter=True):
+    """
+    find_buy_signals의 매수 규칙을 NumPy 배열에 적용하여 규칙별 불리언 마스크를 반환합니다.
+    values는 컬럼 이름(build_signal_table과 같은 이름)을 같은 모양의 배열로 매핑하며,
+    1차원(종목별 최신 봉)이든 2차원(봉 × 종목 전체 히스토리)이든 그대로 동작합니다.
+    비활성화된 규칙의 마스크는 모두 True입니다.
+    """
+    close = values['Close']
+    sma_short = values[f'SMA_{short_ma}']
+    sma_mid = values[f'SMA_{mid_ma}']
+    sma_long = values[f'SMA_{long_ma}']
+
+    with np.errstate(invalid='ignore'):
+        has_history = values['bars'] >= max(long_ma, 2)
+
+        # NaN과의 비교는 False이므로 지표가 없는 종목은 자연스럽게 제외됩니다.
+        if use_strict_filter:
+            is_uptrend = (sma_short > sma_mid) & (sma_mid > sma_long) & (close > sma_mid)
+        else:
+            is_uptrend = (close > sma_long) & (sma_mid > sma_long)
+
+        rsi_below_threshold = values[f'RSI_{rsi_period}'] < rsi_threshold
+
+        touched_bollinger_low = np.ones(np.shape(close), dtype=bool)
+        if use_bollinger_band:
+            prev_close = values['prev_Close']
+            prev_bbl = values['prev_BBL_20_2.0']
+            if bollinger_band_mode == 'strict':
+                touched_bollinger_low = prev_close < prev_bbl
+            elif bollinger_band_mode == 'relaxed':
+                touched_bollinger_low = prev_close <= prev_bbl * (1 + bollinger_band_relaxed_pct / 100)
+            else: # 'normal'
+                touched_bollinger_low = prev_close <= prev_bbl
+
+        volume_spike = np.ones(np.shape(close), dtype=bool)
+        if use_volume_filter:
+            volume_spike = values['Volume'] > values['VOLUME_SMA_20'] * 1.5
+
+    return {
+        'has_history': has_history,
+        'is_uptrend': is_uptrend,
+        'rsi_below_threshold': rsi_below_threshold,
+        'touched_bollinger_low': touched_bollinger_low,
+        'volume_spike': volume_spike,
+        'signal': has_history & is_uptrend & rsi_below_threshold & touched_bollinger_low & volume_spike,
+    }
+
+def find_buy_signals_vectorized(signal_table: pd.DataFrame, rsi_threshold=30, short_ma=20, mid_ma=50, long_ma=200, use_strict_filter=False, rsi_period=14, use_bollinger_band=False, bollinger_band_mode='relaxed', bollinger_band_relaxed_pct=1.0, use_volume_filter=True):
+    """
+    find_buy_signals와 같은 규칙을 전체 종목 표(build_signal_table 결과)에 불리언 마스크로 한 번에 적용합니다.
+
+    Returns:
+        tuple: (매수 신호 티커 리스트, 규칙별 통과 여부 DataFrame).
+               진단 표의 컬럼은 has_history, is_uptrend, rsi_below_threshold, touched_bollinger_low,
+               volume_spike, signal이며, 비활성화된 규칙은 항상 True입니다.
+    """
+    values = {column: signal_table[column].to_numpy(dtype=float) for column in signal_table.columns}
+    masks = evaluate_buy_rules(
+        values, rsi_threshold=rsi_threshold, short_ma=short_ma, mid_ma=mid_ma, long_ma=long_ma,
+        use_strict_filter=use_strict_filter, rsi_period=rsi_period, use_bollinger_band=use_bollinger_band,
+        bollinger_band_mode=bollinger_band_mode, bollinger_band_relaxed_pct=bollinger_band_relaxed_pct,
+        use_volume_filter=use_volume_filter
+    )
+    diagnostics = pd.DataFrame(masks, index=signal_table.index)
+    return signal_table.index[masks['signal']].tolist(), diagnostics
+
+def _ladder_thresholds(initial_rsi_threshold, max_rsi_threshold, rsi_step):
+    thresholds = np.arange(initial_rsi_threshold, max_rsi_threshold + rsi_step, rsi_step)
+    return thresholds[thresholds <= max_rsi_threshold]
+
+def rsi_ladder_levels(signal_table: pd.DataFrame, initial_rsi_threshold=10, max_rsi_threshold=60, rsi_step=5, rsi_period=14, **rule_kwargs):
+    """
+    RSI 임계값 사다리(initial, initial+step, ..., max)에서 각 종목이 처음 분석 대상이 되는 임계값을 계산합니다.
+
+    기존 3단계 루프는 임계값을 올릴 때마다 [이전 임계값, 현재 임계값) 구간의 종목만 다시 분석했습니다.
+    RSI 이외의 규칙은 임계값과 무관하므로 한 번만 평가하고, RSI로 정렬한 뒤 이진 탐색으로 구간을 찾습니다.
+
+    Returns:
+        DataFrame: 종목별 rsi, level_threshold(분석 대상이 되는 임계값, 범위 밖이면 NaN),
+                   passes_rules(RSI 외 규칙 통과 여부), signal_threshold(신호가 처음 나오는 임계값, 없으면 NaN).
+                   RSI 오름차순으로 정렬되어 있습니다.
+    """
+    thresholds = _ladder_thresholds(initial_rsi_threshold, max_rsi_threshold, rsi_step)
+    rsi = signal_table[f'RSI_{rsi_period}'].to_numpy(dtype=float)
+
+    _, diagnostics = find_buy_signals_vectorized(signal_table, rsi_threshold=np.inf, rsi_period=rsi_period, **rule_kwargs)
+    passes_rules = diagnostics['signal'].to_numpy()
+
+    order = np.argsort(rsi, kind='stable')  # NaN은 맨 뒤로 정렬됩니다.
+    sorted_rsi = rsi[order]
+    levels = np.searchsorted(thresholds, sorted_rsi, side='right')
+    in_range = (sorted_rsi >= 0) & (levels < len(thresholds))  # 첫 구간의 하한은 0입니다.
+    if len(thresholds) == 0:
+        level_threshold = np.full(len(sorted_rsi), np.nan)  # 사다리가 비면 어떤 종목도 분석 대상이 아닙니다.
+    else:
+        level_threshold = np.where(in_range, thresholds[np.minimum(levels, len(thresholds) - 1)].astype(float), np.nan)
+
+    ladder = pd.DataFrame({
+        'rsi': sorted_rsi,
+        'level_threshold': level_threshold,
+        'passes_rules': passes_rules[order],
+    }, index=signal_table.index[order])
+    ladder['signal_threshold'] = ladder['level_threshold'].where(ladder['passes_rules'])
+    return ladder
+
+def resolve_rsi_ladder(signal_table: pd.DataFrame, initial_rsi_threshold=10, max_rsi_threshold=60, rsi_step=5, min_signals_to_find=5, rsi_period=14, **rule_kwargs):
+    """
+    3단계 RSI 사다리를 정렬 한 번과 누적합(prefix scan)으로 한 번에 해결합니다.
+    누적 신호 수가 min_signals_to_find 이상이 되는 첫 임계값에서 멈추며, 그 임계값 구간의 신호까지 모두 포함합니다.
+
+    Returns:
+        tuple: (매수 신호 티커 리스트, 단계별 기록 리스트).
+               단계별 기록은 {'threshold', 'eligible', 'new_signals', 'cumulative'} 딕셔너리이며 멈춘 단계까지만 포함합니다.
+    """
+    thresholds = _ladder_thresholds(initial_rsi_threshold, max_rsi_threshold, rsi_step)
+    if len(thresholds) == 0:
+        return [], []
+    ladder = rsi_ladder_levels(signal_table, initial_rsi_threshold, max_rsi_threshold, rsi_step, rsi_period, **rule_kwargs)
+
+    level_index = np.searchsorted(thresholds, ladder['level_threshold'].to_numpy())
+    in_range = ladder['level_threshold'].notna().to_numpy()
+    eligible_counts = np.bincount(level_index[in_range], minlength=len(thresholds))
+    signal_mask = in_range & ladder['passes_rules'].to_numpy()
+    signal_counts = np.bincount(level_index[signal_mask], minlength=len(thresholds))
+    cumulative = np.cumsum(signal_counts)
+
+    reached = np.nonzero(cumulative >= min_signals_to_find)[0]
+    stop = reached[0] if len(reached) else len(thresholds) - 1
+
+    tickers = ladder.index.to_numpy()
+    steps = []
+    for k in range(stop + 1):
+        steps.append({
+            'threshold': thresholds[k].item(),
+            'eligible': int(eligible_counts[k]),
+            'new_signals': tickers[signal_mask & (level_index == k)].tolist(),
+            'cumulative': int(cumulative[k]),
+        })
+    signals = tickers[signal_mask & (level_index <= stop)].tolist()
+    return signals, steps
+
 if __name__ == '__main__':
     ticker_list = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "TSLA", "META"]
     print("매수 신호 분석 시작...")
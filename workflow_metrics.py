@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from config_service import get_config_service
+from market_data import MarketDataProvider
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 지연 시간 히스토그램 버킷 상한(초)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def peak_rss_mb():
+    """현재 프로세스의 최대 상주 메모리(RSS, MB)를 반환합니다. 측정할 수 없는 플랫폼에서는 None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트 단위입니다.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Histogram:
+    """누적 버킷 개수(Prometheus 형식)와 분위수 계산용 원본 값을 함께 보관하는 히스토그램입니다."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.values = []
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        bisect.insort(self.values, value)
+        self.total += value
+
+    def quantile(self, q):
+        if not self.values:
+            return None
+        return self.values[min(len(self.values) - 1, int(q * len(self.values)))]
+
+    def summary(self):
+        return {
+            'count': len(self.values), 'sum': round(self.total, 6),
+            'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+            'max': self.values[-1] if self.values else None,
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _json_labels(key):
+    return ','.join(f'{k}={v}' for k, v in key) or 'all'
+
+
+class WorkflowMetrics:
+    """
+    워크플로우 한 번 실행 동안의 단계별 소요 시간, 티커별 요청 지연 시간, 카운터를 수집합니다.
+
+    - 단계가 시작/종료될 때마다 JSON Lines 파일에 이벤트를 추가하므로, 실행이 타임아웃으로 강제 종료되어도
+      어느 단계에서 멈췄는지와 그때까지 가장 느렸던 티커를 확인할 수 있습니다.
+    - 같은 내용을 Prometheus textfile collector 형식으로도 내보냅니다.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, slowest_size=10):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.slowest_size = slowest_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, **run_info):
+        with self._lock:
+            self.run_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+            self.run_info = run_info
+            self.started = time.time()
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.stages = {}
+            self.current_stage = None
+            self._stage_started = None
+            self._slowest = {}
+
+    # --- 기록 ---
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name, value, ticker=None, **labels):
+        """지연 시간을 기록합니다. ticker를 주면 가장 느린 요청 목록에도 반영합니다."""
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+            if ticker is not None:
+                # 단계별로 가장 느린 요청만 남깁니다.
+                slowest = self._slowest.setdefault(self.current_stage, [])
+                slowest.append({'seconds': round(value, 4), 'ticker': ticker, 'stage': self.current_stage, **labels})
+                slowest.sort(key=lambda r: r['seconds'], reverse=True)
+                del slowest[self.slowest_size:]
+
+    def timed(self, name, ticker=None, **labels):
+        """with 블록의 소요 시간을 observe로 기록하는 컨텍스트 매니저를 반환합니다."""
+        return _Timer(self, name, ticker, labels)
+
+    # --- 단계 ---
+    def begin_stage(self, stage):
+        """새 단계를 시작합니다. 진행 중인 단계가 있으면 먼저 종료합니다."""
+        self.end_stage()
+        with self._lock:
+            self.current_stage = stage
+            self._stage_started = time.perf_counter()
+        self._append_event({'event': 'stage_start', 'stage': stage})
+
+    def end_stage(self):
+        with self._lock:
+            stage, started = self.current_stage, self._stage_started
+            if stage is None:
+                return
+            seconds = time.perf_counter() - started
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.current_stage = None
+            slowest = self._slowest.get(stage, [])[:5]
+        # 단계가 끝날 때마다 최대 메모리를 기록하므로 어느 단계에서 메모리가 늘었는지 확인할 수 있습니다.
+        peak_mb = peak_rss_mb()
+        if peak_mb is not None:
+            self.set_gauge('peak_rss_bytes', int(peak_mb * 1024 * 1024))
+        self._append_event({'event': 'stage_end', 'stage': stage, 'seconds': round(seconds, 4), 'slowest': slowest,
+                            'peak_rss_mb': peak_mb and round(peak_mb, 1)})
+        self.write_prometheus()
+
+    def finish(self, status='ok'):
+        """실행을 마치고 전체 요약을 기록합니다."""
+        self.end_stage()
+        self._append_event({'event': 'run_end', 'status': status, **self.snapshot()})
+        self.write_prometheus(status)
+
+    # --- 내보내기 ---
+    def snapshot(self):
+        with self._lock:
+            return {
+                'seconds': round(time.time() - self.started, 4),
+                'stages': {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                'counters': {name: {_json_labels(key): value for key, value in series.items()}
+                             for name, series in self.counters.items()},
+                'gauges': {name: {_json_labels(key): value for key, value in series.items()}
+                           for name, series in self.gauges.items()},
+                'histograms': {name: {_json_labels(key): histogram.summary() for key, histogram in series.items()}
+                               for name, series in self.histograms.items()},
+                'slowest': sorted((r for records in self._slowest.values() for r in records),
+                                  key=lambda r: r['seconds'], reverse=True)[:self.slowest_size],
+            }
+
+    def _append_event(self, event):
+        if not self.jsonl_path:
+            return
+        line = {'time': datetime.now().isoformat(timespec='seconds'), 'run_id': self.run_id, **self.run_info, **event}
+        try:
+            os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+        except OSError:
+            pass  # 지표 기록 실패로 워크플로우를 중단하지 않습니다.
+
+    def prometheus_text(self, status=None):
+        run_labels = {key: value for key, value in self.run_info.items() if isinstance(value, str)}
+        lines = []
+        with self._lock:
+            lines += ['# HELP workflow_stage_seconds Duration of each workflow stage in the last run.',
+                      '# TYPE workflow_stage_seconds gauge']
+            lines += [f'workflow_stage_seconds{_format_labels(_label_key({"stage": stage}), run_labels)} {seconds:.6f}'
+                      for stage, seconds in self.stages.items()]
+            for name, series in sorted(self.counters.items()):
+                lines += [f'# TYPE workflow_{name} counter']
+                lines += [f'workflow_{name}{_format_labels(key, run_labels)} {value}' for key, value in series.items()]
+            for name, series in sorted(self.gauges.items()):
+                lines += [f'# TYPE workflow_{name} gauge']
+                lines += [f'workflow_{name}{_format_labels(key, run_labels)} {value}' for key, value in series.items()]
+            for name, series in sorted(self.histograms.items()):
+                lines += [f'# TYPE workflow_{name} histogram']
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                        cumulative += count
+                        lines.append(f'workflow_{name}_bucket{_format_labels(key, {**run_labels, "le": bound})} {cumulative}')
+                    lines.append(f'workflow_{name}_sum{_format_labels(key, run_labels)} {histogram.total:.6f}')
+                    lines.append(f'workflow_{name}_count{_format_labels(key, run_labels)} {len(histogram.values)}')
+            lines += ['# TYPE workflow_last_run_timestamp_seconds gauge',
+                      f'workflow_last_run_timestamp_seconds{_format_labels((), run_labels)} {self.started:.0f}']
+            if status is not None:
+                lines += ['# TYPE workflow_last_run_success gauge',
+                          f'workflow_last_run_success{_format_labels((), run_labels)} {1 if status == "ok" else 0}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, status=None):
+        if not self.prometheus_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.prometheus_path), exist_ok=True)
+            # textfile collector가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+            with open(self.prometheus_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.prometheus_text(status))
+            os.replace(self.prometheus_path + '.tmp', self.prometheus_path)
+        except OSError:
+            pass
+
+
+class _Timer:
+    def __init__(self, metrics, name, ticker, labels):
+        self.metrics, self.name, self.ticker, self.labels = metrics, name, ticker, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, ticker=self.ticker, **self.labels)
+        if exc_type is not None:
+            self.metrics.inc('errors_total', **self.labels)
+        return False
+
+
+class InstrumentedProvider(MarketDataProvider):
+    """
+    공급자 호출마다 호출 수(provider_calls_total)와 지연 시간(fetch_latency_seconds)을 기록하는 래퍼입니다.
+    이름과 원격 여부는 원래 공급자의 값을 그대로 사용하므로 캐시 경로와 속도 제한은 바뀌지 않습니다.
+    """
+
+    def __init__(self, provider, metrics):
+        self.inner = provider
+        self.metrics = metrics
+        self.name = provider.name
+        self.is_remote = provider.is_remote
+
+    def _call(self, method, ticker, func, *args, **kwargs):
+        self.metrics.inc('provider_calls_total', method=method)
+        with self.metrics.timed('fetch_latency_seconds', ticker=ticker, method=method):
+            return func(*args, **kwargs)
+
+    def download(self, ticker, period="250d", start=None):
+        return self._call('download', ticker, self.inner.download, ticker, period=period, start=start)
+
+    def download_many(self, tickers, period="250d", start=None):
+        tickers = list(tickers)
+        self.metrics.inc('provider_tickers_total', len(tickers), method='download_many')
+        label = tickers[0] if len(tickers) == 1 else f'{tickers[0]}..{tickers[-1]} ({len(tickers)})'
+        return self._call('download_many', label, self.inner.download_many, tickers, period=period, start=start)
+
+    def get_info(self, ticker):
+        return self._call('info', ticker, self.inner.get_info, ticker)
+
+    def get_recommendations(self, ticker):
+        return self._call('recommendations', ticker, self.inner.get_recommendations, ticker)
+
+    def get_analysis(self, ticker):
+        return self._call('analysis', ticker, self.inner.get_analysis, ticker)
+
+    def get_analysis_page(self, ticker):
+        return self._call('analysis_page', ticker, self.inner.get_analysis_page, ticker)
+
+    def get_index_tickers(self, index_name):
+        return self._call('index_tickers', index_name, self.inner.get_index_tickers, index_name)
+
+
+# --- 기본 수집기 ---
+_metrics = None
+
+def get_metrics():
+    """config.ini의 [Metrics] 설정에 따른 프로세스 전역 지표 수집기를 반환합니다. 꺼져 있으면 파일에 쓰지 않습니다."""
+    global _metrics
+    if _metrics is None:
+        config = get_config_service()
+        enabled = config.getboolean('Metrics', 'enabled', fallback=True)
+        resolve = lambda key, default: os.path.join(PROJECT_ROOT, config.get('Metrics', key, fallback=default)) if enabled else None
+        _metrics = WorkflowMetrics(
+            jsonl_path=resolve('jsonl_path', 'discord/logs/metrics.jsonl'),
+            prometheus_path=resolve('prometheus_path', 'discord/logs/workflow_metrics.prom'),
+        )
+    return _metrics
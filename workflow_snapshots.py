@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime, timedelta
+
+import pytz
+
+from config_service import ConfigService, get_config_service
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE_PATH = os.path.join(PROJECT_ROOT, 'config.ini')
+
+NEW_YORK = pytz.timezone('America/New_York')
+MARKET_CLOSE_HOUR = 16
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+# 워크플로우 결과에 영향을 주는 설정 (바뀌면 이전 스냅샷을 재사용하지 않습니다)
+FINGERPRINT_SECTIONS = ('Screener', 'Analyzer', 'Fundamental')
+
+
+def completed_session(now=None, delay_minutes=0):
+    """
+    미국 정규장 마감(16:00 America/New_York) + delay_minutes가 지난 가장 최근 거래일(주말 제외, datetime.date)을 반환합니다.
+    휴장일은 구분하지 않으므로 휴장일에는 전 거래일과 같은 데이터로 한 번 더 실행됩니다.
+    """
+    ny_now = (now or datetime.now(NEW_YORK)).astimezone(NEW_YORK)
+    session = ny_now.date()
+    ready_at = NEW_YORK.localize(datetime(session.year, session.month, session.day, MARKET_CLOSE_HOUR)) + timedelta(minutes=delay_minutes)
+    if ny_now < ready_at:
+        session -= timedelta(days=1)
+    while session.weekday() >= 5:
+        session -= timedelta(days=1)
+    return session
+
+
+def next_run_time(now=None, delay_minutes=0):
+    """다음 스냅샷 실행 시각(거래일 장 마감 + delay_minutes, America/New_York)을 반환합니다."""
+    ny_now = (now or datetime.now(NEW_YORK)).astimezone(NEW_YORK)
+    day = ny_now.date()
+    while True:
+        run_at = NEW_YORK.localize(datetime(day.year, day.month, day.day, MARKET_CLOSE_HOUR)) + timedelta(minutes=delay_minutes)
+        if day.weekday() < 5 and run_at > ny_now:
+            return run_at
+        day += timedelta(days=1)
+
+
+def config_fingerprint(config_path=CONFIG_FILE_PATH):
+    """스냅샷 결과에 영향을 주는 설정 섹션과 데이터 공급자의 해시를 반환합니다."""
+    config = get_config_service() if config_path == CONFIG_FILE_PATH else ConfigService(config_path)
+    items = [(section, sorted(config[section].items())) for section in FINGERPRINT_SECTIONS if config.has_section(section)]
+    items.append(('provider', os.environ.get('MARKET_DATA_PROVIDER') or config.get('Data', 'provider', fallback='yfinance')))
+    return hashlib.sha1(json.dumps(items).encode('utf-8')).hexdigest()[:12]
+
+
+class SnapshotStore:
+    """
+    장 마감 후 미리 실행한 워크플로우 결과를 지수별 버전 디렉토리(<root>/<INDEX>/<버전>/)로 보관하는 저장소입니다.
+
+    - 실행은 '<버전>.tmp' 디렉토리에 쓰고, 성공했을 때만 이름을 바꾼 뒤 LATEST 파일을 원자적으로 교체합니다.
+      따라서 읽는 쪽은 항상 완성된 스냅샷만 봅니다.
+    - 각 버전에는 워크플로우 결과 파일과 manifest.json(지수, 거래일, 생성 시각, 설정 해시)이 들어 있으며 최근 keep개만 남깁니다.
+    - 장 마감 delay_minutes분 후부터 그 거래일의 스냅샷을 최신으로 봅니다.
+    """
+
+    def __init__(self, root, keep=10, delay_minutes=30):
+        self.root = root
+        self.keep = keep
+        self.delay_minutes = delay_minutes
+
+    def index_dir(self, index_name):
+        return os.path.join(self.root, index_name)
+
+    def begin(self, index_name):
+        """새 스냅샷을 쓸 임시 디렉토리를 만들어 반환합니다."""
+        version = datetime.now(NEW_YORK).strftime('%Y%m%d-%H%M%S')
+        staging_dir = os.path.join(self.index_dir(index_name), f'{version}.tmp')
+        os.makedirs(staging_dir, exist_ok=True)
+        return staging_dir
+
+    def commit(self, index_name, staging_dir, session, **extra):
+        """임시 디렉토리를 완성된 버전으로 확정하고 LATEST로 지정합니다. 확정한 매니페스트를 반환합니다."""
+        version = os.path.basename(staging_dir)[:-len('.tmp')]
+        manifest = {
+            'index': index_name,
+            'version': version,
+            'session': session.isoformat(),
+            'created': time.time(),
+            'config': config_fingerprint(),
+            'files': sorted(os.listdir(staging_dir)),
+            **extra,
+        }
+        with open(os.path.join(staging_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(staging_dir, os.path.join(self.index_dir(index_name), version))
+
+        latest_path = os.path.join(self.index_dir(index_name), LATEST_FILE)
+        with open(latest_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(latest_path + '.tmp', latest_path)
+        self._prune(index_name)
+        return manifest
+
+    def discard(self, staging_dir):
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def latest(self, index_name):
+        """가장 최근 스냅샷의 매니페스트(디렉토리 경로 'path' 포함)를 반환합니다. 없으면 None."""
+        try:
+            with open(os.path.join(self.index_dir(index_name), LATEST_FILE), 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+            path = os.path.join(self.index_dir(index_name), version)
+            with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        manifest['path'] = path
+        return manifest
+
+    def is_current(self, manifest, now=None):
+        """스냅샷이 가장 최근 거래일 데이터로, 현재 설정과 같은 조건에서 만들어졌는지 확인합니다."""
+        return (manifest is not None
+                and manifest['session'] == completed_session(now, self.delay_minutes).isoformat()
+                and manifest['config'] == config_fingerprint())
+
+    def current(self, index_name):
+        """최신 거래일/현재 설정의 스냅샷 매니페스트를 반환합니다. 없거나 오래되었으면 None."""
+        manifest = self.latest(index_name)
+        return manifest if self.is_current(manifest) else None
+
+    def versions(self, index_name):
+        """확정된 버전 이름 목록(오래된 순)을 반환합니다."""
+        directory = self.index_dir(index_name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory)
+                      if not name.endswith('.tmp') and os.path.isdir(os.path.join(directory, name)))
+
+    def _prune(self, index_name):
+        for version in self.versions(index_name)[:-max(self.keep, 1)]:
+            shutil.rmtree(os.path.join(self.index_dir(index_name), version), ignore_errors=True)
+
+
+# --- 기본 저장소 ---
+_store = None
+
+def get_snapshot_store():
+    """config.ini의 [Scheduler] 설정에 따른 스냅샷 저장소를 반환합니다."""
+    global _store
+    if _store is None:
+        config = get_config_service()
+        _store = SnapshotStore(
+            os.path.join(PROJECT_ROOT, config.get('Scheduler', 'snapshot_dir', fallback='data/snapshots')),
+            keep=config.getint('Scheduler', 'snapshot_keep', fallback=10),
+            delay_minutes=config.getint('Scheduler', 'run_after_close_minutes', fallback=30),
+        )
+    return _store